@@ -1,23 +1,27 @@
-from flask import Flask, render_template, request, jsonify, Response
+from flask import Flask, render_template, request, jsonify, send_file, g, Response
 from flask_cors import CORS
 import os
 import re
+import cProfile
+import time
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import platform
 import subprocess
 import threading
-from PIL import Image
-import pillow_heif
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import simpleSplit
-from docx import Document
-import pypandoc
-from PyPDF2 import PdfReader, PdfWriter
-
-# Enable HEIC/HEIF support
-pillow_heif.register_heif_opener()
+from settings import IMAGE_PRESETS, IMAGE_PRESET, DOC_LAYOUT
+from jobs import JobQueue, JobStore, QueueFull, current_job_id
+from workspaces import create_workspace, workspace_path, remove_workspace
+from numbering import next_number
+from expiry import ExpiryScheduler
+from catalog import OutputCatalog
+from bundle import iter_zip
+from redaction import get_matcher, redact_pdf_file, viewer_box_to_pdf
+from conversion_cache import ConversionCache, cache_key, hash_file
+import text_index
+from chunked_upload import UploadError, init_upload, upload_status, append_chunk, finalize_upload
+import metrics
+import backends
 
 app = Flask(__name__)
 CORS(app)
@@ -25,14 +29,56 @@ CORS(app)
 # --------------------------------------------------
 # Configuration
 # --------------------------------------------------
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max file size
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max request body
+# Larger files go through the chunked /api/uploads API, one request per chunk
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024
+app.config['MAX_UPLOAD_BYTES'] = int(os.environ.get('PDF_MAX_UPLOAD_BYTES', 2 * 1024 ** 3))
+app.config['DECODE_WORKERS'] = int(os.environ.get('PDF_DECODE_WORKERS', 0))  # 0 = one per CPU
+app.config['IMAGE_PRESET'] = IMAGE_PRESET  # PDF_IMAGE_PRESET: original, balanced or small
+app.config['DOC_WORKERS'] = int(os.environ.get('PDF_DOC_WORKERS', 0))  # 0 = one per CPU
+app.config['DOC_TIMEOUT'] = float(os.environ.get('PDF_DOC_TIMEOUT', 60))  # seconds per document
+app.config['JOB_WORKERS'] = int(os.environ.get('PDF_JOB_WORKERS', 2))
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('PDF_JOB_QUEUE_SIZE', 16))
+# Let a fronting nginx/Apache send file bodies (X-Sendfile) instead of Python
+app.config['USE_X_SENDFILE'] = os.environ.get('PDF_USE_X_SENDFILE') == '1'
+app.config['DOWNLOAD_TTL'] = 60  # seconds a PDF stays on disk after it is served
+app.config['BUNDLE_MAX_FILES'] = int(os.environ.get('PDF_BUNDLE_MAX_FILES', 500))  # PDFs per ZIP download
+app.config['REDACT_WORKERS'] = int(os.environ.get('PDF_REDACT_WORKERS', 0))  # 0 = one per CPU
+app.config['CACHE_ROOT'] = os.environ.get('PDF_CACHE_ROOT', 'conversion_cache')
+app.config['CACHE_MAX_BYTES'] = int(os.environ.get('PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # 0 = off
+# Text indexes of PDFs uploaded for redaction, by digest (see text_index.py)
+app.config['TEXT_INDEX_MAX_BYTES'] = int(os.environ.get('PDF_TEXT_INDEX_MAX_BYTES', 128 * 1024 * 1024))
+# With PDF_PROFILE=1, requests sent with an X-Profile header are run under
+# cProfile and the stats saved to PROFILE_DIR (open with pstats/snakeviz)
+app.config['PROFILE_ENABLED'] = os.environ.get('PDF_PROFILE') == '1'
+app.config['PROFILE_DIR'] = os.environ.get('PDF_PROFILE_DIR', 'profiles')
+# Converter backends are imported on first use. PDF_PRELOAD=1 imports them
+# all at startup instead, for gunicorn --preload (see preload() below).
+app.config['PRELOAD'] = os.environ.get('PDF_PRELOAD') == '1'
+# With PDF_OPTIMIZE=1 every output PDF is deduplicated, packed into object
+# streams and linearized for fast web view (see pdf_optimize.py). The
+# rewrite is kept only if it is smaller, unless PDF_LINEARIZE=1 asks for
+# linearized outputs whatever their size.
+app.config['LINEARIZE'] = os.environ.get('PDF_LINEARIZE') == '1'
+app.config['OPTIMIZE'] = os.environ.get('PDF_OPTIMIZE') == '1' or app.config['LINEARIZE']
 
 ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.heic', '.heif'}
 ALLOWED_DOC_EXTENSIONS = {'.docx', '.txt', '.md', '.rtf', '.odt'}
 
-UPLOAD_FOLDERS = ['img', 'DOC', 'PDF', 'RedactPDF']
-for folder in UPLOAD_FOLDERS:
-    os.makedirs(folder, exist_ok=True)
+# Everything that affects rendered output is part of the conversion cache key
+def image_options(preset):
+    return {'preset': preset, **IMAGE_PRESETS[preset], 'encoding': 'jpeg', **optimize_options()}
+
+
+def doc_options():
+    return {**DOC_LAYOUT, **optimize_options()}
+
+
+def optimize_options():
+    return {'optimize': app.config['OPTIMIZE'], 'linearize': app.config['LINEARIZE']}
+
+# Uploads go to per-session workspaces (see workspaces.py); only outputs are shared.
+UPLOAD_FOLDERS = ['PDF']
 
 # --------------------------------------------------
 # Utility Helpers
@@ -49,128 +95,265 @@ def allowed_file(filename, file_type):
     return False
 
 
-def get_next_number():
-    """Return next sequential number for PDF naming."""
-    pdf_folder = 'PDF'
-    pattern = r"\[(\d+)\]_.*\.pdf$"
+def get_next_number(count=1):
+    """Reserve `count` sequential numbers for PDF naming and return the first."""
+    prepare_storage()
+    return next_number('PDF', count, last_used=output_catalog.max_number)
 
-    if not os.path.exists(pdf_folder):
-        return 1
 
-    existing = [f for f in os.listdir(pdf_folder) if re.search(pattern, f)]
-    numbers = [int(re.search(pattern, f).group(1)) for f in existing]
-    return max(numbers) + 1 if numbers else 1
+def record_output(name, source):
+    """Add a PDF just written to PDF/ to the output catalog."""
+    output_catalog.add(name, source, current_job_id())
 
 
-def clear_folder(folder):
-    """Delete all files in a folder."""
-    for f in os.listdir(folder):
-        path = os.path.join(folder, f)
-        try:
-            if os.path.isfile(path):
-                os.remove(path)
-        except Exception as e:
-            print(f"⚠️ Could not clear {path}: {e}")
-
-
-def draw_wrapped_text(c, text, x, y, width, font="Helvetica", size=12, leading=16):
-    """Draw wrapped text on a PDF canvas."""
-    lines = simpleSplit(text, font, size, width)
-    for line in lines:
-        if y < 60:
-            c.showPage()
-            c.setFont(font, size)
-            y = A4[1] - 60
-        c.drawString(x, y, line)
-        y -= leading
-    return y
+def optimize_output(path):
+    """Optimize a PDF just written, if PDF_OPTIMIZE or PDF_LINEARIZE is on.
+
+    Runs before the file goes into the conversion cache. If optimizing
+    fails, or gives a file that is not smaller and linearizing was not
+    asked for, the unoptimized PDF is kept: it is still a valid output.
+    """
+    if not app.config['OPTIMIZE']:
+        return
+    name = os.path.basename(path)
+    try:
+        report = backends.get('optimize').optimize_file(path, linearize=app.config['LINEARIZE'])
+    except Exception as e:
+        print(f"⚠️ Could not optimize {name}: {e}")
+        return
+    if report['replaced']:
+        print(f"🗜️ Optimized {name}: {report['before']} → {report['after']} bytes")
+    else:
+        print(f"🗜️ Kept {name} as written: {report['before']} bytes, optimized {report['after']}")
+
+
+def send_pdf(path, filename, as_attachment=True):
+    """Stream a PDF from disk with Range, ETag and If-None-Match support.
+
+    The body is never read into memory: werkzeug hands the open file to the
+    WSGI server's file_wrapper (sendfile under gunicorn) and answers Range
+    requests with 206 Partial Content.
+    """
+    with metrics.span('download'):
+        response = send_file(
+            os.path.abspath(path),
+            mimetype='application/pdf',
+            as_attachment=as_attachment,
+            download_name=filename,
+            conditional=True,
+            etag=True,
+            max_age=0,
+        )
+    # Advertise range support on full responses too; pdf.js checks for it
+    response.accept_ranges = 'bytes'
+    metrics.BYTES_OUT.inc(response.content_length or 0)
+    return response
+
 
 # --------------------------------------------------
 # Conversion Logic
 # --------------------------------------------------
 
-def convert_images_to_pdf_api(base_name):
-    img_folder = "img"
+def convert_images_to_pdf_api(base_name, img_folder, progress=None, preset=None):
     pdf_folder = "PDF"
+    preset = preset or app.config['IMAGE_PRESET']
     image_files = [f for f in os.listdir(img_folder)
                    if f.lower().endswith(tuple(ALLOWED_IMAGE_EXTENSIONS))]
 
     if not image_files:
         return None, "No image files found"
 
-    images = [Image.open(os.path.join(img_folder, f)).convert("RGB") for f in sorted(image_files)]
+    image_paths = [os.path.join(img_folder, f) for f in sorted(image_files)]
 
     next_num = get_next_number()
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     pdf_name = f"{base_name}[{next_num}]_{timestamp}.pdf"
     output_path = os.path.join(pdf_folder, pdf_name)
 
-    images[0].save(output_path, save_all=True, append_images=images[1:])
-    clear_folder(img_folder)
+    key = cache_key('image', [hash_file(p) for p in image_paths], image_options(preset))
+    if conversion_cache.get(key, output_path):
+        print(f"♻️ Cache hit for {len(image_paths)} image(s): {pdf_name}")
+        if progress:
+            progress(len(image_paths), len(image_paths))
+        record_output(pdf_name, 'image')
+        return pdf_name, None
+
+    backends.get('image').write_images_pdf(image_paths, output_path, workers=app.config['DECODE_WORKERS'],
+                     progress=progress, reproducible=True, preset=preset)
+    optimize_output(output_path)
+    conversion_cache.put(key, output_path)
+    record_output(pdf_name, 'image')
     return pdf_name, None
 
 
-def convert_docs_to_pdf_api(base_name):
-    doc_folder = "DOC"
+def convert_docs_to_pdf_api(base_name, doc_folder, progress=None, failures=None):
+    """Render each document to its own PDF. Returns (pdf_names, error).
+
+    Files are rendered in parallel by doc_render's process pool but numbered
+    in file-name order. Files that fail or time out are skipped and, if
+    `failures` is a list, reported there as {'file', 'error'} dicts.
+    """
     pdf_folder = "PDF"
-    doc_files = [f for f in os.listdir(doc_folder)
-                 if f.lower().endswith(tuple(ALLOWED_DOC_EXTENSIONS))
-                 and not f.startswith("~$") and not f.startswith(".")]
+    doc_files = sorted(f for f in os.listdir(doc_folder)
+                       if f.lower().endswith(tuple(ALLOWED_DOC_EXTENSIONS))
+                       and not f.startswith("~$") and not f.startswith("."))
 
     if not doc_files:
         return None, "No document files found"
 
-    created = []
-    next_num = get_next_number()
+    next_num = get_next_number(len(doc_files))
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    names = [f"{base_name}[{next_num + i}]_{timestamp}.pdf" for i in range(len(doc_files))]
 
-    for file in doc_files:
+    # Cache hits are linked into place here; only misses go to the pool
+    tasks, pending = [], []
+    for file, pdf_name in zip(doc_files, names):
         input_path = os.path.join(doc_folder, file)
-        ext = os.path.splitext(file)[1].lower()
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        pdf_name = f"{base_name}[{next_num}]_{timestamp}.pdf"
         output_path = os.path.join(pdf_folder, pdf_name)
-        next_num += 1
-
-        c = canvas.Canvas(output_path, pagesize=A4)
-        width, height = A4
-        margin = 60
-        y = height - 80
-
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(margin, y, os.path.splitext(file)[0])
-        y -= 30
-        c.setFont("Helvetica", 12)
-
-        def write_paragraphs(paragraphs):
-            nonlocal y
-            for p in paragraphs:
-                txt = p.strip()
-                if txt:
-                    y = draw_wrapped_text(c, txt, margin, y, width - 2 * margin)
-                    y -= 10
-
-        try:
-            if ext == ".docx":
-                doc = Document(input_path)
-                paragraphs = [p.text for p in doc.paragraphs]
-            else:
-                text = open(input_path, "r", encoding="utf-8").read()
-                if ext in [".md", ".rtf", ".odt"]:
-                    text = pypandoc.convert_text(text, "plain", format=ext[1:])
-                paragraphs = text.split("\n")
-            write_paragraphs(paragraphs)
-            c.save()
-            created.append(pdf_name)
-        except Exception as e:
-            print(f"⚠️ Error converting {file}: {e}")
-
-    clear_folder(doc_folder)
+        key = cache_key('document', [file, hash_file(input_path)], doc_options())
+        if conversion_cache.get(key, output_path):
+            print(f"♻️ Cache hit for {file}: {pdf_name}")
+            continue
+        tasks.append((input_path, output_path))
+        pending.append((file, pdf_name, key))
+
+    cached = len(doc_files) - len(tasks)
+
+    def task_progress(done, total):
+        if progress:
+            progress(cached + done, len(doc_files))
+
+    task_progress(0, len(tasks))
+    errors = backends.get('document').render_documents(tasks, workers=app.config['DOC_WORKERS'],
+                              timeout=app.config['DOC_TIMEOUT'], progress=task_progress)
+
+    failed = {}
+    for (file, pdf_name, key), (_, output_path), error in zip(pending, tasks, errors):
+        if error:
+            print(f"⚠️ Error converting {file}: {error}")
+            failed[pdf_name] = error
+            if failures is not None:
+                failures.append({'file': file, 'error': error})
+        else:
+            optimize_output(output_path)
+            conversion_cache.put(key, output_path)
+
+    created = [name for name in names if name not in failed]
+    for name in created:
+        record_output(name, 'document')
+    if not created:
+        return [], f"None of the {len(doc_files)} document(s) could be converted"
     return created, None
 
+
+def run_conversion(file_type, base_name, ws_id, preset=None, progress=None, failures=None):
+    """Convert the files in workspace ws_id and return (pdf_names, error).
+
+    preset picks the image quality/size preset (images only). Documents
+    that could not be converted are appended to `failures`. The workspace
+    is removed afterwards, whether or not conversion succeeded.
+    """
+    folder = workspace_path(ws_id)
+    if folder is None:
+        return [], "Upload session not found or expired"
+    try:
+        with metrics.span('convert'):
+            if file_type == 'image':
+                pdf, err = convert_images_to_pdf_api(base_name, folder, progress=progress, preset=preset)
+                return ([pdf] if pdf else []), err
+            return convert_docs_to_pdf_api(base_name, folder, progress=progress, failures=failures)
+    finally:
+        remove_workspace(ws_id)
+
+
+# Jobs run in the worker process that accepted them; their state is kept
+# in PDF/.jobs.db so a poll that reaches another worker still finds them
+job_queue = JobQueue(workers=app.config['JOB_WORKERS'],
+                     max_queued=app.config['JOB_QUEUE_SIZE'], store=JobStore('PDF'))
+
+# Every PDF in PDF/ has a catalog entry; lookups, listings and numbering go
+# through it instead of the directory. Files added or removed while the
+# app was down are picked up by prepare_storage().
+output_catalog = OutputCatalog('PDF')
+
+# One scheduler per process deletes served PDFs once DOWNLOAD_TTL runs out;
+# pending deletions are persisted so they survive restarts.
+expiry_scheduler = ExpiryScheduler(
+    os.path.join('PDF', '.expiry.db'),
+    on_expired=lambda paths: output_catalog.remove([os.path.basename(p) for p in paths]))
+conversion_cache = ConversionCache(app.config['CACHE_ROOT'], app.config['CACHE_MAX_BYTES'])
+text_index_cache = ConversionCache(os.path.join(app.config['CACHE_ROOT'], 'text-index'),
+                                   app.config['TEXT_INDEX_MAX_BYTES'], suffix=text_index.SUFFIX)
+
+metrics.Counter('pdf_cache_hits_total', 'Conversion cache hits.', func=lambda: conversion_cache.hits)
+metrics.Counter('pdf_cache_misses_total', 'Conversion cache misses.', func=lambda: conversion_cache.misses)
+metrics.Gauge('pdf_job_queue_depth', 'Jobs waiting for a worker.', func=job_queue.depth)
+
+_storage_ready = False
+_storage_lock = threading.Lock()
+
+
+def prepare_storage():
+    """Create the output folder and resync the output catalog, once per process tree."""
+    global _storage_ready
+    if _storage_ready:
+        return
+    with _storage_lock:
+        if not _storage_ready:
+            for folder in UPLOAD_FOLDERS:
+                os.makedirs(folder, exist_ok=True)
+            output_catalog.reconcile()
+            _storage_ready = True
+
+
+def preload():
+    """Do all start-up work now rather than on the first request.
+
+    Under gunicorn --preload this runs once in the master, and the forked
+    workers share the imported backends copy-on-write. No threads are
+    started and no database connection is left open, since neither
+    survives a fork.
+    """
+    prepare_storage()
+    output_catalog.close()
+    backends.preload()
+    print(f"🔥 Preloaded backends: {', '.join(backends.loaded())}")
+
+
+if app.config['PRELOAD']:
+    preload()
+
 # --------------------------------------------------
 # Flask Routes
 # --------------------------------------------------
 
+@app.before_request
+def start_background_tasks():
+    prepare_storage()
+    # Picks up deletions left pending by a previous run
+    expiry_scheduler.start()
+
+
+@app.before_request
+def start_profile():
+    if app.config['PROFILE_ENABLED'] and request.headers.get('X-Profile'):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.after_request
+def save_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        name = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')}_{request.endpoint}.prof"
+        profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], name))
+        response.headers['X-Profile-File'] = name
+        print(f"⏱️ Profile saved: {name}")
+    return response
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -191,37 +374,118 @@ def upload_files():
         if not files or all(f.filename == '' for f in files):
             return jsonify({'error': 'No files provided'}), 400
 
-        # Target folder logic
-        if file_type == 'image':
-            target = 'img'
-            clear_folder(target)
-        elif file_type == 'document':
-            target = 'DOC'
-            clear_folder(target)
-        elif file_type == 'redact':
-            target = 'RedactPDF'
-            # do not clear — we want to keep uploaded PDF
-        else:
+        if file_type not in ('image', 'document', 'redact'):
             return jsonify({'error': f'Invalid type: {file_type}'}), 400
 
+        # Reuse the caller's workspace for multi-part uploads, else start a new one
+        ws_id = request.form.get('workspace')
+        if ws_id:
+            target = workspace_path(ws_id)
+            if target is None:
+                return jsonify({'error': 'Upload session not found or expired'}), 404
+        else:
+            ws_id = create_workspace()
+            target = workspace_path(ws_id)
+
         uploaded = []
         for file in files:
             if file and allowed_file(file.filename, file_type):
                 filename = secure_filename(file.filename)
                 path = os.path.join(target, filename)
                 print(f"💾 Saving: {path}")
-                file.save(path)
+                with metrics.span('upload_save'):
+                    file.save(path)
+                metrics.BYTES_IN.inc(os.path.getsize(path), type=file_type)
+                if file_type == 'redact':
+                    text_index.prepare_index(path, text_index_cache)
                 uploaded.append(filename)
 
         if not uploaded:
             return jsonify({'error': 'No valid files uploaded'}), 400
 
         print(f"✅ Uploaded to {target}: {uploaded}")
-        return jsonify({'success': True, 'files': uploaded, 'folder': target})
+        return jsonify({'success': True, 'files': uploaded, 'workspace': ws_id})
     except Exception as e:
         print(f"❌ Upload error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# ---------------------- Chunked Upload ----------------------
+
+@app.route('/api/uploads', methods=['POST'])
+def start_chunked_upload():
+    """Begin a resumable upload of one file; chunks follow via PUT."""
+    data = request.json or {}
+    file_type = data.get('type', 'image')
+    filename = secure_filename(data.get('filename', ''))
+    try:
+        size = int(data.get('size', -1))
+    except (TypeError, ValueError):
+        size = -1
+
+    if file_type not in ('image', 'document', 'redact'):
+        return jsonify({'error': f'Invalid type: {file_type}'}), 400
+    if not filename or not allowed_file(filename, file_type):
+        return jsonify({'error': 'File type not allowed'}), 400
+    if not 0 <= size <= app.config['MAX_UPLOAD_BYTES']:
+        return jsonify({'error': f"File size must be at most {app.config['MAX_UPLOAD_BYTES']} bytes"}), 413
+
+    ws_id = data.get('workspace') or create_workspace()
+    target = workspace_path(ws_id)
+    if target is None:
+        return jsonify({'error': 'Upload session not found or expired'}), 404
+
+    upload_id = init_upload(target, filename, size, file_type)
+    print(f"🟢 Chunked upload started: {filename} ({size} bytes) in {ws_id}")
+    return jsonify({'uploadId': upload_id, 'workspace': ws_id, 'offset': 0,
+                    'chunkSize': app.config['UPLOAD_CHUNK_SIZE']}), 201
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'PUT'])
+def chunked_upload(upload_id):
+    """GET reports the resume offset; PUT appends the raw body at ?offset=.
+
+    Each chunk must carry its sha256 in the X-Chunk-SHA256 header.
+    """
+    target = workspace_path(request.args.get('workspace'))
+    if target is None:
+        return jsonify({'error': 'Upload session not found or expired'}), 404
+    try:
+        if request.method == 'GET':
+            return jsonify(upload_status(target, upload_id))
+        if (request.content_length or 0) > app.config['UPLOAD_CHUNK_SIZE']:
+            return jsonify({'error': f"Chunks must be at most {app.config['UPLOAD_CHUNK_SIZE']} bytes"}), 413
+        with metrics.span('upload_save'):
+            offset = append_chunk(target, upload_id, request.args.get('offset', 0, type=int),
+                                  request.stream, request.headers.get('X-Chunk-SHA256'))
+        return jsonify({'uploadId': upload_id, 'offset': offset})
+    except UploadError as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), e.status
+
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finish_chunked_upload(upload_id):
+    """Move a completed upload into the workspace, next to /api/upload's files."""
+    data = request.json or {}
+    ws_id = data.get('workspace')
+    target = workspace_path(ws_id)
+    if target is None:
+        return jsonify({'error': 'Upload session not found or expired'}), 404
+    try:
+        with metrics.span('upload_save'):
+            filename, file_type = finalize_upload(target, upload_id, data.get('sha256'))
+    except UploadError as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), e.status
+    metrics.BYTES_IN.inc(os.path.getsize(os.path.join(target, filename)), type=file_type)
+
+    if file_type == 'image':
+        # Decode while the rest of the batch is still uploading
+        backends.get('image').prefetch_page(os.path.join(target, filename),
+                                            app.config['DECODE_WORKERS'], app.config['IMAGE_PRESET'])
+    elif file_type == 'redact':
+        text_index.prepare_index(os.path.join(target, filename), text_index_cache)
+    print(f"✅ Uploaded to {target}: {filename}")
+    return jsonify({'success': True, 'file': filename, 'workspace': ws_id})
+
 # ---------------------- Convert ----------------------
 
 @app.route('/api/convert', methods=['POST'])
@@ -230,162 +494,459 @@ def convert():
         data = request.json
         file_type = data.get('type', 'image')
         base_name = data.get('baseName', 'Output')
+        ws_id = data.get('workspace')
+        preset = data.get('preset') or app.config['IMAGE_PRESET']
+        if preset not in IMAGE_PRESETS:
+            return jsonify({'error': f'Invalid preset: {preset}'}), 400
 
-        if file_type == 'image':
-            pdf, err = convert_images_to_pdf_api(base_name)
-            files = [pdf] if pdf else []
-        else:
-            files, err = convert_docs_to_pdf_api(base_name)
-
+        failures = []
+        files, err = run_conversion(file_type, base_name, ws_id, preset, failures=failures)
         if err:
-            return jsonify({'error': err}), 400
+            return jsonify({'error': err, 'failed': failures}), 400
 
         return jsonify({
             'success': True,
             'pdfs': files,
+            'failed': failures,
             'message': f"✅ Successfully created {len(files)} PDF(s)"
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ---------------------- Jobs ----------------------
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a conversion and return its job ID without waiting for it."""
+    data = request.json or {}
+    file_type = data.get('type', 'image')
+    base_name = data.get('baseName', 'Output')
+    ws_id = data.get('workspace')
+    preset = data.get('preset') or app.config['IMAGE_PRESET']
+    if file_type not in ('image', 'document'):
+        return jsonify({'error': f'Invalid type: {file_type}'}), 400
+    if preset not in IMAGE_PRESETS:
+        return jsonify({'error': f'Invalid preset: {preset}'}), 400
+    if workspace_path(ws_id) is None:
+        return jsonify({'error': 'Upload session not found or expired'}), 404
+    try:
+        job = job_queue.submit(file_type, run_conversion, file_type, base_name, ws_id, preset)
+    except QueueFull as e:
+        return jsonify({'error': f'Server busy: {e}'}), 429, {'Retry-After': '5'}
+
+    print(f"🕒 Queued job {job.id} ({file_type})")
+    return jsonify({'success': True, 'jobId': job.id, 'status': job.status}), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/jobs/<job_id>/bundle', methods=['GET'])
+def job_bundle(job_id):
+    """All PDFs a finished job created, as one ZIP."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status != 'done':
+        return jsonify({'error': f'Job is {job.status}', 'status': job.status}), 409
+    return send_bundle(job.result, f'job-{job_id[:8]}.zip')
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == 'failed':
+        return jsonify({'error': job.error, 'failed': job.failures}), 400
+    if job.status != 'done':
+        return jsonify({'error': f'Job is {job.status}', 'status': job.status}), 409
+
+    return jsonify({
+        'success': True,
+        'pdfs': job.result,
+        'downloads': [f'/api/download/{name}' for name in job.result],
+        'bundle': f'/api/jobs/{job_id}/bundle',
+        'failed': job.failures,
+        'message': f"✅ Successfully created {len(job.result)} PDF(s)"
+    })
+
 # ---------------------- Redact ----------------------
 
+def redact_workers():
+    return app.config['REDACT_WORKERS'] or os.cpu_count() or 1
+
+
 @app.route('/api/redact', methods=['POST'])
 def redact_pdf():
-    """Redact sensitive terms from a PDF in RedactPDF/."""
+    """Redact sensitive terms from a PDF uploaded to a workspace."""
     try:
         data = request.json
-        filename = data.get('filename')
+        filename = secure_filename(data.get('filename', ''))
         terms = data.get('terms', [])
+        ignore_case = bool(data.get('ignoreCase', False))
+        ws_id = data.get('workspace')
 
-        redact_dir = 'RedactPDF'
+        redact_dir = workspace_path(ws_id)
         pdf_dir = 'PDF'
 
+        if redact_dir is None:
+            return jsonify({'error': 'Upload session not found or expired'}), 404
         src = os.path.join(redact_dir, filename)
-        if not os.path.exists(src):
-            return jsonify({'error': f'File not found in {redact_dir}'}), 404
-
-        reader = PdfReader(src)
-        writer = PdfWriter()
+        if not filename or not os.path.exists(src):
+            return jsonify({'error': 'File not found in upload session'}), 404
 
-        for page in reader.pages:
-            text = page.extract_text() or ""
-            for t in terms:
-                if t.strip():
-                    text = text.replace(t, "[REDACTED]")
-            # This is symbolic (PyPDF2 doesn't reflow text)
-            page.extract_text = lambda: text
-            writer.add_page(page)
+        try:
+            get_matcher(terms, ignore_case)  # reject bad patterns before doing any work
+        except re.error as e:
+            return jsonify({'error': f'Invalid redaction pattern: {e}'}), 400
 
         next_num = get_next_number()
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         redacted_name = f"redacted[{next_num}]_{timestamp}.pdf"
         output = os.path.join(pdf_dir, redacted_name)
 
-        with open(output, "wb") as f:
-            writer.write(f)
+        # Matched text is removed from the content stream, not just hidden
+        stats = redact_pdf_file(src, output, terms=terms, ignore_case=ignore_case,
+                                workers=redact_workers(),
+                                index=text_index.get_index(src, text_index_cache))
+        matches = stats['matches']
+        optimize_output(output)
 
-        try:
-            os.remove(src)
-        except Exception as e:
-            print(f"⚠️ Could not remove original: {e}")
+        remove_workspace(ws_id)
+        record_output(redacted_name, 'redact')
 
         print(f"✅ Redacted PDF created: {redacted_name}")
-        return jsonify({'success': True, 'pdf': redacted_name, 'message': f'Redacted PDF created: {redacted_name}'})
+        return jsonify({'success': True, 'pdf': redacted_name, 'matches': matches,
+                        'message': f'Redacted PDF created: {redacted_name}'})
 
     except Exception as e:
         print(f"❌ Redaction error: {e}")
         return jsonify({'error': str(e)}), 500
-    
+
+
+@app.route('/api/redact/search', methods=['POST'])
+def search_redaction_terms():
+    """Preview where /api/redact would remove text, without changing the PDF.
+
+    Takes the same filename/terms/ignoreCase/workspace as /api/redact and
+    answers from the upload's text index. Rectangles are in PDF user space.
+    """
+    data = request.json or {}
+    filename = secure_filename(data.get('filename', ''))
+    folder = workspace_path(data.get('workspace'))
+    if folder is None:
+        return jsonify({'error': 'Upload session not found or expired'}), 404
+    src = os.path.join(folder, filename)
+    if not filename or not os.path.exists(src):
+        return jsonify({'error': 'File not found in upload session'}), 404
+    try:
+        matcher = get_matcher(data.get('terms', []), bool(data.get('ignoreCase', False)))
+    except re.error as e:
+        return jsonify({'error': f'Invalid redaction pattern: {e}'}), 400
+
+    index = text_index.get_index(src, text_index_cache)
+    if index is None:
+        return jsonify({'error': 'Could not read the text of this PDF'}), 400
+    with metrics.span('redact_match'):
+        found = index.search(matcher)
+    pages = [{'page': i + 1, 'matches': count, 'rects': [[round(v, 2) for v in r] for r in rects]}
+             for i, (rects, count) in sorted(found.items())]
+    return jsonify({'success': True, 'pageCount': index.page_count,
+                    'matches': sum(p['matches'] for p in pages), 'pages': pages})
+
 @app.route('/api/redact-save', methods=['POST'])
 def save_manual_redactions():
     """Applies manual redaction boxes from /redact-editor."""
     try:
         data = request.json
-        filename = data.get('filename')
+        filename = secure_filename(data.get('filename', ''))
         redactions = data.get('redactions', [])
 
-        src = os.path.join('RedactPDF', filename)
-        if not os.path.exists(src):
+        folder = workspace_path(data.get('workspace'))
+        if folder is None:
+            return jsonify({'error': 'Upload session not found or expired'}), 404
+        src = os.path.join(folder, filename)
+        if not filename or not os.path.exists(src):
             return jsonify({'error': 'File not found'}), 404
 
-        reader = PdfReader(src)
-        writer = PdfWriter()
-
-        for page_number, page in enumerate(reader.pages, start=1):
-            page_obj = page
-            # Here you could apply redactions graphically (PyMuPDF is better)
-            # For now, we simply copy all pages unchanged
-            writer.add_page(page_obj)
+        # Boxes arrive in viewer pixels at the editor's zoom; map them to PDF space
+        scale = float(data.get('scale') or 1.0)
+        reader = backends.get('pdf').PdfReader(src)
+        boxes = {}
+        for box in redactions:
+            index = int(box.get('page', 0)) - 1
+            if 0 <= index < len(reader.pages):
+                boxes.setdefault(index, []).append(viewer_box_to_pdf(reader.pages[index], box, scale))
 
         next_num = get_next_number()
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         redacted_name = f"manual_redacted[{next_num}]_{timestamp}.pdf"
         output_path = os.path.join('PDF', redacted_name)
 
-        with open(output_path, 'wb') as f:
-            writer.write(f)
+        stats = redact_pdf_file(src, output_path, boxes=boxes, workers=redact_workers())
+        optimize_output(output_path)
+        record_output(redacted_name, 'redact')
 
-        return jsonify({'success': True, 'pdf': redacted_name})
+        print(f"✅ Manually redacted PDF created: {redacted_name} ({stats['pages']} page(s) changed)")
+        return jsonify({'success': True, 'pdf': redacted_name, 'pages': stats['pages']})
     except Exception as e:
         print(f"❌ Manual redaction error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# ---------------------- Merge/Split/Extract ----------------------
+
+def pdf_errors():
+    """Exceptions that mean a PDF could not be read or a page range is invalid."""
+    return (ValueError, backends.get('pdf').errors.PdfReadError)
+
+
+def output_pdf_path(name):
+    """Path of an existing PDF in PDF/, or None if the catalog has no such output."""
+    if not name or output_catalog.get(name) is None:
+        return None
+    return output_catalog.path(name)
+
+
+def new_output_names(base_name, count=1):
+    next_num = get_next_number(count)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    return [f"{base_name}[{next_num + i}]_{timestamp}.pdf" for i in range(count)]
+
+
+@app.route('/api/merge', methods=['POST'])
+def merge_outputs():
+    """Merge PDFs from PDF/ into one, in the order given."""
+    data = request.json or {}
+    files = data.get('files') or []
+    if len(files) < 2:
+        return jsonify({'error': 'Give at least two PDFs to merge'}), 400
+    paths = [output_pdf_path(f) for f in files]
+    missing = [f for f, p in zip(files, paths) if p is None]
+    if missing:
+        return jsonify({'error': f"File not found: {', '.join(missing)}"}), 404
+
+    name = new_output_names(secure_filename(data.get('baseName') or '') or 'Merged')[0]
+    try:
+        stats = backends.get('pages').merge_pdfs(paths, os.path.join('PDF', name))
+        optimize_output(os.path.join('PDF', name))
+    except pdf_errors() as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Merge error: {e}")
+        return jsonify({'error': str(e)}), 500
+    record_output(name, 'merge')
+    print(f"✅ Merged {len(paths)} PDFs into {name} ({stats['pages']} pages)")
+    return jsonify({'success': True, 'pdf': name, 'pages': stats['pages']})
+
+
+@app.route('/api/split', methods=['POST'])
+def split_output():
+    """Split a PDF from PDF/ into one file per page range (default: per page)."""
+    data = request.json or {}
+    path = output_pdf_path(data.get('file'))
+    if path is None:
+        return jsonify({'error': 'File not found'}), 404
+    try:
+        ranges = data.get('ranges')
+        if not ranges:
+            ranges = [str(i + 1) for i in range(len(backends.get('pdf').PdfReader(path).pages))]
+        elif isinstance(ranges, str):
+            ranges = ranges.split(';')
+        names = new_output_names(secure_filename(data.get('baseName') or '') or 'Split', len(ranges))
+        counts = backends.get('pages').split_pdf(path, [os.path.join('PDF', n) for n in names], ranges)
+        for n in names:
+            optimize_output(os.path.join('PDF', n))
+    except pdf_errors() as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Split error: {e}")
+        return jsonify({'error': str(e)}), 500
+    for name in names:
+        record_output(name, 'split')
+    print(f"✅ Split {data.get('file')} into {len(names)} PDFs")
+    return jsonify({'success': True, 'pdfs': names, 'pages': counts})
+
+
+@app.route('/api/extract', methods=['POST'])
+def extract_output_pages():
+    """Copy selected pages (e.g. "1-3,7") of a PDF from PDF/ into a new PDF."""
+    data = request.json or {}
+    path = output_pdf_path(data.get('file'))
+    if path is None:
+        return jsonify({'error': 'File not found'}), 404
+    if not data.get('pages'):
+        return jsonify({'error': 'No pages selected'}), 400
+
+    name = new_output_names(secure_filename(data.get('baseName') or '') or 'Extract')[0]
+    try:
+        pages = backends.get('pages').extract_pages(path, os.path.join('PDF', name), data['pages'])
+        optimize_output(os.path.join('PDF', name))
+    except pdf_errors() as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Extract error: {e}")
+        return jsonify({'error': str(e)}), 500
+    record_output(name, 'extract')
+    print(f"✅ Extracted {pages} page(s) into {name}")
+    return jsonify({'success': True, 'pdf': name, 'pages': pages})
+
 # ---------------------- Download/Delete/Open ----------------------
 
+def serve_output(filename, as_attachment=True):
+    """Send a PDF from PDF/ and schedule its deletion DOWNLOAD_TTL later."""
+    path = output_pdf_path(filename)
+    if path is None:
+        return jsonify({'error': 'File not found'}), 404
+
+    # Deleted shortly after rather than immediately, so the file is still
+    # there while the body streams and for any follow-up Range requests.
+    ttl = app.config['DOWNLOAD_TTL']
+    expiry_scheduler.schedule(path, ttl)
+    output_catalog.set_expiry(filename, time.time() + ttl)
+    try:
+        return send_pdf(path, filename, as_attachment=as_attachment)
+    except FileNotFoundError:
+        # Removed behind the catalog's back
+        output_catalog.remove([filename])
+        return jsonify({'error': 'File not found'}), 404
+
+
 @app.route('/api/delete/<filename>', methods=['DELETE'])
 def delete_pdf(filename):
-    path = os.path.join('PDF', filename)
-    if os.path.exists(path):
+    path = output_pdf_path(filename)
+    if path is None:
+        return jsonify({'error': 'File not found'}), 404
+    try:
         os.remove(path)
-        print(f"🗑️ Deleted {filename}")
-        return jsonify({'success': True})
-    return jsonify({'error': 'File not found'}), 404
+    except FileNotFoundError:
+        pass
+    output_catalog.remove([filename])
+    expiry_scheduler.cancel(path)
+    print(f"🗑️ Deleted {filename}")
+    return jsonify({'success': True})
 
 
 @app.route('/api/download/<filename>', methods=['GET'])
 def download_and_delete(filename):
-    path = os.path.join('PDF', filename)
-    if not os.path.exists(path):
+    return serve_output(filename)
+
+
+def send_bundle(names, download_name):
+    """Stream the given outputs as one ZIP, built while it is sent.
+
+    Every file is opened before the response starts, so a PDF that expires
+    meanwhile still goes out whole. Once the last byte has been sent, each
+    PDF is scheduled for deletion as if it had been downloaded on its own.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return jsonify({'error': 'No files selected'}), 400
+    if len(names) > app.config['BUNDLE_MAX_FILES']:
+        return jsonify({'error': f"At most {app.config['BUNDLE_MAX_FILES']} files per bundle"}), 400
+    paths = [output_pdf_path(name) for name in names]
+    missing = [name for name, path in zip(names, paths) if path is None]
+    if missing:
+        return jsonify({'error': f"File not found: {', '.join(missing)}"}), 404
+
+    files = []
+    try:
+        for name, path in zip(names, paths):
+            files.append((name, open(path, 'rb')))
+    except FileNotFoundError:
+        for _, f in files:
+            f.close()
+        output_catalog.remove([name])
+        return jsonify({'error': f'File not found: {name}'}), 404
+
+    ttl = app.config['DOWNLOAD_TTL']
+
+    def generate():
+        sent = 0
+        with metrics.span('download'):
+            for data in iter_zip(files):
+                sent += len(data)
+                yield data
+        metrics.BYTES_OUT.inc(sent)
+        for name, path in zip(names, paths):
+            expiry_scheduler.schedule(path, ttl)
+            output_catalog.set_expiry(name, time.time() + ttl)
+        print(f"📦 Sent {len(names)} PDF(s) as {download_name} ({sent} bytes)")
+
+    return Response(generate(), mimetype='application/zip', headers={
+        'Content-Disposition': f'attachment; filename="{download_name}"',
+        'Cache-Control': 'no-store',
+    })
+
+
+@app.route('/api/bundle', methods=['GET', 'POST'])
+def download_bundle():
+    """ZIP of the PDFs named by repeated ?files= parameters (or {"files": [...]} when POSTed)."""
+    if request.method == 'POST':
+        data = request.json or {}
+        files, base_name = data.get('files') or [], data.get('baseName')
+    else:
+        files, base_name = request.args.getlist('files'), request.args.get('baseName')
+    base_name = secure_filename(base_name or '') or 'PDFs'
+    return send_bundle(files, f'{base_name}.zip')
+
+
+@app.route('/api/outputs', methods=['GET'])
+def list_outputs():
+    """Recent outputs, newest first; pass `cursor` from the previous page to continue.
+
+    With `expiringBefore` (a Unix time), lists the outputs due for deletion
+    by then instead, soonest first.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        if request.args.get('expiringBefore'):
+            entries = output_catalog.expiring(float(request.args['expiringBefore']), limit)
+            return jsonify({'outputs': entries})
+        entries, cursor = output_catalog.recent(limit, request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit, cursor or expiringBefore'}), 400
+    return jsonify({'outputs': entries, 'next': cursor})
+
+
+@app.route('/api/outputs/<filename>', methods=['GET'])
+def output_info(filename):
+    entry = output_catalog.get(filename)
+    if entry is None:
         return jsonify({'error': 'File not found'}), 404
+    return jsonify(entry)
+
+@app.route('/api/expiry', methods=['GET'])
+def expiry_stats():
+    """Counts of PDFs waiting for deletion, deleted so far, and bytes freed."""
+    return jsonify(expiry_scheduler.stats())
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    """Conversion cache hits, misses, evictions and size."""
+    return jsonify(conversion_cache.stats())
 
-    with open(path, 'rb') as f:
-        content = f.read()
-
-    def delete_later():
-        import time
-        time.sleep(60)
-        if os.path.exists(path):
-            os.remove(path)
-            print(f"🧹 Auto-deleted {filename}")
-
-    threading.Thread(target=delete_later, daemon=True).start()
-
-    return Response(
-        content,
-        mimetype='application/pdf',
-        headers={
-            'Content-Disposition': f'attachment; filename={filename}',
-            'Content-Type': 'application/pdf'
-        }
-    )
-
-@app.route('/RedactPDF/<filename>')
-def serve_redact_pdf(filename):
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage timings, byte/page counters, cache and queue stats for Prometheus."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/RedactPDF/<ws_id>/<filename>')
+def serve_redact_pdf(ws_id, filename):
     """Serve uploaded PDF for the interactive redaction viewer."""
     try:
-        path = os.path.join('RedactPDF', filename)
+        folder = workspace_path(ws_id)
+        if folder is None:
+            return jsonify({'error': 'Upload session not found or expired'}), 404
+        path = os.path.join(folder, secure_filename(filename))
         if not os.path.exists(path):
             return jsonify({'error': 'File not found'}), 404
-        with open(path, 'rb') as f:
-            pdf_content = f.read()
-        return Response(
-            pdf_content,
-            mimetype='application/pdf',
-            headers={
-                'Content-Disposition': f'inline; filename={filename}'
-            }
-        )
+        return send_pdf(path, filename, as_attachment=False)
     except Exception as e:
         print(f"❌ Error serving RedactPDF: {e}")
         return jsonify({'error': str(e)}), 500
@@ -393,8 +954,8 @@ def serve_redact_pdf(filename):
 
 @app.route('/api/open/<filename>', methods=['GET'])
 def open_pdf(filename):
-    path = os.path.join('PDF', filename)
-    if not os.path.exists(path):
+    path = output_pdf_path(filename)
+    if path is None:
         return jsonify({'error': 'File not found'}), 404
 
     if platform.system() == "Darwin":
@@ -410,41 +971,23 @@ def open_pdf(filename):
 
 @app.route('/pdf/<filename>')
 def serve_pdf(filename):
-    path = os.path.join('PDF', filename)
-    if not os.path.exists(path):
-        return jsonify({'error': 'File not found'}), 404
-
-    with open(path, 'rb') as f:
-        content = f.read()
-
-    try:
-        os.remove(path)
-        print(f"✅ Deleted after serve: {filename}")
-    except Exception as e:
-        print(f"⚠️ Could not delete {filename}: {e}")
-
-    return Response(
-        content,
-        mimetype='application/pdf',
-        headers={
-            'Content-Disposition': f'attachment; filename={filename}',
-            'Content-Type': 'application/pdf'
-        }
-    )
-
-@app.route('/redact-editor/<filename>')
-def redact_editor(filename):
-    redact_folder = 'RedactPDF'
-    file_path = os.path.join(redact_folder, filename)
+    return serve_output(filename)
+
+@app.route('/redact-editor/<ws_id>/<filename>')
+def redact_editor(ws_id, filename):
+    redact_folder = workspace_path(ws_id)
+    if redact_folder is None:
+        return jsonify({'error': 'Upload session not found or expired'}), 404
+    file_path = os.path.join(redact_folder, secure_filename(filename))
     if not os.path.exists(file_path):
         return jsonify({'error': 'File not found'}), 404
-    return render_template('redact_editor.html', filename=filename)
+    return render_template('redact_editor.html', filename=filename, workspace=ws_id)
 
 # --------------------------------------------------
 # Run App
 # --------------------------------------------------
 if __name__ == '__main__':
     print("🚀 PDF Converter Server running...")
-    print("📂 Folders: img/, DOC/, PDF/, RedactPDF/")
+    print("📂 Folders: workspaces/ (uploads), PDF/ (outputs)")
     print("🌐 Open http://localhost:5000")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,55 @@
+import gc
+import importlib
+import threading
+import time
+
+import metrics
+
+# Converter backends by name, and the module that implements each. A
+# backend is imported the first time get() asks for it, so a process that
+# only serves downloads never loads Pillow or ReportLab.
+BACKENDS = {
+    "image": "image_pdf",      # Pillow, pillow_heif, ReportLab
+    "document": "doc_render",  # ReportLab, Pillow (pypandoc on demand)
+    "pages": "pdf_pages",      # PyPDF2
+    "optimize": "pdf_optimize",  # PyPDF2
+    "pdf": "PyPDF2",
+}
+
+LOAD_SECONDS = metrics.Gauge("pdf_backend_load_seconds", "Time taken to import each converter backend.",
+                             ["backend"])
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def get(name):
+    """The module for backend `name`, imported on first use."""
+    module = _loaded.get(name)
+    if module is None:
+        with _lock:
+            module = _loaded.get(name)
+            if module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(BACKENDS[name])
+                LOAD_SECONDS.set(time.perf_counter() - start, backend=name)
+                _loaded[name] = module
+    return module
+
+
+def loaded():
+    """Names of the backends imported so far."""
+    return [name for name in BACKENDS if name in _loaded]
+
+
+def preload(names=None):
+    """Import the given backends (default: all) now instead of on first use.
+
+    Meant for a server that forks its workers (gunicorn --preload): the
+    modules are then imported once in the parent and shared copy-on-write.
+    gc.freeze() keeps the collector from touching those objects later,
+    which would otherwise copy their memory pages into every worker.
+    """
+    for name in names or BACKENDS:
+        get(name)
+    gc.freeze()
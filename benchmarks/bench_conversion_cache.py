@@ -0,0 +1,58 @@
+"""Repeat conversions: cold render vs conversion-cache hit.
+
+Usage:
+    python benchmarks/bench_conversion_cache.py [--images 20] [--size 2400] [--repeats 5]
+
+Runs in a temporary directory. The same image set is converted
+--repeats times through App.convert_images_to_pdf_api. The first run
+renders and fills the cache; the later runs should be hits that produce
+byte-identical PDFs.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--size", type=int, default=2400)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        import App
+
+        src = os.path.join(tmp, "scans")
+        os.makedirs(src)
+        for i in range(args.images):
+            Image.effect_noise((args.size, args.size), 40 + i).convert("RGB").save(
+                os.path.join(src, f"scan{i:03d}.png"))
+
+        outputs = []
+        for run in range(args.repeats):
+            start = time.perf_counter()
+            pdf_name, err = App.convert_images_to_pdf_api("bench", src)
+            elapsed = time.perf_counter() - start
+            if err:
+                sys.exit(err)
+            outputs.append(os.path.join("PDF", pdf_name))
+            print(f"run {run + 1}: {elapsed * 1000:>9.1f} ms")
+
+        first = open(outputs[0], "rb").read()
+        same = all(open(p, "rb").read() == first for p in outputs[1:])
+        print(f"outputs byte-identical: {same}")
+        print(f"cache: {App.conversion_cache.stats()}")
+        os.chdir(ROOT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Image-to-PDF throughput (pages/sec) against decode worker count.
+
+Usage:
+    python benchmarks/bench_decode_pool.py [--pages 64] [--size 4000x3000]
+        [--format heic|jpg|png] [--workers 1 2 4 8 16]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import image_pdf
+
+
+def make_corpus(folder, pages, size, fmt):
+    base = Image.effect_noise(size, 64).convert("RGB")
+    paths = []
+    for i in range(pages):
+        path = os.path.join(folder, f"page_{i:05d}.{fmt}")
+        base.rotate(i % 4 * 90).save(path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--size", default="4000x3000", help="image size WxH")
+    parser.add_argument("--format", default="heic", choices=["heic", "jpg", "png"])
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, 8, 16, cpus}))
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.split("x"))
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_corpus(folder, args.pages, size, args.format)
+        output = os.path.join(folder, "out.pdf")
+        print(f"{args.pages} x {args.size} {args.format}, {cpus} CPUs")
+        print(f"{'workers':>8} {'seconds':>8} {'pages/s':>8} {'speedup':>8}")
+        baseline = None
+        for workers in args.workers:
+            # Start the pool outside the timed region, as a running server would.
+            if workers > 1:
+                image_pdf.get_decode_pool(workers)
+            start = time.perf_counter()
+            image_pdf.write_images_pdf(paths, output, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>8.2f} {args.pages / elapsed:>8.1f} "
+                  f"{baseline / elapsed:>7.2f}x")
+        image_pdf.shutdown_decode_pool()
+
+
+if __name__ == "__main__":
+    main()
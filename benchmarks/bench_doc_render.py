@@ -0,0 +1,79 @@
+"""Document batch conversion: wall time against render worker count.
+
+Usage:
+    python benchmarks/bench_doc_render.py [--files 300] [--paragraphs 40] [--workers 1,2,4,8]
+
+Writes a synthetic batch of .txt and .docx files to a temporary directory
+and renders it through doc_render.render_documents with each worker count.
+Every run's outputs are compared with the first run's to check that
+parallel rendering produces the same bytes.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+import doc_render
+
+WORDS = ["contract", "payment", "account", "invoice", "client", "agreed", "balance",
+         "transfer", "date", "signed", "party", "amount", "terms", "notice", "the", "and"]
+
+
+def make_batch(folder, files, paragraphs, rng):
+    paths = []
+    for i in range(files):
+        text = [" ".join(rng.choices(WORDS, k=rng.randint(20, 120))) for _ in range(paragraphs)]
+        if i % 3 == 0:
+            path = os.path.join(folder, f"doc{i:04d}.docx")
+            doc = Document()
+            for p in text:
+                doc.add_paragraph(p)
+            doc.save(path)
+        else:
+            path = os.path.join(folder, f"doc{i:04d}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(text))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--workers", default="1,2,4,8")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src")
+        os.makedirs(src)
+        paths = make_batch(src, args.files, args.paragraphs, rng)
+        print(f"{args.files} documents, {os.cpu_count()} CPU(s)")
+
+        baseline = None
+        base_time = None
+        for workers in [int(w) for w in args.workers.split(",")]:
+            out = os.path.join(tmp, f"out{workers}")
+            os.makedirs(out)
+            tasks = [(p, os.path.join(out, os.path.basename(p) + ".pdf")) for p in paths]
+            doc_render.get_render_pool(workers)  # exclude pool start-up
+            start = time.perf_counter()
+            errors = doc_render.render_documents(tasks, workers=workers)
+            elapsed = time.perf_counter() - start
+            outputs = [open(o, "rb").read() for _, o in tasks]
+            if baseline is None:
+                baseline, base_time = outputs, elapsed
+            failed = sum(1 for e in errors if e)
+            print(f"workers={workers:<3} {elapsed:>8.2f}s  {base_time / elapsed:>5.2f}x  "
+                  f"failed={failed}  identical={outputs == baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Reading .docx paragraphs: python-docx's object model vs the streaming reader.
+
+Usage:
+    python benchmarks/bench_docx.py [--paragraphs 50000] [--image-mb 8]
+
+Builds one large Word document (headings, bold runs, a table every 50
+paragraphs and an embedded image of about --image-mb MB) and reads its
+text in fresh child processes, once with
+[p.text for p in docx.Document(path).paragraphs] and once with
+markup.docx_paragraphs. Reports parse time and peak RSS for each. The
+streaming reader also returns table rows, which python-docx's
+doc.paragraphs leaves out, so its paragraph count is higher.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rss import peak_rss_mb
+
+WORDS = ["contract", "payment", "account", "invoice", "client", "agreed", "balance",
+         "transfer", "date", "signed", "party", "amount", "terms", "notice", "the", "and"]
+UNIT = 50  # paragraphs per repeated block
+
+
+def make_docx(path, paragraphs, image_mb, rng):
+    """Write a document of about `paragraphs` paragraphs.
+
+    python-docx builds one block (heading, body text, a table, the image)
+    and the block's XML is then repeated, which is much faster than
+    adding every paragraph through python-docx.
+    """
+    from docx import Document
+    from docx.shared import Inches
+    from PIL import Image
+
+    side = max(16, int((image_mb * 1024 * 1024 / 3) ** 0.5))
+    image_path = path + ".png"
+    Image.frombytes("RGB", (side, side), rng.randbytes(side * side * 3)).save(image_path)
+
+    doc = Document()
+    doc.add_heading("Section", 1)
+    for i in range(UNIT - 2):
+        p = doc.add_paragraph(" ".join(rng.choices(WORDS, k=rng.randint(20, 80))))
+        if i % 10 == 0:
+            p.add_run(" important").bold = True
+    table = doc.add_table(rows=3, cols=4)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"{rng.choice(WORDS)} {r}.{c}"
+    doc.add_picture(image_path, width=Inches(2))
+    template = path + ".template.docx"
+    doc.save(template)
+    os.remove(image_path)
+
+    with zipfile.ZipFile(template) as src, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as out:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            if item.filename == "word/document.xml":
+                xml = data.decode("utf-8")
+                m = re.search(r"(<w:body>)(.*?)(<w:sectPr.*)$", xml, re.S)
+                block = m.group(2)
+                xml = xml[:m.start(2)] + block * max(1, paragraphs // UNIT) + m.group(3)
+                data = xml.encode("utf-8")
+            out.writestr(item, data)
+    os.remove(template)
+
+
+def child(mode, path):
+    start = time.perf_counter()
+    count = chars = 0
+    if mode == "python-docx":
+        from docx import Document
+        for text in [p.text for p in Document(path).paragraphs]:
+            count += 1
+            chars += len(text)
+    else:
+        import markup
+        for text in markup.docx_paragraphs(path):
+            count += 1
+            chars += len(text)
+    print(json.dumps({"seconds": time.perf_counter() - start,
+                      "rss_mb": peak_rss_mb(),
+                      "paragraphs": count, "chars": chars}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=50000)
+    parser.add_argument("--image-mb", type=float, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.docx")
+        make_docx(path, args.paragraphs, args.image_mb, random.Random(args.seed))
+        with zipfile.ZipFile(path) as z:
+            xml_mb = z.getinfo("word/document.xml").file_size / 1024 / 1024
+        print(f"{os.path.getsize(path) / 1024 / 1024:.1f} MB .docx, "
+              f"{xml_mb:.1f} MB document.xml, ~{args.paragraphs} paragraphs")
+        for mode in ["python-docx", "streaming"]:
+            out = subprocess.run([sys.executable, __file__, "--child", mode, path],
+                                 capture_output=True, text=True, check=True)
+            r = json.loads(out.stdout)
+            print(f"{mode:>12}  {r['seconds']:>6.2f}s  peak RSS {r['rss_mb']:>7.1f} MB  "
+                  f"{r['paragraphs']} paragraphs, {r['chars']} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Peak RSS of list-based vs streaming image-to-PDF assembly.
+
+Usage:
+    python benchmarks/bench_image_memory.py [--pages 10 100 500] [--size 2000x1500]
+
+Each measurement runs in a fresh subprocess so peak RSS (VmHWM) reflects
+only that conversion.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from rss import peak_rss_mb
+
+
+def make_corpus(folder, pages, size):
+    """Write `pages` noisy JPEGs of the given size into folder."""
+    base = Image.effect_noise(size, 64).convert("RGB")
+    paths = []
+    for i in range(pages):
+        path = os.path.join(folder, f"page_{i:05d}.jpg")
+        base.rotate(i % 4 * 90, expand=False).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def run_list(paths, output):
+    images = [Image.open(p).convert("RGB") for p in paths]
+    images[0].save(output, save_all=True, append_images=images[1:])
+
+
+def run_stream(paths, output):
+    from image_pdf import write_images_pdf
+    write_images_pdf(paths, output)
+
+
+def child(mode, folder):
+    paths = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".jpg"))
+    output = os.path.join(folder, f"out_{mode}.pdf")
+    start = time.perf_counter()
+    {"list": run_list, "stream": run_stream}[mode](paths, output)
+    elapsed = time.perf_counter() - start
+    print(f"{peak_rss_mb():.1f} {elapsed:.3f} {os.path.getsize(output)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--size", default="2000x1500", help="image size WxH")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "FOLDER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    size = tuple(int(v) for v in args.size.split("x"))
+    print(f"{'pages':>6} {'mode':>7} {'peak RSS MB':>12} {'seconds':>8} {'PDF MB':>8}")
+    for pages in args.pages:
+        with tempfile.TemporaryDirectory() as folder:
+            make_corpus(folder, pages, size)
+            for mode in ("list", "stream"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", mode, folder],
+                    check=True, capture_output=True, text=True,
+                ).stdout.split()
+                rss, secs, nbytes = float(out[0]), float(out[1]), int(out[2])
+                print(f"{pages:>6} {mode:>7} {rss:>12.1f} {secs:>8.2f} {nbytes / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Output size and time per page for the image quality/size presets.
+
+Usage:
+    python benchmarks/bench_image_presets.py [--pages 20] [--size 4000x3000]
+
+Builds a mixed corpus of phone-sized photos (half JPEG, half PNG) and
+converts it with:
+  previous   every page decoded and re-encoded as JPEG at full resolution
+             (Pillow's default quality), one point per pixel
+  <preset>   image_pdf.write_images_pdf with each entry of IMAGE_PRESETS
+Decoding runs on one thread so the times compare per-page work.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import image_pdf
+
+
+def make_corpus(folder, pages, size):
+    """Smooth noise scaled up, so the photos compress like real ones."""
+    small = Image.effect_noise((size[0] // 16, size[1] // 16), 48).convert("RGB")
+    base = small.resize(size, Image.BICUBIC)
+    paths = []
+    for i in range(pages):
+        ext = "jpg" if i % 2 == 0 else "png"
+        path = os.path.join(folder, f"page_{i:04d}.{ext}")
+        base.rotate(i % 4 * 90, expand=True).save(path, **({"quality": 90} if ext == "jpg" else {}))
+        paths.append(path)
+    return paths
+
+
+def previous_pages(paths):
+    for path in paths:
+        with Image.open(path) as im:
+            rgb = im.convert("RGB")
+        buf = io.BytesIO()
+        rgb.save(buf, "JPEG")
+        yield buf.getvalue(), rgb.size[0], rgb.size[1]
+
+
+def run(name, output, paths):
+    start = time.perf_counter()
+    if name == "previous":
+        with image_pdf.StreamingImagePdfWriter(output, reproducible=True) as writer:
+            for stream, width, height in previous_pages(paths):
+                writer.add_encoded(stream, width, height)
+    else:
+        image_pdf.write_images_pdf(paths, output, workers=1, reproducible=True, preset=name)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(output)
+    print(f"{name:>10}  {elapsed / len(paths) * 1000:>8.1f} ms/page  "
+          f"{size / len(paths) / 1024:>8.0f} KB/page  total {size / 1024 / 1024:>7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--size", default="4000x3000")
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.split("x"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(tmp, args.pages, size)
+        print(f"{args.pages} pages of {size[0]}x{size[1]} (half JPEG, half PNG)")
+        for name in ["previous", *image_pdf.IMAGE_PRESETS]:
+            run(name, os.path.join(tmp, f"{name}.pdf"), paths)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Line wrapping: reportlab simpleSplit vs layout.wrap.
+
+Usage:
+    python benchmarks/bench_layout.py [--lines 100000] [--fonts Helvetica,Times-Roman,Courier]
+
+Wraps a synthetic log export (--lines log lines, plus some long prose
+paragraphs and non-ASCII text) with both implementations at the page
+width used by the document renderer. It reports the time for each and
+checks that every line break is the same.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+
+import layout
+
+LEVELS = ["INFO", "WARN", "ERROR", "DEBUG"]
+WORDS = ["request", "handled", "user", "session", "timeout", "retry", "cache", "miss",
+         "connection", "reset", "upload", "complete", "bytes", "résumé", "naïve", "€", "—"]
+
+
+def make_paragraphs(count, rng):
+    paragraphs = []
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(4, 30 if i % 50 else 300))
+        paragraphs.append(f"2024-05-01T12:{i % 60:02d}:{i % 59:02d}Z {rng.choice(LEVELS)} "
+                          f"[worker-{i % 8}] " + " ".join(words))
+    return paragraphs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--fonts", default="Helvetica,Times-Roman,Courier")
+    args = parser.parse_args()
+    rng = random.Random(42)
+    paragraphs = make_paragraphs(args.lines, rng)
+    max_width = A4[0] - 2 * 60
+
+    for font in args.fonts.split(","):
+        start = time.perf_counter()
+        expected = [simpleSplit(p, font, 12, max_width) for p in paragraphs]
+        t_rl = time.perf_counter() - start
+
+        layout.get_measurer.cache_clear()
+        start = time.perf_counter()
+        got = [layout.wrap(p, font, 12, max_width) for p in paragraphs]
+        t_new = time.perf_counter() - start
+
+        lines = sum(map(len, expected))
+        print(f"{font:>14}  simpleSplit {t_rl:>7.2f}s  layout.wrap {t_new:>7.2f}s  "
+              f"({t_rl / t_new:.1f}x)  {lines} lines  identical={got == expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Per-file latency of markdown-to-plain conversion for many small notes.
+
+Usage:
+    python benchmarks/bench_markup.py [--files 1000]
+
+Compares three ways of turning --files small .md notes into plain text:
+  pandoc per file   one pypandoc.convert_text call (one pandoc process) per note,
+                    as before
+  pandoc batched    markup.pandoc_plain_batch, PANDOC_BATCH_SIZE notes per process
+  python fast path  markup.markdown_to_plain, no subprocess
+The pandoc modes are skipped if pandoc is not installed. Set
+PDF_PANDOC_SERVER to measure a running pandoc server instead of the CLI.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pypandoc
+
+import markup
+
+WORDS = ["meeting", "notes", "action", "follow", "up", "client", "review", "draft",
+         "budget", "plan", "team", "status", "update", "next", "week", "done"]
+
+
+def make_note(rng):
+    lines = [f"# {' '.join(rng.choices(WORDS, k=3)).title()}", ""]
+    for _ in range(rng.randint(2, 5)):
+        words = rng.choices(WORDS, k=rng.randint(15, 40))
+        words[rng.randrange(len(words))] = f"**{rng.choice(WORDS)}**"
+        words[rng.randrange(len(words))] = f"[{rng.choice(WORDS)}](https://example.com)"
+        lines += [" ".join(words), ""]
+    lines += [f"- {' '.join(rng.choices(WORDS, k=5))}" for _ in range(rng.randint(1, 4))]
+    return "\n".join(lines) + "\n"
+
+
+def report(name, latencies, total):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:>18}  total {total:>8.2f}s  p50 {statistics.median(latencies) * 1000:>8.3f}ms  "
+          f"p99 {p99 * 1000:>8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1000)
+    args = parser.parse_args()
+    rng = random.Random(42)
+    notes = [make_note(rng) for _ in range(args.files)]
+    print(f"{args.files} notes, {sum(map(len, notes)) / args.files:.0f} bytes each on average")
+
+    try:
+        pypandoc.get_pandoc_path()
+        have_pandoc = True
+    except OSError:
+        have_pandoc = bool(markup.PANDOC_SERVER)
+    if not have_pandoc:
+        print("pandoc not installed: skipping the pandoc modes")
+    else:
+        latencies = []
+        start = time.perf_counter()
+        for note in notes:
+            t = time.perf_counter()
+            pypandoc.convert_text(note, "plain", format="md")
+            latencies.append(time.perf_counter() - t)
+        report("pandoc per file", latencies, time.perf_counter() - start)
+
+        # A batch's latency is shared by its notes
+        latencies = []
+        start = time.perf_counter()
+        for i in range(0, len(notes), markup.PANDOC_BATCH_SIZE):
+            chunk = notes[i:i + markup.PANDOC_BATCH_SIZE]
+            t = time.perf_counter()
+            markup.pandoc_plain_batch(chunk, "markdown")
+            latencies += [(time.perf_counter() - t) / len(chunk)] * len(chunk)
+        report("pandoc batched", latencies, time.perf_counter() - start)
+
+    latencies = []
+    fallbacks = 0
+    start = time.perf_counter()
+    for note in notes:
+        t = time.perf_counter()
+        fallbacks += markup.markdown_to_plain(note) is None
+        latencies.append(time.perf_counter() - t)
+    report("python fast path", latencies, time.perf_counter() - start)
+    print(f"notes needing pandoc: {fallbacks}")
+
+
+if __name__ == "__main__":
+    main()
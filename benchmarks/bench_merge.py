@@ -0,0 +1,107 @@
+"""Merging many PDFs: PyPDF2's PdfWriter vs the streaming pdf_pages copier.
+
+Usage:
+    python benchmarks/bench_merge.py [--files 500] [--pages 2] [--steps 100,500]
+
+Writes --files small PDFs that each embed the same logo image and use
+the same fonts, like outputs of one conversion batch, then merges the
+first N of them for each N in --steps. Each merge runs in a fresh child
+process so peak RSS is per run. The streaming copier's peak RSS should
+stay about the same as N grows; PdfWriter holds the whole output until
+it writes it.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rss import peak_rss_mb
+
+
+def make_inputs(folder, files, pages):
+    from PIL import Image
+    from reportlab.pdfgen import canvas
+
+    logo = os.path.join(folder, "logo.png")
+    Image.effect_noise((400, 400), 40).convert("RGB").save(logo)
+    paths = []
+    for i in range(files):
+        path = os.path.join(folder, f"in_{i:04d}.pdf")
+        c = canvas.Canvas(path, invariant=1)
+        for j in range(pages):
+            c.setFont("Helvetica-Bold", 16)
+            c.drawString(72, 760, f"Report {i}, page {j + 1}")
+            c.setFont("Times-Roman", 11)
+            for n in range(40):
+                c.drawString(72, 720 - n * 14, f"Line {n}: figures for item {i * 100 + n}")
+            c.drawImage(logo, 400, 700, 120, 120)
+            c.showPage()
+        c.save()
+        paths.append(path)
+    return paths
+
+
+def child(mode, output, paths):
+    start = time.perf_counter()
+    if mode == "pypdf2":
+        from PyPDF2 import PdfReader, PdfWriter
+        writer = PdfWriter()
+        for path in paths:
+            for page in PdfReader(path).pages:
+                writer.add_page(page)
+        with open(output, "wb") as f:
+            writer.write(f)
+        deduplicated = 0
+    else:
+        from pdf_pages import merge_pdfs
+        deduplicated = merge_pdfs(paths, output)["deduplicated"]
+    print(json.dumps({"seconds": time.perf_counter() - start,
+                      "rss_mb": peak_rss_mb(),
+                      "output_mb": os.path.getsize(output) / 1024 / 1024,
+                      "deduplicated": deduplicated}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--steps", default="100,500")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], args.child[1], args.child[2:])
+        return
+
+    steps = [min(int(s), args.files) for s in args.steps.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_inputs(tmp, args.files, args.pages)
+        size = sum(os.path.getsize(p) for p in paths) / 1024 / 1024
+        print(f"{args.files} inputs, {args.pages} page(s) each, {size:.1f} MB in total")
+        streaming_rss = []
+        for n in steps:
+            for mode in ["pypdf2", "streaming"]:
+                output = os.path.join(tmp, f"out_{mode}.pdf")
+                out = subprocess.run([sys.executable, __file__, "--child", mode, output, *paths[:n]],
+                                     capture_output=True, text=True)
+                if out.returncode != 0:
+                    print(f"{mode:>10} {n:>5} files  failed: {out.stderr.strip().splitlines()[-1]}")
+                    continue
+                r = json.loads(out.stdout)
+                if mode == "streaming":
+                    streaming_rss.append(r["rss_mb"])
+                print(f"{mode:>10} {n:>5} files  {r['seconds']:>7.2f}s  peak RSS {r['rss_mb']:>7.1f} MB  "
+                      f"output {r['output_mb']:>7.1f} MB  shared objects {r['deduplicated']}")
+                os.remove(output)
+        if len(streaming_rss) > 1:
+            growth = streaming_rss[-1] / streaming_rss[0] - 1
+            print(f"streaming peak RSS growth from {steps[0]} to {steps[-1]} files: {growth:+.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Output-number allocation latency: directory scan vs SQLite sequence.
+
+Usage:
+    python benchmarks/bench_numbering.py [--files 100 10000 100000] [--repeat 200]
+
+Also checks that concurrent processes never receive the same number.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from numbering import next_number
+
+
+def legacy_next_number(pdf_folder):
+    """The previous get_next_number(): list the folder and regex every name."""
+    pattern = r"\[(\d+)\]_.*\.pdf$"
+    existing = [f for f in os.listdir(pdf_folder) if re.search(pattern, f)]
+    numbers = [int(re.search(pattern, f).group(1)) for f in existing]
+    return max(numbers) + 1 if numbers else 1
+
+
+def populate(folder, count):
+    for i in range(1, count + 1):
+        open(os.path.join(folder, f"Output[{i}]_2024-01-01_00-00-00.pdf"), "wb").close()
+
+
+def time_per_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def allocate_many(args):
+    folder, count = args
+    return [next_number(folder) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'files':>8} {'scan µs':>10} {'sequence µs':>12}")
+    for count in args.files:
+        with tempfile.TemporaryDirectory() as folder:
+            populate(folder, count)
+            legacy = time_per_call(lambda: legacy_next_number(folder), max(1, args.repeat // 10))
+            assert next_number(folder) == count + 1  # first call seeds from the folder
+            seq = time_per_call(lambda: next_number(folder), args.repeat)
+            print(f"{count:>8} {legacy:>10.0f} {seq:>12.0f}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        with Pool(8) as pool:
+            results = pool.map(allocate_many, [(folder, 250)] * 8)
+        numbers = [n for chunk in results for n in chunk]
+        unique = len(set(numbers)) == len(numbers)
+        print(f"{len(numbers)} allocations from 8 processes: "
+              f"{'all unique ✅' if unique else 'DUPLICATES ❌'}")
+        if not unique:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
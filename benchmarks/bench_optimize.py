@@ -0,0 +1,197 @@
+"""Output size and first-page time, with and without the optimize stage.
+
+Usage:
+    python benchmarks/bench_optimize.py [--doc-paragraphs 600] [--images 12]
+                                        [--mbps 8] [--rtt 50]
+
+Builds a document PDF, an image PDF and a merge of the two the way the app
+does, then optimizes each with pdf_optimize. For every file it reports the
+size before and after and the optimize time, and serves both versions from
+a local HTTP server throttled to --mbps and --rtt to time how long a viewer
+waits for the first page:
+- plain: the whole file is downloaded, then page 1 is rendered. This is
+  all a viewer can do when the cross-reference table is at the end.
+- linearized: the first KB is fetched, the /E offset read from the
+  linearization dictionary and bytes up to /E fetched in one Range
+  request, as pdf.js and MuPDF do for fast web view files. The benchmark
+  checks with PyPDF2 that every object page 1 uses lies before /E, and
+  adds page 1's render time (pymupdf cannot open a partial file, so it
+  renders from the complete file).
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject
+
+import corpus
+import doc_render
+import image_pdf
+import pdf_optimize
+import pdf_pages
+
+HEAD = 1024  # bytes fetched first to find the linearization dictionary
+CHUNK = 16 * 1024
+
+
+def make_handler(folder, bytes_per_second, rtt):
+    class Handler(SimpleHTTPRequestHandler):
+        """Static files with single Range requests, slowed to a link's speed and latency."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=folder, **kwargs)
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(rtt)
+            path = self.translate_path(self.path)
+            size = os.path.getsize(path)
+            start, end = 0, size - 1
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            if match:
+                start = int(match[1])
+                end = min(int(match[2] or end), end)
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            with open(path, "rb") as f:
+                f.seek(start)
+                left = end - start + 1
+                while left:
+                    chunk = f.read(min(CHUNK, left))
+                    self.wfile.write(chunk)
+                    left -= len(chunk)
+                    time.sleep(len(chunk) / bytes_per_second)
+
+    return Handler
+
+
+def fetch(url, start=None, end=None):
+    request = urllib.request.Request(url)
+    if start is not None:
+        request.add_header("Range", f"bytes={start}-{'' if end is None else end}")
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def render_first_page(data):
+    start = time.perf_counter()
+    doc = fitz.open(stream=data, filetype="pdf")
+    doc[0].get_pixmap(dpi=96)
+    doc.close()
+    return time.perf_counter() - start
+
+
+def first_page_in_prefix(path, end):
+    """Whether every object the first page uses (not its parents) starts before `end`."""
+    reader = PdfReader(path)
+    seen = set()
+    todo = [reader.pages[0].indirect_reference]
+    while todo:
+        ref = todo.pop()
+        if ref.idnum in seen:
+            continue
+        seen.add(ref.idnum)
+        number = reader.xref_objStm.get(ref.idnum, (ref.idnum,))[0]
+        if reader.xref[0][number] >= end:
+            return False
+        values = [ref.get_object()]
+        while values:
+            value = values.pop()
+            if isinstance(value, IndirectObject):
+                todo.append(value)
+            elif isinstance(value, DictionaryObject):
+                values.extend(v for k, v in value.items() if k != "/Parent")
+            elif isinstance(value, ArrayObject):
+                values.extend(value)
+    return True
+
+
+def first_page_time(url, path):
+    """(seconds to first page, bytes fetched, prefix holds page 1 or None if not linearized)."""
+    start = time.perf_counter()
+    head = fetch(url, 0, HEAD - 1)
+    match = re.search(rb"/Linearized 1 /L (\d+)[^>]*/E (\d+)", head)
+    if match is None:
+        data = head + fetch(url, HEAD)
+        return time.perf_counter() - start + render_first_page(data), len(data), None
+    end = int(match[2])
+    data = head + fetch(url, HEAD, end - 1)
+    waited = time.perf_counter() - start
+    with open(path, "rb") as f:
+        rendered = render_first_page(f.read())
+    return waited + rendered, len(data), first_page_in_prefix(path, end)
+
+
+def make_outputs(folder, paragraphs, images, rng):
+    doc_src = os.path.join(folder, "report.txt")
+    with open(doc_src, "w", encoding="utf-8") as f:
+        for _ in range(paragraphs):
+            f.write(" ".join(rng.choices(corpus.WORDS, k=rng.randint(10, 120))) + "\n")
+    doc = os.path.join(folder, "document.pdf")
+    doc_render.render_document(doc_src, doc)
+
+    sizes = [(1600, 1200), (1200, 1600), (640, 480)]
+    paths = corpus.make_images(os.path.join(folder, "images"), images, rng, sizes=sizes,
+                               formats=[("jpg", "JPEG"), ("png", "PNG")])
+    img = os.path.join(folder, "images.pdf")
+    image_pdf.write_images_pdf(paths, img, workers=1, reproducible=True)
+
+    merged = os.path.join(folder, "merged.pdf")
+    pdf_pages.merge_pdfs([doc, img, doc], merged)
+    return [doc, img, merged]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doc-paragraphs", type=int, default=600)
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--mbps", type=float, default=8.0, help="link speed in Mbit/s")
+    parser.add_argument("--rtt", type=float, default=50.0, help="round trip time in ms")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = make_outputs(tmp, args.doc_paragraphs, args.images, random.Random(42))
+        server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                     make_handler(tmp, args.mbps * 1e6 / 8, args.rtt / 1000))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}/"
+        print(f"link: {args.mbps:g} Mbit/s, {args.rtt:g} ms RTT")
+        print(f"{'file':>14} {'pages':>6} {'before':>10} {'after':>10} {'optimize':>9} "
+              f"{'first page':>11} {'optimized':>10} {'fetched':>10}")
+        try:
+            for path in outputs:
+                name = os.path.basename(path)
+                optimized = path[:-4] + ".opt.pdf"
+                start = time.perf_counter()
+                report = pdf_optimize.optimize_pdf(path, optimized)
+                elapsed = time.perf_counter() - start
+                before, _, _ = first_page_time(base + name, path)
+                after, fetched, covered = first_page_time(base + os.path.basename(optimized), optimized)
+                print(f"{name:>14} {report['pages']:>6} {report['before'] / 1024:>8.0f}KB "
+                      f"{report['after'] / 1024:>8.0f}KB {elapsed:>8.2f}s {before:>10.2f}s "
+                      f"{after:>9.2f}s {fetched / 1024:>8.0f}KB"
+                      + ("" if covered else "  (page 1 not within /E!)"))
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
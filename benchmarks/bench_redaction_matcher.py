@@ -0,0 +1,111 @@
+"""Redaction term matching: per-term str.replace loop vs compiled matcher.
+
+Usage:
+    python benchmarks/bench_redaction_matcher.py [--terms 5000] [--pages 500]
+
+Builds a synthetic PDF, extracts its page text once (timed separately),
+then times only the matching step so the two approaches are comparable.
+"""
+import argparse
+import io
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import redaction
+
+WORDS = ["contract", "payment", "account", "the", "and", "invoice", "client", "agreed",
+         "balance", "transfer", "date", "signed", "party", "amount", "terms", "notice"]
+
+
+def make_terms(count, rng):
+    terms = []
+    for i in range(count):
+        if i % 2:
+            terms.append(f"ACCT-{rng.randrange(10**7, 10**8)}")
+        else:
+            first = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 8))).title()
+            last = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10))).title()
+            terms.append(f"{first} {last}")
+    return terms
+
+
+def make_pdf(pages, terms, rng):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    for _ in range(pages):
+        c.setFont("Helvetica", 9)
+        y = A4[1] - 40
+        for _ in range(60):
+            words = rng.choices(WORDS, k=12)
+            if rng.random() < 0.3:
+                words.insert(rng.randrange(len(words)), rng.choice(terms))
+            c.drawString(30, y, " ".join(words))
+            y -= 12
+        c.showPage()
+    c.save()
+    buf.seek(0)
+    return buf
+
+
+def legacy_redact(texts, terms):
+    out = []
+    for text in texts:
+        for t in terms:
+            if t.strip():
+                text = text.replace(t, "[REDACTED]")
+        out.append(text)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=5000)
+    parser.add_argument("--pages", type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    terms = make_terms(args.terms, rng)
+    pdf = make_pdf(args.pages, terms, rng)
+
+    start = time.perf_counter()
+    texts = [p.extract_text() or "" for p in PdfReader(pdf).pages]
+    extract = time.perf_counter() - start
+    print(f"{args.pages} pages, {args.terms} terms, text extraction {extract:.2f}s")
+
+    start = time.perf_counter()
+    legacy = legacy_redact(texts, terms)
+    t_legacy = time.perf_counter() - start
+
+    rules = terms + [{"term": r"\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){3,7}\b", "regex": True}]
+    start = time.perf_counter()
+    matcher = redaction.get_matcher(rules)
+    t_compile = time.perf_counter() - start
+    start = time.perf_counter()
+    redaction.get_matcher(rules)
+    t_cached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = [matcher.redact(t)[0] for t in texts]
+    t_match = time.perf_counter() - start
+
+    literal_only = redaction.get_matcher(terms)
+    same = [literal_only.redact(t)[0] for t in texts] == legacy
+    print(f"{'str.replace loop':>24} {t_legacy:>8.3f}s")
+    print(f"{'compile (cold)':>24} {t_compile:>8.3f}s")
+    print(f"{'compile (cached)':>24} {t_cached * 1e6:>8.0f}µs")
+    print(f"{'compiled scan':>24} {t_match:>8.3f}s  ({t_legacy / t_match:.0f}x faster)")
+    print(f"literal-only output identical to legacy: {same}")
+    del compiled
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Cold start: import-time breakdown and time to first request.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--top 15]
+
+Prints the `python -X importtime -c "import App"` self time summed per
+top-level package, then starts the app in fresh processes, both with
+lazy backends (the default) and with PDF_PRELOAD=1, and times:
+  import     importing App
+  request    the first request after import (GET /api/outputs)
+  convert    the first image conversion, which is where lazy mode
+             imports Pillow and ReportLab
+The medians over --repeat runs are reported, along with peak RSS
+(VmHWM) after the import.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+CHILD = r"""
+import json, os, sys, time
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+from rss import peak_rss_mb
+start = time.perf_counter()
+import App
+imported = time.perf_counter()
+rss = peak_rss_mb()
+client = App.app.test_client()
+assert client.get('/api/outputs').status_code == 200
+requested = time.perf_counter()
+from PIL import Image
+os.makedirs('img')
+Image.new('RGB', (640, 480), 'white').save('img/page.png')
+name, err = App.convert_images_to_pdf_api('bench', 'img')
+assert err is None, err
+converted = time.perf_counter()
+print(json.dumps({'import': imported - start, 'request': requested - imported,
+                  'convert': converted - requested, 'rss_mb': rss}))
+"""
+
+
+def import_breakdown(workdir):
+    """Self import time in ms per top-level package, largest first."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, {ROOT!r}); import App"],
+                         cwd=workdir, capture_output=True, text=True, check=True)
+    totals = defaultdict(float)
+    app_total = 0.0
+    for line in out.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if not m:
+            continue
+        totals[m.group(4).split(".")[0]] += int(m.group(1)) / 1000
+        if m.group(4) == "App":
+            app_total = int(m.group(2)) / 1000
+    return sorted(totals.items(), key=lambda kv: -kv[1]), app_total
+
+
+def run_once(preload):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PDF_CACHE_MAX_BYTES="0")
+        if preload:
+            env["PDF_PRELOAD"] = "1"
+        out = subprocess.run([sys.executable, "-c", f"ROOT = {ROOT!r}\n{CHILD}"],
+                             cwd=workdir, env=env, capture_output=True, text=True, check=True)
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        breakdown, app_total = import_breakdown(workdir)
+    print(f"import App: {app_total:.1f} ms cumulative; self time per package:")
+    for package, ms in breakdown[:args.top]:
+        print(f"  {package:<24} {ms:>8.1f} ms")
+
+    print(f"\n{'mode':>8} {'import':>10} {'request':>10} {'convert':>10} {'RSS':>10}")
+    for preload in (False, True):
+        runs = [run_once(preload) for _ in range(args.repeat)]
+        med = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+        print(f"{'preload' if preload else 'lazy':>8} {med['import'] * 1000:>8.1f}ms "
+              f"{med['request'] * 1000:>8.1f}ms {med['convert'] * 1000:>8.1f}ms {med['rss_mb']:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
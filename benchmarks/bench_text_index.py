@@ -0,0 +1,84 @@
+"""Term redaction with and without the upload's text index.
+
+Usage:
+    python benchmarks/bench_text_index.py [--pages 300] [--hit-rate 0.02]
+
+Builds a synthetic text PDF where a secret appears on some lines, then
+times building the index, a preview search through it, and redacting the
+secret once by parsing every page and once from the index. It also checks
+that both outputs have the same text and that the secret is gone.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import redaction
+import text_index
+
+SECRET = "ACCT-99887766"
+WORDS = ["contract", "payment", "account", "invoice", "client", "agreed",
+         "balance", "transfer", "date", "signed", "party", "amount"]
+
+
+def make_pdf(path, pages, hit_rate, rng):
+    c = canvas.Canvas(path, pagesize=A4)
+    for _ in range(pages):
+        c.setFont("Helvetica", 9)
+        y = A4[1] - 40
+        for _ in range(55):
+            words = rng.choices(WORDS, k=12)
+            if rng.random() < hit_rate:
+                words[rng.randrange(12)] = SECRET
+            c.drawString(30, y, " ".join(words))
+            y -= 12
+        c.showPage()
+    c.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--hit-rate", type=float, default=0.02, help="fraction of lines with the secret")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "filing.pdf")
+        make_pdf(src, args.pages, args.hit_rate, random.Random(42))
+        print(f"{args.pages} pages, {os.path.getsize(src) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        index = text_index.build_index(src)
+        print(f"{'build index':>16} {time.perf_counter() - start:>8.2f}s  "
+              f"({os.path.getsize(text_index.index_path(src)) / 1e6:.1f} MB)")
+
+        matcher = redaction.get_matcher([SECRET])
+        start = time.perf_counter()
+        found = text_index.load_index(src).search(matcher)
+        print(f"{'search':>16} {(time.perf_counter() - start) * 1000:>7.1f}ms  "
+              f"({sum(count for _, count in found.values())} matches on {len(found)} pages)")
+
+        outputs = {}
+        for label, idx in (("redact (parse)", None), ("redact (index)", index)):
+            out = outputs[label] = os.path.join(tmp, f"{label.split()[1][1:-1]}.pdf")
+            start = time.perf_counter()
+            stats = redaction.redact_pdf_file(src, out, terms=[SECRET], index=idx)
+            print(f"{label:>16} {time.perf_counter() - start:>8.2f}s  "
+                  f"({stats['matches']} matches, {stats['pages']} pages rewritten)")
+
+        texts = [[page.extract_text() or "" for page in PdfReader(path).pages]
+                 for path in outputs.values()]
+        print(f"same text either way: {texts[0] == texts[1]}")
+        print(f"secret still present: {sum(SECRET in t for t in texts[1])} page(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Peak memory and time for rendering one huge .txt file.
+
+Usage:
+    python benchmarks/bench_text_stream.py [--mb 200] [--mode both|buffered|streaming]
+
+Writes a synthetic log of about --mb megabytes and renders it to PDF
+in a fresh child process per mode, reporting wall time, peak RSS and
+output size:
+  buffered   the old path: read the whole file, wrap every line, draw on
+             a reportlab Canvas (which keeps every page until save)
+  streaming  doc_render.render_document: lines read lazily, wrapped in
+             batches, pages written to disk as they fill
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rss import peak_rss_mb
+
+LEVELS = ["INFO", "WARN", "ERROR", "DEBUG"]
+WORDS = ["request", "handled", "user", "session", "timeout", "retry", "cache", "miss",
+         "connection", "reset", "upload", "complete", "bytes", "résumé", "naïve"]
+
+
+def make_log(path, mb):
+    rng = random.Random(42)
+    target = mb * 1024 * 1024
+    with open(path, "w", encoding="utf-8") as f:
+        i = 0
+        while f.tell() < target:
+            lines = []
+            for _ in range(1000):
+                words = rng.choices(WORDS, k=rng.randint(4, 30 if i % 50 else 200))
+                lines.append(f"2024-05-01T12:{i % 60:02d}:{i % 59:02d}Z {rng.choice(LEVELS)} "
+                             f"[worker-{i % 8}] " + " ".join(words))
+                i += 1
+            f.write("\n".join(lines) + "\n")
+
+
+def render_buffered(input_path, output_path):
+    from reportlab.pdfgen import canvas
+
+    from doc_render import DOC_LAYOUT, draw_lines
+    from layout import layout_paragraphs
+
+    layout = DOC_LAYOUT
+    paragraphs = open(input_path, "r", encoding="utf-8").read().split("\n")
+    c = canvas.Canvas(output_path, pagesize=layout["pagesize"], invariant=1)
+    width, height = layout["pagesize"]
+    margin = layout["margin"]
+    y = height - 80
+    c.setFont(layout["titleFont"], layout["titleSize"])
+    c.drawString(margin, y, "log")
+    y -= 30
+    c.setFont(layout["font"], layout["size"])
+    for lines in layout_paragraphs(paragraphs, layout["font"], layout["size"], width - 2 * margin):
+        y = draw_lines(c, lines, margin, y, layout["font"], layout["size"], layout["leading"])
+        y -= 10
+    c.save()
+
+
+def child(mode, input_path, output_path):
+    start = time.perf_counter()
+    if mode == "buffered":
+        render_buffered(input_path, output_path)
+    else:
+        from doc_render import render_document
+        render_document(input_path, output_path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed,
+                      "rss_mb": peak_rss_mb(),
+                      "output_mb": os.path.getsize(output_path) / 1024 / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=200)
+    parser.add_argument("--mode", default="both", choices=["both", "buffered", "streaming"])
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "log.txt")
+        make_log(input_path, args.mb)
+        print(f"input: {os.path.getsize(input_path) / 1024 / 1024:.0f} MB")
+        modes = ["buffered", "streaming"] if args.mode == "both" else [args.mode]
+        for mode in modes:
+            output_path = os.path.join(tmp, f"{mode}.pdf")
+            out = subprocess.run([sys.executable, __file__, "--child", mode, input_path, output_path],
+                                 capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"{mode:>10}  failed: {out.stderr.strip().splitlines()[-1]}")
+                continue
+            r = json.loads(out.stdout)
+            print(f"{mode:>10}  {r['seconds']:>8.2f}s  peak RSS {r['rss_mb']:>8.1f} MB  "
+                  f"output {r['output_mb']:>7.1f} MB")
+            os.remove(output_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Synthetic input corpora for the benchmark suite.
+
+Usage:
+    python benchmarks/corpus.py OUT_DIR [--images 20] [--docs 20] [--pdf-pages 50] [--seed 42]
+
+Writes images/, documents/ and redact/ folders under OUT_DIR with the
+same files benchmarks/suite.py converts, so a corpus can be inspected or
+reused with other tools. Everything is derived from --seed, so the same
+arguments always give the same files.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pillow_heif
+from docx import Document
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+pillow_heif.register_heif_opener()
+
+# (width, height) of generated images: thumbnail, screenshot, phone photo
+IMAGE_SIZES = [(640, 480), (1920, 1080), (4032, 3024)]
+IMAGE_FORMATS = [("jpg", "JPEG"), ("png", "PNG"), ("heic", "HEIF")]
+# Paragraph counts of generated documents: note, report, long export
+DOC_LENGTHS = [5, 60, 600]
+DOC_FORMATS = ["txt", "md", "docx"]
+
+WORDS = ["contract", "payment", "account", "invoice", "client", "agreed", "balance",
+         "transfer", "date", "signed", "party", "amount", "terms", "notice", "the", "and",
+         "résumé", "naïve", "€"]
+# Redaction targets sprinkled through the PDFs
+SECRETS = ["ACME-4471", "jane.doe@example.com", "IBAN DE44500105175407324931"]
+
+
+def _photo(size, rng):
+    """Smooth noise scaled up, so it compresses like a real photo."""
+    small_size = (max(1, size[0] // 16), max(1, size[1] // 16))
+    small = Image.frombytes("RGB", small_size, rng.randbytes(small_size[0] * small_size[1] * 3))
+    return small.resize(size, Image.BICUBIC)
+
+
+def make_images(folder, count, rng, sizes=IMAGE_SIZES, formats=IMAGE_FORMATS):
+    """Write `count` images cycling through sizes and formats. Returns their paths."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        ext, fmt = formats[(i // len(sizes)) % len(formats)]
+        path = os.path.join(folder, f"img_{i:04d}.{ext}")
+        image = _photo(size if i % 2 else size[::-1], rng)
+        image.save(path, format=fmt, **({"quality": 90} if fmt != "PNG" else {}))
+        paths.append(path)
+    return paths
+
+
+def _paragraph(rng):
+    return " ".join(rng.choices(WORDS, k=rng.randint(10, 120)))
+
+
+def make_documents(folder, count, rng, lengths=DOC_LENGTHS, formats=DOC_FORMATS):
+    """Write `count` documents cycling through lengths and formats. Returns their paths."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        paragraphs = [_paragraph(rng) for _ in range(lengths[i % len(lengths)])]
+        ext = formats[(i // len(lengths)) % len(formats)]
+        path = os.path.join(folder, f"doc_{i:04d}.{ext}")
+        if ext == "docx":
+            doc = Document()
+            for p in paragraphs:
+                doc.add_paragraph(p)
+            doc.save(path)
+        elif ext == "md":
+            lines = [f"# Report {i}", ""]
+            for n, p in enumerate(paragraphs):
+                lines += [f"## Section {n}" if n % 10 == 0 else f"- **{p.split()[0]}** {p}", ""]
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(paragraphs))
+        paths.append(path)
+    return paths
+
+
+def make_pdf(path, pages, rng):
+    """Write a text PDF of `pages` pages with a few SECRETS on most pages."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    c = canvas.Canvas(path, pagesize=A4, invariant=1)
+    for _ in range(pages):
+        c.setFont("Helvetica", 10)
+        y = A4[1] - 60
+        while y > 60:
+            words = rng.choices(WORDS, k=12)
+            if rng.random() < 0.1:
+                words.insert(rng.randrange(len(words)), rng.choice(SECRETS))
+            c.drawString(50, y, " ".join(words))
+            y -= 14
+        c.showPage()
+    c.save()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out")
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pdf-pages", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    make_images(os.path.join(args.out, "images"), args.images, rng)
+    make_documents(os.path.join(args.out, "documents"), args.docs, rng)
+    make_pdf(os.path.join(args.out, "redact", "sample.pdf"), args.pdf_pages, rng)
+    print(f"Corpus written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
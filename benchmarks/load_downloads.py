@@ -0,0 +1,136 @@
+"""Load test: server RSS and throughput for concurrent large PDF downloads.
+
+Usage:
+    python benchmarks/load_downloads.py [--clients 50] [--size-mb 100] [--rounds 1]
+
+Starts the app in a threaded werkzeug server in a scratch directory and
+downloads one large PDF from many clients at once, through both the old
+read-everything-into-memory handler (registered as /legacy/<name> for
+comparison) and through the streaming /RedactPDF viewer endpoint.
+Server RSS is sampled from /proc while the downloads run (Linux only).
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER = """
+import os, sys
+from flask import Response
+from werkzeug.serving import run_simple
+import App
+
+@App.app.route('/legacy/<ws_id>/<filename>')
+def legacy(ws_id, filename):
+    with open(os.path.join('workspaces', ws_id, filename), 'rb') as f:
+        content = f.read()
+    return Response(content, mimetype='application/pdf')
+
+run_simple('127.0.0.1', int(sys.argv[1]), App.app, threaded=True)
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def download(port, path, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    total = 0
+    while True:
+        chunk = resp.read(1 << 16)
+        if not chunk:
+            break
+        total += len(chunk)
+    conn.close()
+    results.append(total)
+
+
+def run_round(port, pid, path, clients):
+    results, peak = [], [rss_mb(pid)]
+    threads = [threading.Thread(target=download, args=(port, path, results)) for _ in range(clients)]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak.append(rss_mb(pid))
+            time.sleep(0.02)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    return max(peak), sum(results), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        ws_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(workdir, "workspaces", ws_id))
+        with open(os.path.join(workdir, "workspaces", ws_id, "big.pdf"), "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1 << 20))
+
+        port = free_port()
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        server = subprocess.Popen([sys.executable, "-c", SERVER, str(port)], cwd=workdir,
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(100):
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            idle = rss_mb(server.pid)
+            print(f"{args.clients} clients x {args.size_mb} MB, idle server RSS {idle:.0f} MB")
+            print(f"{'endpoint':>10} {'peak RSS MB':>12} {'seconds':>8} {'MB/s':>8}")
+            # Streaming first: memory freed by the legacy run is not always
+            # returned to the OS and would inflate the later samples.
+            for name, path in (("streaming", f"/RedactPDF/{ws_id}/big.pdf"),
+                               ("legacy", f"/legacy/{ws_id}/big.pdf")):
+                for _ in range(args.rounds):
+                    peak, nbytes, elapsed = run_round(port, server.pid, path, args.clients)
+                    expected = args.clients * args.size_mb << 20
+                    flag = "" if nbytes == expected else f"  (short read: {nbytes}/{expected})"
+                    print(f"{name:>10} {peak:>12.0f} {elapsed:>8.2f} "
+                          f"{nbytes / 1e6 / elapsed:>8.0f}{flag}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
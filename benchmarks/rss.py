@@ -0,0 +1,22 @@
+"""Peak memory of the current process, for benchmarks that measure it.
+
+Kept apart from corpus.py, which imports Pillow, python-docx and
+ReportLab: a measured child process should load only what it measures.
+"""
+import resource
+import sys
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process since it was started, in MB."""
+    # VmHWM starts afresh at exec; ru_maxrss would include the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
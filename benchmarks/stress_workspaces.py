@@ -0,0 +1,86 @@
+"""Concurrency stress test: parallel upload/convert sessions never mix outputs.
+
+Usage:
+    python benchmarks/stress_workspaces.py [--sessions 50] [--processes 4] [--pages 5]
+
+Sessions are spread over several processes (like gunicorn workers) that
+share one working directory. Every session uploads images whose width
+encodes its session number, converts them, and checks that its PDF holds
+exactly its own pages. Exits non-zero on any mix-up.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_session(session, pages):
+    from PIL import Image
+    from PyPDF2 import PdfReader
+    import App
+
+    client = App.app.test_client()
+    files = []
+    for page in range(pages):
+        buf = io.BytesIO()
+        Image.new("RGB", (100 + session, 50 + page), "white").save(buf, "PNG")
+        buf.seek(0)
+        files.append((buf, f"page_{page:03d}.png"))
+
+    res = client.post("/api/upload", data={"type": "image", "files": files},
+                      content_type="multipart/form-data")
+    if res.status_code != 200:
+        return f"session {session}: upload failed {res.json}"
+    # "original" keeps one point per pixel, which the page size check below relies on
+    res = client.post("/api/convert", json={"type": "image", "baseName": "stress", "preset": "original",
+                                            "workspace": res.json["workspace"]})
+    if res.status_code != 200:
+        return f"session {session}: convert failed {res.json}"
+
+    reader = PdfReader(os.path.join("PDF", res.json["pdfs"][0]))
+    sizes = [(int(p.mediabox.width), int(p.mediabox.height)) for p in reader.pages]
+    expected = [(100 + session, 50 + page) for page in range(pages)]
+    if sizes != expected:
+        return f"session {session}: expected {expected}, got {sizes}"
+    return None
+
+
+def run_worker(args):
+    sessions, pages = args
+    with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+        return [e for e in pool.map(lambda s: run_session(s, pages), sessions) if e]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("PDF_DECODE_WORKERS", "1")
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        chunks = [(list(range(i, args.sessions, args.processes)), args.pages)
+                  for i in range(args.processes)]
+        with Pool(args.processes) as pool:
+            errors = [e for errs in pool.map(run_worker, chunks) for e in errs]
+        leftover = os.listdir("workspaces") if os.path.isdir("workspaces") else []
+
+    for e in errors:
+        print(f"❌ {e}")
+    if leftover:
+        print(f"❌ {len(leftover)} workspace(s) left behind")
+    if errors or leftover:
+        sys.exit(1)
+    print(f"✅ {args.sessions} sessions across {args.processes} processes, no mixing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""Benchmark suite for every conversion path, with JSON results for regression checks.
+
+Usage:
+    python benchmarks/suite.py [--scenarios images_api,docs_api,...] [--repeat 5]
+                               [--images 12] [--docs 12] [--pdf-pages 50]
+                               [--out results.json] [--baseline old.json] [--tolerance 0.2]
+
+Generates a synthetic corpus (see benchmarks/corpus.py) and runs each
+scenario in a fresh child process with its own working directory, so
+peak RSS belongs to that scenario alone and no state leaks between them.
+The conversion cache is disabled so every iteration does the real work.
+
+Scenarios:
+  images_api   convert_images_to_pdf_api on the image folder (JPEG/PNG/HEIC)
+  docs_api     convert_docs_to_pdf_api on the document folder (.txt/.md/.docx)
+  redact       upload + /api/redact of a multi-page PDF through the test client
+               (only the redact request is timed)
+  http_images  upload + /api/convert + /api/download of the images
+  http_docs    upload + /api/convert + /api/download of the documents
+  download     /api/download of an existing PDF
+
+For each scenario the JSON records latency p50/p99/mean per iteration,
+throughput in units (pages, documents or bytes) per second, and peak
+RSS. With --baseline, results are compared to an earlier run and the
+exit status is 1 if any p50 latency or peak RSS grew by more than
+--tolerance.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+from rss import peak_rss_mb
+
+SCENARIOS = ["images_api", "docs_api", "redact", "http_images", "http_docs", "download"]
+SMALL_UPLOAD = 8 * 1024 * 1024  # larger files go through the chunked upload API
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+def _files(folder):
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder))
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def upload(client, path, file_type, ws_id=None):
+    """Upload one file like the web UI does; returns the workspace id."""
+    name = os.path.basename(path)
+    size = os.path.getsize(path)
+    if size < SMALL_UPLOAD:
+        data = {"type": file_type}
+        if ws_id:
+            data["workspace"] = ws_id
+        with open(path, "rb") as f:
+            data["files"] = (f, name)
+            return _check(client.post("/api/upload", data=data)).json["workspace"]
+
+    started = _check(client.post("/api/uploads", json={
+        "type": file_type, "filename": name, "size": size, "workspace": ws_id})).json
+    ws_id, upload_id, chunk = started["workspace"], started["uploadId"], started["chunkSize"]
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            body = f.read(chunk)
+            if not body:
+                break
+            _check(client.put(f"/api/uploads/{upload_id}?workspace={ws_id}&offset={offset}",
+                              data=body,
+                              headers={"X-Chunk-SHA256": hashlib.sha256(body).hexdigest()}))
+            offset += len(body)
+    _check(client.post(f"/api/uploads/{upload_id}/finalize", json={"workspace": ws_id}))
+    return ws_id
+
+
+def _remove_outputs(names):
+    for name in names:
+        path = os.path.join("PDF", name)
+        if os.path.exists(path):
+            os.remove(path)
+
+# --------------------------------------------------
+# Scenarios
+# --------------------------------------------------
+# Each takes (App, corpus_dir, repeat) and returns (latencies, units, unit_name).
+
+def run_images_api(App, corpus_dir, repeat):
+    folder = os.path.join(corpus_dir, "images")
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        name, err = App.convert_images_to_pdf_api("bench", folder)
+        latencies.append(time.perf_counter() - start)
+        if err:
+            raise RuntimeError(err)
+        _remove_outputs([name])
+    return latencies, len(os.listdir(folder)) * repeat, "pages"
+
+
+def run_docs_api(App, corpus_dir, repeat):
+    folder = os.path.join(corpus_dir, "documents")
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        names, err = App.convert_docs_to_pdf_api("bench", folder)
+        latencies.append(time.perf_counter() - start)
+        if err:
+            raise RuntimeError(err)
+        _remove_outputs(names)
+    return latencies, len(os.listdir(folder)) * repeat, "documents"
+
+
+def run_redact(App, corpus_dir, repeat):
+    from PyPDF2 import PdfReader
+
+    path = os.path.join(corpus_dir, "redact", "sample.pdf")
+    pages = len(PdfReader(path).pages)
+    client = App.app.test_client()
+    latencies = []
+    for _ in range(repeat):
+        ws_id = upload(client, path, "redact")
+        start = time.perf_counter()
+        response = _check(client.post("/api/redact", json={
+            "filename": "sample.pdf", "terms": corpus.SECRETS, "workspace": ws_id}))
+        latencies.append(time.perf_counter() - start)
+        _remove_outputs([response.json["pdf"]])
+    return latencies, pages * repeat, "pages"
+
+
+def _http_convert(App, folder, file_type, repeat):
+    client = App.app.test_client()
+    paths = _files(folder)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ws_id = None
+        for path in paths:
+            ws_id = upload(client, path, file_type, ws_id)
+        names = _check(client.post("/api/convert", json={
+            "type": file_type, "baseName": "bench", "workspace": ws_id})).json["pdfs"]
+        for name in names:
+            response = _check(client.get(f"/api/download/{name}"))
+            response.get_data()
+            response.close()
+        latencies.append(time.perf_counter() - start)
+        _remove_outputs(names)
+    return latencies, len(paths) * repeat, "files"
+
+
+def run_http_images(App, corpus_dir, repeat):
+    return _http_convert(App, os.path.join(corpus_dir, "images"), "image", repeat)
+
+
+def run_http_docs(App, corpus_dir, repeat):
+    return _http_convert(App, os.path.join(corpus_dir, "documents"), "document", repeat)
+
+
+def run_download(App, corpus_dir, repeat):
+    name, err = App.convert_images_to_pdf_api("bench", os.path.join(corpus_dir, "images"))
+    if err:
+        raise RuntimeError(err)
+    size = os.path.getsize(os.path.join("PDF", name))
+    client = App.app.test_client()
+    latencies = []
+    for _ in range(repeat * 10):
+        start = time.perf_counter()
+        response = _check(client.get(f"/api/download/{name}"))
+        for _chunk in response.response:
+            pass
+        response.close()
+        latencies.append(time.perf_counter() - start)
+    return latencies, size * repeat * 10, "bytes"
+
+# --------------------------------------------------
+# Runner
+# --------------------------------------------------
+
+def child(name, corpus_dir, result_path, repeat):
+    """Run one scenario in this (fresh) process and write its result as JSON."""
+    import App
+
+    # Keep served PDFs around for the whole run
+    App.app.config["DOWNLOAD_TTL"] = 24 * 3600
+    latencies, units, unit_name = globals()[f"run_{name}"](App, corpus_dir, repeat)
+    total = sum(latencies)
+    result = {
+        "iterations": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "throughput": units / total if total else 0.0,
+        "unit": f"{unit_name}/s",
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+def run_scenario(name, corpus_dir, repeat):
+    with tempfile.TemporaryDirectory() as workdir:
+        result_path = os.path.join(workdir, "result.json")
+        env = dict(os.environ, PDF_CACHE_MAX_BYTES="0")
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", name, corpus_dir, result_path,
+             "--repeat", str(repeat)],
+            cwd=workdir, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            lines = (out.stderr or out.stdout).strip().splitlines()
+            return {"error": lines[-1] if lines else f"exit status {out.returncode}"}
+        with open(result_path) as f:
+            return json.load(f)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against a baseline run; returns the names that regressed."""
+    regressed = []
+    for name, now in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or "error" in now or "error" in before:
+            continue
+        p50 = now["p50_ms"] / before["p50_ms"] - 1
+        rss = now["peak_rss_mb"] / before["peak_rss_mb"] - 1
+        flag = p50 > tolerance or rss > tolerance
+        if flag:
+            regressed.append(name)
+        print(f"{name:>12}  p50 {p50:>+7.1%}  rss {rss:>+7.1%}  {'REGRESSION' if flag else 'ok'}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--docs", type=int, default=12)
+    parser.add_argument("--pdf-pages", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child, repeat=args.repeat)
+        return
+
+    names = [n for n in args.scenarios.split(",") if n]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    results = {
+        "revision": git_revision(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("child", "baseline", "out")},
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        rng = random.Random(args.seed)
+        corpus.make_images(os.path.join(corpus_dir, "images"), args.images, rng)
+        corpus.make_documents(os.path.join(corpus_dir, "documents"), args.docs, rng)
+        corpus.make_pdf(os.path.join(corpus_dir, "redact", "sample.pdf"), args.pdf_pages, rng)
+
+        for name in names:
+            result = run_scenario(name, corpus_dir, args.repeat)
+            results["scenarios"][name] = result
+            if "error" in result:
+                print(f"{name:>12}  failed: {result['error']}")
+            else:
+                print(f"{name:>12}  p50 {result['p50_ms']:>9.1f}ms  p99 {result['p99_ms']:>9.1f}ms  "
+                      f"{result['throughput']:>10.1f} {result['unit']:<12}  "
+                      f"peak RSS {result['peak_rss_mb']:>7.1f} MB")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
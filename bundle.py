@@ -0,0 +1,57 @@
+import os
+import time
+import zipfile
+
+# ZIP archives streamed to the client while they are built. PDFs are
+# compressed already, so entries are stored as they are. The archive is
+# written to an unseekable sink, which makes zipfile put each entry's
+# CRC and sizes in a data descriptor after its data instead of seeking
+# back, so no temporary archive is needed and only one read chunk is
+# held in memory at a time.
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _Sink:
+    """Write-only file object that hands what zipfile writes to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(files, chunk_size=CHUNK_SIZE):
+    """Yield a ZIP archive of `files`, a list of (archive name, open binary file).
+
+    Each file is closed once its entry has been written, or when the
+    generator is closed early.
+    """
+    sink = _Sink()
+    try:
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+            for name, f in files:
+                st = os.fstat(f.fileno())
+                info = zipfile.ZipInfo(name, time.localtime(st.st_mtime)[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                info.file_size = st.st_size  # picks ZIP64 headers for files over 4 GB
+                info.external_attr = 0o644 << 16
+                with f, archive.open(info, 'w') as entry:
+                    for chunk in iter(lambda: f.read(chunk_size), b''):
+                        entry.write(chunk)
+                        yield sink.take()
+                yield sink.take()
+        yield sink.take()
+    finally:
+        for _, f in files:
+            f.close()
@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+import time
+
+from conversion_cache import hash_file
+from numbering import NUMBER_PATTERN
+
+CATALOG_FILE = '.catalog.db'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS outputs (
+    name TEXT PRIMARY KEY,
+    number INTEGER,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    source TEXT,
+    job TEXT,
+    created REAL NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS outputs_created ON outputs (created, name);
+CREATE INDEX IF NOT EXISTS outputs_expires ON outputs (expires_at) WHERE expires_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS outputs_number ON outputs (number);
+'''
+_COLUMNS = ('name', 'number', 'size', 'sha256', 'source', 'job', 'created', 'expires_at')
+_SELECT = f"SELECT {', '.join(_COLUMNS)} FROM outputs"
+_INSERT = (f"INSERT OR REPLACE INTO outputs ({', '.join(_COLUMNS)}) "
+           f"VALUES ({', '.join('?' * len(_COLUMNS))})")
+
+
+class OutputCatalog:
+    """Index of the PDFs in the output folder, kept in a SQLite file there.
+
+    Every output is recorded with its number, size, sha256, what produced
+    it (`source`, plus `job` for background jobs), its creation time and,
+    once it has been served, when it expires. Lookups, listings and expiry
+    queries go through indexes instead of listing the folder. Each write
+    is a single statement or transaction, so other threads and processes
+    never see a half-updated entry.
+    """
+
+    def __init__(self, pdf_folder='PDF'):
+        self.pdf_folder = pdf_folder
+        self.db_path = os.path.abspath(os.path.join(pdf_folder, CATALOG_FILE))
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.pdf_folder, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection, e.g. before the process forks."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def path(self, name):
+        return os.path.join(self.pdf_folder, name)
+
+    def _entry(self, name, created, source=None, job=None, st=None):
+        path = self.path(name)
+        st = st or os.stat(path)
+        m = NUMBER_PATTERN.search(name)
+        return (name, int(m.group(1)) if m else None, st.st_size, hash_file(path),
+                source, job, created, None)
+
+    def add(self, name, source=None, job=None):
+        """Record the freshly written output `name` (replacing any old entry).
+
+        It is dated now, not by its mtime: a conversion cache hit links in
+        a file written by an earlier conversion.
+        """
+        self._conn().execute(_INSERT, self._entry(name, time.time(), source, job))
+
+    def remove(self, names):
+        """Forget the given output names."""
+        self._conn().executemany('DELETE FROM outputs WHERE name = ?', [(n,) for n in names])
+
+    def get(self, name):
+        """The entry for name as a dict, or None if there is no such output."""
+        row = self._conn().execute(f'{_SELECT} WHERE name = ?', (name,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def set_expiry(self, name, expires_at):
+        self._conn().execute('UPDATE outputs SET expires_at = ? WHERE name = ?', (expires_at, name))
+
+    def recent(self, limit=50, before=None):
+        """Newest outputs first, `limit` at a time.
+
+        `before` is the `next` cursor of the previous page. Returns
+        (entries, next cursor or None).
+        """
+        if before:
+            created, _, name = before.partition(':')
+            rows = self._conn().execute(
+                f'{_SELECT} WHERE (created, name) < (?, ?) ORDER BY created DESC, name DESC LIMIT ?',
+                (float(created), name, limit + 1)).fetchall()
+        else:
+            rows = self._conn().execute(f'{_SELECT} ORDER BY created DESC, name DESC LIMIT ?',
+                                        (limit + 1,)).fetchall()
+        entries = [dict(zip(_COLUMNS, row)) for row in rows[:limit]]
+        cursor = f"{entries[-1]['created']!r}:{entries[-1]['name']}" if len(rows) > limit else None
+        return entries, cursor
+
+    def expiring(self, before, limit=500):
+        """Entries whose expiry is at or before `before`, soonest first."""
+        rows = self._conn().execute(
+            f'{_SELECT} WHERE expires_at <= ? ORDER BY expires_at LIMIT ?', (before, limit))
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def max_number(self):
+        """Highest output number recorded, or 0."""
+        return self._conn().execute('SELECT MAX(number) FROM outputs').fetchone()[0] or 0
+
+    def reconcile(self):
+        """Resync with the folder: add untracked PDFs, drop entries whose file is gone.
+
+        Files already recorded with the same size are not re-hashed.
+        Returns (added, removed) counts.
+        """
+        conn = self._conn()
+        on_disk = {}
+        for entry in os.scandir(self.pdf_folder):
+            if entry.name.endswith('.pdf') and entry.is_file():
+                on_disk[entry.name] = entry.stat()
+        known = dict(conn.execute('SELECT name, size FROM outputs'))
+
+        removed = [name for name in known if name not in on_disk]
+        changed = [name for name, st in on_disk.items() if known.get(name) != st.st_size]
+        # Hash outside the transaction so other writers are not held up
+        entries = []
+        for name in changed:
+            try:
+                # Nothing better is known about files found on disk
+                entries.append(self._entry(name, on_disk[name].st_mtime, st=on_disk[name]))
+            except FileNotFoundError:
+                removed.append(name)
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('DELETE FROM outputs WHERE name = ?', [(n,) for n in removed])
+            conn.executemany(_INSERT, entries)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if entries or removed:
+            print(f"🗂️ Output catalog: {len(entries)} added, {len(removed)} removed")
+        return len(entries), len(removed)
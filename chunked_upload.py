@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Resumable uploads live inside the workspace they belong to, so they are
+# reaped with it. Each upload has a .json record (target name and declared
+# size) and a .part file whose length is the number of bytes received.
+UPLOAD_DIR = '.uploads'
+READ_BLOCK = 64 * 1024
+# Where flock() is missing, a lock file older than this was left by a
+# worker that died mid-request and is taken over
+LOCK_STALE = 300  # seconds
+
+
+class UploadError(Exception):
+    """A chunked upload request that cannot be applied. `status` is the HTTP code."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _paths(ws_dir, upload_id):
+    if not upload_id or len(upload_id) != 32 or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError('Upload not found', 404)
+    base = os.path.join(ws_dir, UPLOAD_DIR, upload_id)
+    return base + '.json', base + '.part', base + '.lock'
+
+
+def _load(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise UploadError('Upload not found', 404)
+
+
+class _Lock:
+    """Exclusive per-upload lock that works across worker processes.
+
+    A second request for the same upload while one is running gets a 409
+    rather than waiting, since the client is expected to send one chunk
+    at a time. With flock() the kernel drops the lock when its holder
+    dies, so a crashed worker never blocks the upload; the lock file
+    itself stays until the workspace is reaped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(self.path, os.O_CREAT | os.O_WRONLY)
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(self.fd)
+                raise UploadError('Another request for this upload is in progress', 409)
+            return self
+        try:
+            os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            if not self._take_stale():
+                raise UploadError('Another request for this upload is in progress', 409)
+        return self
+
+    def _take_stale(self):
+        """Replace a lock file left by a dead worker. False if it is still fresh."""
+        try:
+            if time.time() - os.path.getmtime(self.path) < LOCK_STALE:
+                return False
+            os.remove(self.path)
+            os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except (FileNotFoundError, FileExistsError):
+            return False  # another request got there first
+        return True
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            os.close(self.fd)  # releases the flock
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def init_upload(ws_dir, filename, size, kind):
+    """Register an upload of `size` bytes that will be saved as filename."""
+    os.makedirs(os.path.join(ws_dir, UPLOAD_DIR), exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    meta_path, part_path, _ = _paths(ws_dir, upload_id)
+    open(part_path, 'wb').close()
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'filename': filename, 'size': size, 'type': kind}, f)
+    return upload_id
+
+
+def upload_status(ws_dir, upload_id):
+    """Current state of an upload, for clients resuming after a failure."""
+    meta_path, part_path, _ = _paths(ws_dir, upload_id)
+    meta = _load(meta_path)
+    return {
+        'uploadId': upload_id,
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'offset': os.path.getsize(part_path),
+    }
+
+
+def append_chunk(ws_dir, upload_id, offset, stream, checksum):
+    """Append the bytes read from stream at offset and return the new offset.
+
+    The body is copied to disk in READ_BLOCK pieces while its sha256 is
+    computed. If it does not match `checksum` the file is truncated back
+    to offset, so the client can simply resend the chunk.
+    """
+    meta_path, part_path, lock_path = _paths(ws_dir, upload_id)
+    meta = _load(meta_path)
+    if not checksum:
+        raise UploadError('Missing X-Chunk-SHA256 header')
+
+    with _Lock(lock_path):
+        received = os.path.getsize(part_path)
+        if offset != received:
+            raise UploadError(f'Expected offset {received}, got {offset}', 409, received)
+
+        digest = hashlib.sha256()
+        written = 0
+        with open(part_path, 'r+b') as f:
+            f.seek(offset)
+            try:
+                while True:
+                    block = stream.read(READ_BLOCK)
+                    if not block:
+                        break
+                    written += len(block)
+                    if offset + written > meta['size']:
+                        raise UploadError('Chunk runs past the declared file size', 413, offset)
+                    digest.update(block)
+                    f.write(block)
+                if digest.hexdigest() != checksum.lower():
+                    raise UploadError('Chunk checksum mismatch', 400, offset)
+            except BaseException:
+                f.truncate(offset)
+                raise
+        return offset + written
+
+
+def finalize_upload(ws_dir, upload_id, checksum=None):
+    """Move a complete upload into the workspace. Returns (filename, type).
+
+    checksum, if given, is the sha256 of the whole file.
+    """
+    meta_path, part_path, lock_path = _paths(ws_dir, upload_id)
+    meta = _load(meta_path)
+    with _Lock(lock_path):
+        received = os.path.getsize(part_path)
+        if received != meta['size']:
+            raise UploadError(f"Upload incomplete: {received} of {meta['size']} bytes", 409, received)
+        if checksum:
+            digest = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(READ_BLOCK * 16), b''):
+                    digest.update(block)
+            if digest.hexdigest() != checksum.lower():
+                raise UploadError('File checksum mismatch', 400)
+        os.replace(part_path, os.path.join(ws_dir, meta['filename']))
+        os.remove(meta_path)
+    return meta['filename'], meta['type']
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+# Format version of cached outputs. Bump it whenever a converter change
+# would render the same input differently, so stale entries stop matching.
+CACHE_VERSION = 4
+HASH_CHUNK = 1024 * 1024
+INDEX_FILE = '.cache.db'
+
+# Recency and sizes of the entries, shared by every worker process. The
+# entry files are hard-linked to served outputs, so their own mtime must
+# not be touched; `total` keeps the summed size, so a put() need not scan.
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS total (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+'''
+
+
+def hash_file(path):
+    """sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(kind, inputs, options):
+    """Key for one conversion: converter type, input digests and layout options.
+
+    `inputs` is an ordered list of JSON-serialisable items (usually file
+    digests, plus anything else that ends up in the output such as a title).
+    """
+    payload = json.dumps([CACHE_VERSION, kind, inputs, options], sort_keys=True,
+                         separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _place(src, dest):
+    """Hard-link src to dest, copying if the two are on different filesystems."""
+    try:
+        os.link(src, dest)
+    except OSError:
+        tmp = dest + '.tmp'
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+
+
+class ConversionCache:
+    """Content-addressed store of converted PDFs with LRU eviction.
+
+    Entries are plain files named after their key, so every worker process
+    shares the cache. Outputs are hard-linked in and out where possible,
+    so a hit costs no copy and deleting a served PDF leaves the cached
+    entry in place. Last use and size of each entry are kept in a SQLite
+    index in the cache folder, with a running total: once it passes
+    max_bytes, the least recently used entries are deleted. `suffix` is
+    the file extension of the entries.
+    """
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, suffix='.pdf'):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.db_path = os.path.abspath(os.path.join(root, INDEX_FILE))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, key + self.suffix)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._import_existing(conn)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection, e.g. before the process forks."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _import_existing(self, conn):
+        """Index entries left by a cache without an index (their mtime is the last use)."""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('SELECT 1 FROM total').fetchone() is None:
+                rows = []
+                for entry in os.scandir(self.root):
+                    if entry.name.endswith(self.suffix):
+                        try:
+                            st = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        rows.append((entry.name[:-len(self.suffix)], st.st_size, st.st_mtime))
+                conn.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', rows)
+                conn.execute('INSERT INTO total VALUES (0, ?)', (sum(r[1] for r in rows),))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _record(self, conn, key, size):
+        """Insert or resize key's row and keep the total in step. Runs inside a transaction."""
+        old = conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (key, size, time.time()))
+        conn.execute('UPDATE total SET bytes = bytes + ?', (size - (old[0] if old else 0),))
+
+    def get(self, key, dest):
+        """Materialise the cached output for key at dest. Returns True on a hit."""
+        if self.max_bytes <= 0:
+            return False
+        path = self._path(key)
+        try:
+            _place(path, dest)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        conn = self._conn()
+        if conn.execute('UPDATE entries SET used = ? WHERE key = ?', (time.time(), key)).rowcount == 0:
+            # Written by put() in another process just before it indexed it
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._record(conn, key, os.path.getsize(dest))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(self, key, src):
+        """Store the freshly converted file src under key."""
+        if self.max_bytes <= 0:
+            return
+        conn = self._conn()
+        path = self._path(key)
+        # Link under a temporary name first so readers never see a partial entry
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            _place(src, tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ Could not cache {src}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._record(conn, key, os.path.getsize(src))
+            total = conn.execute('SELECT bytes FROM total').fetchone()[0]
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if total > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes."""
+        conn = self._conn()
+        removed = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            total = conn.execute('SELECT bytes FROM total').fetchone()[0]
+            victims = []
+            if total > self.max_bytes:
+                for key, size in conn.execute('SELECT key, size FROM entries ORDER BY used'):
+                    if total <= self.max_bytes:
+                        break
+                    victims.append(key)
+                    total -= size
+            for key in victims:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            conn.executemany('DELETE FROM entries WHERE key = ?', [(k,) for k in victims])
+            conn.execute('UPDATE total SET bytes = ?', (total,))
+            conn.execute('COMMIT')
+            removed = len(victims)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if removed:
+            with self._lock:
+                self.evictions += removed
+            print(f"🧹 Evicted {removed} cached conversion(s)")
+        return removed
+
+    def stats(self):
+        entries, size = 0, 0
+        if self.max_bytes > 0:
+            conn = self._conn()
+            entries = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            size = conn.execute('SELECT bytes FROM total').fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': size,
+                'maxBytes': self.max_bytes,
+            }
@@ -1,16 +1,9 @@
-from PIL import Image
 import os
-import re
 from datetime import datetime
-import pillow_heif
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import simpleSplit
-from docx import Document
-import pypandoc
-
-# Enable HEIC/HEIF support
-pillow_heif.register_heif_opener()
+import backends
+from markup import docx_paragraphs, plain_paragraphs
+from numbering import next_number as reserve_numbers
+from settings import A4
 
 
 def images_to_pdf(img_folder="img", pdf_folder="PDF", base_name=None):
@@ -36,19 +29,16 @@ def images_to_pdf(img_folder="img", pdf_folder="PDF", base_name=None):
         return None  # Return None for Flask to handle
 
     image_files.sort()
-    images = [Image.open(os.path.join(img_path, img)).convert("RGB") for img in image_files]
+    image_paths = [os.path.join(img_path, img) for img in image_files]
 
-    # Find next available number for PDF naming
-    pattern = r"\[(\d+)\]_.*\.pdf$"
-    existing_files = [f for f in os.listdir(pdf_path) if re.search(pattern, f)]
-    numbers = [int(re.search(pattern, f).group(1)) for f in existing_files]
-    next_number = max(numbers) + 1 if numbers else 1
+    # Reserve the next number for PDF naming
+    next_number = reserve_numbers(pdf_path)
 
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     output_pdf = f"{base_name}[{next_number}]_{timestamp}.pdf"
     output_path = os.path.join(pdf_path, output_pdf)
 
-    images[0].save(output_path, save_all=True, append_images=images[1:])
+    backends.get('image').write_images_pdf(image_paths, output_path)
     print(f"✅ PDF created successfully: {output_path}")
 
     # Automatically open PDF only if running standalone
@@ -66,7 +56,8 @@ def images_to_pdf(img_folder="img", pdf_folder="PDF", base_name=None):
 
 def draw_wrapped_text(c, text, x, y, width, font_name="Helvetica", font_size=12, leading=16):
     """Draw text with word wrapping"""
-    lines = simpleSplit(text, font_name, font_size, width)
+    from layout import wrap
+    lines = wrap(text, font_name, font_size, width)
     for line in lines:
         if y < 60:  # bottom margin
             c.showPage()
@@ -79,6 +70,9 @@ def draw_wrapped_text(c, text, x, y, width, font_name="Helvetica", font_size=12,
 
 def docs_to_pdf(doc_folder="DOC", pdf_folder="PDF", base_name=None):
     """Convert text and document files to well-structured PDFs"""
+    # Loaded here rather than at import so image-only runs skip it
+    from reportlab.pdfgen import canvas
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     doc_path = os.path.join(script_dir, doc_folder)
     pdf_path = os.path.join(script_dir, pdf_folder)
@@ -105,11 +99,8 @@ def docs_to_pdf(doc_folder="DOC", pdf_folder="PDF", base_name=None):
     if base_name is None:
         base_name = input("Enter a base name for your document PDF(s) (e.g. report, notes): ").strip() or "document"
 
-    # Find the next available number
-    pattern = r"\[(\d+)\]_.*\.pdf$"
-    existing_files = [f for f in os.listdir(pdf_path) if re.search(pattern, f)]
-    numbers = [int(re.search(pattern, f).group(1)) for f in existing_files]
-    next_number = max(numbers) + 1 if numbers else 1
+    # Reserve one number per document up front
+    next_number = reserve_numbers(pdf_path, len(doc_files))
 
     created_pdfs = []  # Track created PDFs for Flask
 
@@ -141,15 +132,12 @@ def docs_to_pdf(doc_folder="DOC", pdf_folder="PDF", base_name=None):
 
         try:
             if ext == ".docx":
-                doc = Document(input_file)
-                paragraphs = [p.text for p in doc.paragraphs]
-                write_paragraphs(paragraphs)
-            elif ext in [".txt", ".md", ".rtf", ".odt"]:
+                write_paragraphs(docx_paragraphs(input_file))
+            elif ext in [".md", ".rtf", ".odt"]:
+                write_paragraphs(plain_paragraphs(input_file))
+            elif ext == ".txt":
                 text = open(input_file, "r", encoding="utf-8").read()
-                if ext in [".md", ".rtf", ".odt"]:
-                    text = pypandoc.convert_text(text, "plain", format=ext[1:])
-                paragraphs = text.split("\n")
-                write_paragraphs(paragraphs)
+                write_paragraphs(text.split("\n"))
             else:
                 print(f"⚠️ Unsupported file type: {ext}")
                 continue
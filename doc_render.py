@@ -0,0 +1,319 @@
+import codecs
+import os
+import signal
+import threading
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from reportlab.lib.pagesizes import A4
+
+import markup
+import metrics
+from layout import wrap
+from pools import terminate_pool
+from settings import DOC_LAYOUT
+from text_pdf import TEXT_ENCODING, StreamingTextCanvas
+
+# 0 means one worker per CPU.
+DOC_WORKERS = int(os.environ.get("PDF_DOC_WORKERS", "0"))
+DOC_TIMEOUT = float(os.environ.get("PDF_DOC_TIMEOUT", "60"))  # seconds per file
+# Extra time the parent waits beyond DOC_TIMEOUT before giving up on a worker
+# that did not stop by itself (e.g. stuck inside C code).
+TIMEOUT_GRACE = 5.0
+
+# Plain text is read and laid out a batch of lines at a time, so a multi-GB
+# log needs no more memory than a short note.
+ENCODING_SAMPLE = 64 * 1024  # bytes looked at to guess the encoding
+MAX_LINE_CHARS = 1024 * 1024  # longer lines are split into several paragraphs
+LAYOUT_BATCH = 1000  # paragraphs wrapped at a time
+
+# Longest BOM first: the UTF-32 LE mark starts with the UTF-16 LE one
+_BOMS = [(codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"),
+         (codecs.BOM_UTF8, "utf-8-sig"),
+         (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")]
+
+# --------------------------------------------------
+# Rendering
+# --------------------------------------------------
+
+def draw_wrapped_text(c, text, x, y, width, font="Helvetica", size=12, leading=16):
+    """Draw wrapped text on a PDF canvas."""
+    return draw_lines(c, wrap(text, font, size, width), x, y, font, size, leading)
+
+
+def draw_lines(c, lines, x, y, font="Helvetica", size=12, leading=16):
+    """Draw already wrapped lines, starting a new page when one fills up."""
+    for line in lines:
+        if y < 60:
+            c.showPage()
+            c.setFont(font, size)
+            y = A4[1] - 60
+        c.drawString(x, y, line)
+        y -= leading
+    return y
+
+
+def detect_encoding(path):
+    """Guess a text file's encoding from its BOM and first ENCODING_SAMPLE bytes.
+
+    Without a BOM the sample is tried as UTF-8 (a character cut off at the
+    end of the sample is fine); anything else is taken to be Windows-1252.
+    """
+    with open(path, "rb") as f:
+        head = f.read(ENCODING_SAMPLE)
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def iter_text_lines(path):
+    """Yield the lines of a plain text file one at a time."""
+    # Bytes that do not fit the guessed encoding become U+FFFD instead of failing
+    with open(path, "r", encoding=detect_encoding(path), errors="replace") as f:
+        while True:
+            line = f.readline(MAX_LINE_CHARS)
+            if not line:
+                break
+            yield line
+
+
+def read_paragraphs(input_path):
+    """Return the paragraphs of a .docx/.txt/.md/.rtf/.odt file.
+
+    For .docx and plain text this is a lazy iterator, so the whole file is
+    never held in memory.
+    """
+    ext = os.path.splitext(input_path)[1].lower()
+    if ext == ".docx":
+        return markup.docx_paragraphs(input_path)
+    if ext in [".md", ".rtf", ".odt"]:
+        return markup.plain_paragraphs(input_path)
+    return iter_text_lines(input_path)
+
+
+def layout_blocks(paragraphs, layout, max_width):
+    """(font, wrapped lines) for each non-empty paragraph.
+
+    markup.Heading paragraphs are set in the title font at body size.
+    """
+    blocks = []
+    for p in paragraphs:
+        text = p.strip()
+        if text:
+            font = layout["titleFont"] if isinstance(p, markup.Heading) else layout["font"]
+            blocks.append((font, wrap(text, font, layout["size"], max_width, TEXT_ENCODING)))
+    return blocks
+
+
+def render_document(input_path, output_path, layout=DOC_LAYOUT, paragraphs=None):
+    """Render one document to a PDF titled with its file name.
+
+    paragraphs, if given, were already extracted (see markup.convert_batch).
+    """
+    if paragraphs is None:
+        paragraphs = read_paragraphs(input_path)
+
+    # Pages go to disk as soon as they are full; the output has no
+    # timestamps, so identical input gives identical bytes
+    c = StreamingTextCanvas(output_path, pagesize=layout["pagesize"])
+    try:
+        width, height = layout["pagesize"]
+        margin = layout["margin"]
+        y = height - 80
+
+        c.setFont(layout["titleFont"], layout["titleSize"])
+        c.drawString(margin, y, os.path.splitext(os.path.basename(input_path))[0])
+        y -= 30
+        c.setFont(layout["font"], layout["size"])
+        current_font = layout["font"]
+
+        # Layout and drawing alternate per batch; each is reported once per file
+        layout_time = write_time = 0.0
+        paragraphs = iter(paragraphs)
+        while True:
+            batch = list(islice(paragraphs, LAYOUT_BATCH))
+            if not batch:
+                break
+            start = time.perf_counter()
+            blocks = layout_blocks(batch, layout, width - 2 * margin)
+            layout_time += time.perf_counter() - start
+            start = time.perf_counter()
+            for font, lines in blocks:
+                if font != current_font:
+                    c.setFont(font, layout["size"])
+                    current_font = font
+                y = draw_lines(c, lines, margin, y, font, layout["size"], layout["leading"])
+                y -= 10
+            write_time += time.perf_counter() - start
+        start = time.perf_counter()
+        c.save()
+        write_time += time.perf_counter() - start
+        metrics.STAGE_SECONDS.observe(layout_time, stage="layout")
+        metrics.STAGE_SECONDS.observe(write_time, stage="pdf_write")
+        metrics.PAGES.inc(c.page_count, type="document")
+    except BaseException:
+        # Also on RenderTimeout: leave no half-written PDF behind
+        c.abort()
+        raise
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+def _alarm(signum, frame):
+    raise RenderTimeout()
+
+
+def render_file(input_path, output_path, layout=DOC_LAYOUT, timeout=None, paragraphs=None):
+    """Pool entry point: render one file, returning None or an error message.
+
+    Errors never escape, so one bad file cannot take the batch down. The
+    timeout is enforced with SIGALRM where available, which works because
+    each pool worker runs tasks on its main thread.
+    """
+    use_alarm = (timeout and hasattr(signal, "SIGALRM")
+                 and threading.current_thread() is threading.main_thread())
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        render_document(input_path, output_path, layout, paragraphs)
+        return None
+    except RenderTimeout:
+        error = f"timed out after {timeout:g}s"
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    return error
+
+# --------------------------------------------------
+# Render Pool
+# --------------------------------------------------
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def resolve_workers(workers=None):
+    """Turn a configured worker count (None/0 = auto) into a concrete one."""
+    if workers is None:
+        workers = DOC_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def get_render_pool(workers):
+    """Return the shared render process pool, resizing it if needed."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                terminate_pool(_pool)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def discard_render_pool(pool):
+    """Stop using pool (hung or broken) and kill its workers; the next call gets a fresh one."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_workers = None, 0
+    terminate_pool(pool)
+
+
+def _run_window(tasks, indices, pool_size, timeout, errors, on_done, prepared):
+    """Render tasks[indices] with at most pool_size in flight.
+
+    Returns the indices that were in flight when a worker process died;
+    any one of them may have caused it.
+    """
+    suspects = []
+    queue = deque(indices)
+    window = deque()
+    pool = get_render_pool(pool_size)
+    while queue or window:
+        while queue and len(window) < pool_size:
+            i = queue.popleft()
+            future = pool.submit(metrics.run_captured, render_file, *tasks[i], DOC_LAYOUT, timeout,
+                                 prepared.get(tasks[i][0]))
+            window.append((i, future, time.monotonic()))
+        i, future, started = window.popleft()
+        try:
+            wait = None
+            if timeout:
+                wait = max(0.0, started + timeout + TIMEOUT_GRACE - time.monotonic())
+            errors[i], updates = future.result(timeout=wait)
+            metrics.record(updates)
+        except CancelledError:
+            queue.appendleft(i)  # its pool was discarded before it started
+            continue
+        except TimeoutError:
+            errors[i] = f"timed out after {timeout:g}s"
+            print(f"⚠️ Render worker stuck on {tasks[i][0]}, starting a new pool")
+            discard_render_pool(pool)
+            pool = get_render_pool(pool_size)
+        except BrokenProcessPool:
+            discard_render_pool(pool)
+            pool = get_render_pool(pool_size)
+            suspects.append(i)
+            for j, other, _ in window:
+                if other.done() and not other.cancelled() and other.exception() is None:
+                    errors[j], updates = other.result()
+                    metrics.record(updates)
+                    on_done()
+                else:
+                    suspects.append(j)
+            window.clear()
+            continue
+        on_done()
+    return suspects
+
+
+def render_documents(tasks, workers=None, timeout=None, progress=None):
+    """Render (input_path, output_path) pairs in a process pool.
+
+    Returns one entry per task, in task order: None on success or an
+    error message. Each task gets `timeout` seconds (DOC_TIMEOUT by
+    default). If a worker process dies, the files that were in flight
+    are re-run one at a time, so only the file that kills its worker
+    fails. progress, if given, is called as progress(files_done,
+    files_total).
+    """
+    timeout = DOC_TIMEOUT if timeout is None else timeout
+    pool_size = resolve_workers(workers)
+    errors = [None] * len(tasks)
+    finished = 0
+
+    def on_done():
+        nonlocal finished
+        finished += 1
+        if progress:
+            progress(finished, len(tasks))
+
+    # Files that need pandoc are converted up front, many per pandoc run,
+    # taking at most one file's timeout; the rest are converted in the pool
+    prepared = markup.convert_batch([t[0] for t in tasks], timeout)
+    suspects = _run_window(tasks, range(len(tasks)), pool_size, timeout, errors, on_done, prepared)
+    for i in suspects:
+        if _run_window(tasks, [i], 1, timeout, errors, on_done, prepared):
+            errors[i] = "worker process crashed"
+            on_done()
+    return errors
@@ -0,0 +1,138 @@
+import heapq
+import os
+import sqlite3
+import threading
+import time
+
+
+class ExpiryScheduler:
+    """Delete files once their time-to-live runs out.
+
+    A single thread sleeps until the earliest expiry in a min-heap, then
+    removes every file that is due in one batch. Pending expiries are
+    also written to a SQLite file, so they survive a restart. Entries for
+    a path that has been rescheduled are left stale in the heap and
+    skipped when they come up. `on_expired`, if given, is called with the
+    paths deleted in each batch.
+
+    Several processes can share one database, each with its own heap. A
+    due path is deleted only if its row is still due; a path another
+    process rescheduled goes back on the heap with its new time.
+    """
+
+    def __init__(self, db_path, batch_size=500, on_expired=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.on_expired = on_expired
+        self._heap = []
+        self._due = {}  # path -> expires_at, the authoritative schedule
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._conn = None
+        self.expired = 0
+        self.bytes_reclaimed = 0
+
+    def start(self):
+        """Load persisted expiries and start the deletion thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS expiry (path TEXT PRIMARY KEY, expires_at REAL NOT NULL)')
+            self._conn.commit()
+            for path, expires_at in self._conn.execute('SELECT path, expires_at FROM expiry'):
+                self._due[path] = expires_at
+                self._heap.append((expires_at, path))
+            heapq.heapify(self._heap)
+            self._thread = threading.Thread(target=self._run, name='expiry-scheduler', daemon=True)
+            self._thread.start()
+
+    def schedule(self, path, delay):
+        """Delete path `delay` seconds from now, replacing any earlier schedule."""
+        self.start()
+        path = os.path.abspath(path)
+        expires_at = time.time() + delay
+        with self._lock:
+            self._due[path] = expires_at
+            heapq.heappush(self._heap, (expires_at, path))
+            self._conn.execute('INSERT OR REPLACE INTO expiry (path, expires_at) VALUES (?, ?)',
+                               (path, expires_at))
+            self._conn.commit()
+            if self._heap[0][1] == path:
+                self._wakeup.notify()
+
+    def cancel(self, path):
+        """Forget a pending expiry, e.g. because the file was deleted already."""
+        self.start()
+        path = os.path.abspath(path)
+        with self._lock:
+            if self._due.pop(path, None) is not None:
+                self._conn.execute('DELETE FROM expiry WHERE path = ?', (path,))
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._due),
+                'expired': self.expired,
+                'bytesReclaimed': self.bytes_reclaimed,
+            }
+
+    def _pop_due(self, now):
+        """Pop up to batch_size due paths. Caller holds the lock."""
+        batch = []
+        while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+            expires_at, path = heapq.heappop(self._heap)
+            if self._due.get(path) == expires_at:
+                del self._due[path]
+                batch.append(path)
+        return batch
+
+    def _claim(self, batch, now):
+        """Remove the rows of paths still due and return those paths. Caller holds the lock."""
+        claimed = []
+        for path in batch:
+            if self._conn.execute('DELETE FROM expiry WHERE path = ? AND expires_at <= ?',
+                                  (path, now)).rowcount:
+                claimed.append(path)
+                continue
+            # Rescheduled by another process; gone if it was cancelled or already deleted
+            row = self._conn.execute('SELECT expires_at FROM expiry WHERE path = ?', (path,)).fetchone()
+            if row is not None:
+                self._due[path] = row[0]
+                heapq.heappush(self._heap, (row[0], path))
+        self._conn.commit()
+        return claimed
+
+    def _run(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                while not self._heap or self._heap[0][0] > now:
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    self._wakeup.wait(timeout)
+                    now = time.time()
+                batch = self._claim(self._pop_due(now), now)
+
+            reclaimed = 0
+            for path in batch:
+                try:
+                    reclaimed += os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"⚠️ Could not delete {path}: {e}")
+
+            if batch:
+                print(f"🧹 Auto-deleted {len(batch)} expired file(s)")
+                if self.on_expired:
+                    try:
+                        self.on_expired(batch)
+                    except Exception as e:
+                        print(f"⚠️ Expiry callback failed: {e}")
+            with self._lock:
+                self.expired += len(batch)
+                self.bytes_reclaimed += reclaimed
@@ -0,0 +1,380 @@
+import io
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from PIL import Image, PdfParser, __version__ as PIL_VERSION
+import pillow_heif
+from reportlab.lib.pagesizes import A4, letter
+
+import metrics
+from pools import terminate_pool
+from settings import IMAGE_PRESETS, IMAGE_PRESET
+
+# Enable HEIC/HEIF support
+pillow_heif.register_heif_opener()
+
+# --------------------------------------------------
+# Presets
+# --------------------------------------------------
+
+# Presets are defined in settings.py so the app can validate them without
+# importing this module
+PAGE_SIZES = {"A4": A4, "Letter": letter}
+
+# A page ready to be written: an image stream plus where it goes
+EncodedPage = namedtuple("EncodedPage", "stream width height colorspace page_size")
+
+
+def get_preset(name=None):
+    """Settings of preset `name` (default IMAGE_PRESET). Raises KeyError if unknown."""
+    return IMAGE_PRESETS[name or IMAGE_PRESET]
+
+
+def plan_page(im, preset):
+    """Return (pixel_size, page_size, passthrough) for an opened, undecoded image.
+
+    passthrough is True when the file is a JPEG that needs no resizing or
+    colour conversion, so its bytes can go into the PDF unchanged.
+    """
+    width, height = im.size
+    dpi = preset["dpi"]
+    if preset["fit"]:
+        box_w, box_h = PAGE_SIZES[preset["fit"]]
+        if (width > height) != (box_w > box_h):
+            box_w, box_h = box_h, box_w
+        scale = min(box_w / width, box_h / height)
+        page_size = (width * scale, height * scale)
+        if scale * dpi / 72 < 1:
+            target = (max(1, round(page_size[0] * dpi / 72)), max(1, round(page_size[1] * dpi / 72)))
+        else:
+            target = (width, height)
+    else:
+        page_size = (width * 72.0 / dpi, height * 72.0 / dpi)
+        target = (width, height)
+    passthrough = im.format == "JPEG" and im.mode in ("RGB", "L") and target == (width, height)
+    return target, page_size, passthrough
+
+
+def _colorspace(mode):
+    return "DeviceGray" if mode == "L" else "DeviceRGB"
+
+# --------------------------------------------------
+# Page Encoding
+# --------------------------------------------------
+
+def encode_page(path, preset=None):
+    """Decode one image and return an EncodedPage for it.
+
+    JPEGs that fit the preset are embedded as they are. Everything else is
+    decoded at reduced size where the format allows it (draft() for JPEG,
+    reduce() inside resize() otherwise), scaled down to the preset's pixel
+    budget and encoded as JPEG.
+    """
+    preset = get_preset(preset)
+    with metrics.span("decode"), Image.open(path) as im:
+        target, page_size, passthrough = plan_page(im, preset)
+        if passthrough:
+            with open(path, "rb") as f:
+                return EncodedPage(f.read(), im.size[0], im.size[1], _colorspace(im.mode), page_size)
+        mode = "L" if im.mode == "L" else "RGB"
+        if im.format == "JPEG":
+            # Lets libjpeg decode at 1/2, 1/4 or 1/8 scale, never below target
+            im.draft(mode, target)
+        img = im.convert(mode)
+        if img.size != target:
+            # reduce() box-averages by whole factors first; bicubic does the rest
+            img = img.resize(target, Image.BICUBIC, reducing_gap=1.0)
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=preset["quality"])
+        img.close()
+    return EncodedPage(buf.getvalue(), target[0], target[1], _colorspace(mode), page_size)
+
+
+# Pages encoded ahead of time by prefetch_page() are kept next to the
+# source image, so they stay on disk rather than in memory.
+ENCODED_DIR = ".encoded"
+
+
+def encoded_path(path, preset=None):
+    folder, name = os.path.split(path)
+    return os.path.join(folder, ENCODED_DIR, f"{name}.{preset or IMAGE_PRESET}.jpg")
+
+
+def encode_to_disk(path, preset=None):
+    """Encode path and store the JPEG at encoded_path(path, preset).
+
+    Files that will be embedded unchanged are left alone.
+    """
+    with Image.open(path) as im:
+        if plan_page(im, get_preset(preset))[2]:
+            return
+    page = encode_page(path, preset)
+    dest = encoded_path(path, preset)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(page.stream)
+    os.replace(tmp, dest)
+
+
+def load_page(path, preset=None):
+    """Like encode_page(), but reuses a prefetched JPEG if it is up to date."""
+    cached = encoded_path(path, preset)
+    try:
+        if os.path.getmtime(cached) >= os.path.getmtime(path):
+            with Image.open(path) as im:
+                _, page_size, _ = plan_page(im, get_preset(preset))
+            with open(cached, "rb") as f:
+                stream = f.read()
+            with Image.open(io.BytesIO(stream)) as im:
+                width, height = im.size
+                colorspace = _colorspace(im.mode)
+            return EncodedPage(stream, width, height, colorspace, page_size)
+    except FileNotFoundError:
+        pass
+    return encode_page(path, preset)
+
+# --------------------------------------------------
+# Decode Pool
+# --------------------------------------------------
+
+# 0 means one worker per CPU; 1 decodes on the calling thread.
+DECODE_WORKERS = int(os.environ.get("PDF_DECODE_WORKERS", "0"))
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_prefetching = {}  # abspath -> Future of encode_to_disk, this process only
+
+
+def resolve_workers(workers=None):
+    """Turn a configured worker count (None/0 = auto) into a concrete one."""
+    if workers is None:
+        workers = DECODE_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def get_decode_pool(workers):
+    """Return the shared decode process pool, resizing it if needed."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                terminate_pool(_pool)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_decode_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+
+def prefetch_page(path, workers=None, preset=None):
+    """Start encoding an uploaded image in the decode pool right away.
+
+    The converter picks the result up through load_page() if it converts
+    with the same preset. Does nothing when decoding is single-threaded.
+    """
+    pool_size = resolve_workers(workers)
+    if pool_size <= 1:
+        return None
+    path = os.path.abspath(path)
+    future = get_decode_pool(pool_size).submit(metrics.run_captured, encode_to_disk, path, preset)
+    with _pool_lock:
+        _prefetching[path] = future
+    future.add_done_callback(_prefetch_done(path))
+    return future
+
+
+def _prefetch_done(path):
+    def done(future):
+        _prefetching.pop(path, None)
+        if not future.cancelled() and future.exception() is None:
+            metrics.record(future.result()[1])
+    return done
+
+
+def _wait_for_prefetch(path):
+    with _pool_lock:
+        future = _prefetching.get(os.path.abspath(path))
+    if future is not None:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"⚠️ Prefetch of {path} failed, decoding again: {e}")
+
+
+def iter_encoded_pages(image_paths, workers=None, preset=None):
+    """Yield encode_page() results for image_paths in their original order.
+
+    With more than one worker, pages are decoded in a process pool. At most
+    2 × workers pages are in flight, so memory stays bounded when the writer
+    falls behind. Pages already encoded by prefetch_page() are not decoded
+    again.
+    """
+    pool_size = resolve_workers(workers)
+    workers = min(pool_size, len(image_paths))
+    if workers <= 1:
+        for path in image_paths:
+            _wait_for_prefetch(path)
+            yield load_page(path, preset)
+        return
+
+    pool = get_decode_pool(pool_size)
+
+    def submit(path):
+        _wait_for_prefetch(path)
+        return pool.submit(metrics.run_captured, load_page, path, preset)
+
+    paths = iter(image_paths)
+    window = deque(submit(p) for p in islice(paths, workers * 2))
+    try:
+        while window:
+            future = window.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                window.append(submit(next_path))
+            page, updates = future.result()
+            metrics.record(updates)
+            yield page
+    finally:
+        for future in window:
+            future.cancel()
+
+# --------------------------------------------------
+# Streaming Writer
+# --------------------------------------------------
+
+class StreamingImagePdfWriter:
+    """Write image pages to a PDF one at a time.
+
+    Each page is written to disk as soon as it is added, so only the page
+    currently being encoded is held in memory. The page tree and xref table
+    are written by close(). With reproducible=True the file carries no
+    timestamp or output-name title, so the same pages always give the same
+    bytes.
+    """
+
+    def __init__(self, output_path, resolution=72.0, reproducible=False):
+        self.output_path = output_path
+        self.resolution = resolution
+        self.reproducible = reproducible
+        self.page_count = 0
+        self._fp = open(output_path, "w+b")
+        self._pdf = PdfParser.PdfParser(f=self._fp, mode="w+b")
+        self._pdf.start_writing()
+        self._pdf.write_header()
+        self._pdf.write_comment(f"created by Pillow {PIL_VERSION} PDF driver")
+        self._root_ref = self._pdf.next_object_id(0)
+        self._pages_ref = self._pdf.next_object_id(0)
+        self._pdf.pages_ref = self._pages_ref
+
+    def add_image(self, path, preset=None):
+        """Decode, encode and write the image at path as the next page."""
+        self.add_page(encode_page(path, preset))
+
+    def add_page(self, page):
+        """Write an EncodedPage, sized as it says."""
+        self.add_encoded(page.stream, page.width, page.height, page.colorspace, page.page_size)
+
+    def add_encoded(self, stream, width, height, colorspace="DeviceRGB", page_size=None):
+        """Write an already JPEG-encoded image as the next page.
+
+        page_size is in points; by default one pixel is 72 / resolution points.
+        """
+        pdf = self._pdf
+        image_ref = pdf.write_obj(
+            None,
+            stream=stream,
+            Type=PdfParser.PdfName("XObject"),
+            Subtype=PdfParser.PdfName("Image"),
+            Width=width,
+            Height=height,
+            Filter=PdfParser.PdfName("DCTDecode"),
+            BitsPerComponent=8,
+            ColorSpace=PdfParser.PdfName(colorspace),
+        )
+
+        if page_size is None:
+            page_size = (width * 72.0 / self.resolution, height * 72.0 / self.resolution)
+        page_w, page_h = page_size
+        contents_ref = pdf.write_obj(
+            None, stream=b"q %f 0 0 %f 0 0 cm /image Do Q\n" % (page_w, page_h)
+        )
+        page_ref = pdf.write_page(
+            None,
+            Resources=PdfParser.PdfDict(
+                ProcSet=[PdfParser.PdfName("PDF"), PdfParser.PdfName("ImageC")],
+                XObject=PdfParser.PdfDict(image=image_ref),
+            ),
+            MediaBox=[0, 0, page_w, page_h],
+            Contents=contents_ref,
+        )
+        pdf.pages.append(page_ref)
+        self.page_count += 1
+
+    def close(self):
+        """Write the page tree, catalog and trailer and close the file."""
+        pdf = self._pdf
+        pdf.write_obj(
+            self._pages_ref,
+            Type=PdfParser.PdfName("Pages"),
+            Count=len(pdf.pages),
+            Kids=pdf.pages,
+        )
+        pdf.write_obj(self._root_ref, Type=PdfParser.PdfName("Catalog"), Pages=self._pages_ref)
+        if not self.reproducible:
+            pdf.info["Title"] = os.path.splitext(os.path.basename(self.output_path))[0]
+            pdf.info["CreationDate"] = pdf.info["ModDate"] = time.gmtime()
+        pdf.root_ref = self._root_ref
+        pdf.write_xref_and_trailer()
+        self._fp.flush()
+        pdf.close()
+        self._fp.close()
+
+    def abort(self):
+        """Close and remove a partially written file."""
+        self._pdf.close()
+        self._fp.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_images_pdf(image_paths, output_path, workers=None, progress=None, reproducible=False,
+                     preset=None):
+    """Stream image_paths into a single PDF at output_path. Returns page count.
+
+    Pages keep the order of image_paths regardless of the worker count.
+    preset names an entry of IMAGE_PRESETS (default IMAGE_PRESET).
+    progress, if given, is called as progress(pages_done, pages_total).
+    """
+    total = len(image_paths)
+    with StreamingImagePdfWriter(output_path, reproducible=reproducible) as writer:
+        for page in iter_encoded_pages(image_paths, workers, preset):
+            with metrics.span("pdf_write"):
+                writer.add_page(page)
+            if progress:
+                progress(writer.page_count, total)
+    metrics.PAGES.inc(writer.page_count, type="image")
+    return writer.page_count
@@ -0,0 +1,237 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+JOBS_FILE = '.jobs.db'
+PROGRESS_INTERVAL = 0.5  # seconds between progress writes to the job store
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    done INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    error TEXT,
+    failures TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    created REAL NOT NULL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished) WHERE finished IS NOT NULL;
+'''
+
+_current = threading.local()
+
+
+def current_job_id():
+    """ID of the job being run by the calling thread, or None outside jobs."""
+    job = getattr(_current, 'job', None)
+    return job.id if job else None
+
+
+class QueueFull(Exception):
+    """Raised when the job queue has no room for another job."""
+
+
+class Job:
+    """State of one background conversion."""
+
+    def __init__(self, kind, func, args, store=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.args = args
+        self.status = 'queued'
+        self.done = 0
+        self.total = 0
+        self.result = []
+        self.error = None
+        self.failures = []  # per-file problems in an otherwise successful job
+        self.created = time.time()
+        self.finished = None
+        self.store = store
+        self._saved = 0.0
+
+    def update_progress(self, done, total):
+        self.done = done
+        self.total = total
+        now = time.monotonic()
+        if self.store is not None and (done == total or now - self._saved >= PROGRESS_INTERVAL):
+            self._saved = now
+            self.store.save(self)
+
+    def to_dict(self):
+        return {
+            'jobId': self.id,
+            'type': self.kind,
+            'status': self.status,
+            'progress': {'done': self.done, 'total': self.total},
+            'pdfs': self.result,
+            'error': self.error,
+            'failed': self.failures,
+        }
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    """Job states in a SQLite file, so every worker process can report them.
+
+    A job runs in the process that accepted it, which writes its status,
+    progress and result here as they change. A job still queued or
+    running whose process has gone away is reported as failed.
+    """
+
+    def __init__(self, folder='PDF'):
+        self.folder = folder
+        self.db_path = os.path.abspath(os.path.join(folder, JOBS_FILE))
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.folder, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection, e.g. before the process forks."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def save(self, job):
+        self._conn().execute(
+            'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job.id, job.kind, job.status, job.done, job.total, json.dumps(job.result), job.error,
+             json.dumps(job.failures), os.getpid(), job.created, job.finished))
+
+    def get(self, job_id):
+        """A snapshot of the job as last saved, or None."""
+        row = self._conn().execute(
+            'SELECT kind, status, done, total, result, error, failures, pid, created, finished '
+            'FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        kind, status, done, total, result, error, failures, pid, created, finished = row
+        job = Job(kind, None, ())
+        job.id, job.status, job.done, job.total = job_id, status, done, total
+        job.result, job.error, job.failures = json.loads(result), error, json.loads(failures)
+        job.created, job.finished = created, finished
+        if job.finished is None and pid != os.getpid() and not _alive(pid):
+            job.status, job.error = 'failed', 'The server process running this job exited'
+        return job
+
+    def prune(self, cutoff):
+        """Forget jobs that finished before cutoff."""
+        self._conn().execute('DELETE FROM jobs WHERE finished < ?', (cutoff,))
+
+
+class JobQueue:
+    """Bounded queue of conversion jobs run by a fixed pool of threads.
+
+    `func` is called as func(*args, progress=callback, failures=list) and
+    must return a (pdfs, error) tuple like run_conversion. Jobs run in
+    the process that accepted them. With a JobStore their state is also
+    saved there, so get() finds jobs accepted by other worker processes;
+    without one it only knows this process's jobs.
+    """
+
+    def __init__(self, workers=2, max_queued=16, ttl=3600, store=None):
+        self.workers = workers
+        self.ttl = ttl
+        self.store = store
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        # Threads are started on first use so importing the app spawns nothing.
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, kind, func, *args):
+        """Queue a job and return it, or raise QueueFull."""
+        job = Job(kind, func, args, self.store)
+        with self._lock:
+            self._start()
+            self._prune()
+            if self._queue.full():
+                raise QueueFull(f'{self._queue.maxsize} jobs already queued')
+            # Saved before a worker can pick it up and save it as running
+            if self.store is not None:
+                self.store.save(job)
+            self._jobs[job.id] = job
+            self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id):
+        """The job with this ID: live if this process runs it, else as last saved."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.get(job_id)
+        return job
+
+    def depth(self):
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        expired = [jid for jid, job in self._jobs.items()
+                   if job.finished is not None and job.finished < cutoff]
+        for jid in expired:
+            del self._jobs[jid]
+        if self.store is not None:
+            self.store.prune(cutoff)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            _current.job = job
+            try:
+                if self.store is not None:
+                    self.store.save(job)
+                result, err = job.func(*job.args, progress=job.update_progress,
+                                       failures=job.failures)
+                if err:
+                    job.status, job.error = 'failed', err
+                else:
+                    job.status, job.result = 'done', result
+            except Exception as e:
+                print(f"❌ Job {job.id} failed: {e}")
+                job.status, job.error = 'failed', str(e)
+            finally:
+                _current.job = None
+                job.finished = time.time()
+                if self.store is not None:
+                    try:
+                        self.store.save(job)
+                    except sqlite3.Error as e:
+                        print(f"⚠️ Could not save job {job.id}: {e}")
+                self._queue.task_done()
@@ -0,0 +1,113 @@
+from functools import lru_cache
+
+from reportlab.lib.rl_accel import unicode2T1
+from reportlab.pdfbase.pdfmetrics import getFont
+from reportlab.pdfbase.ttfonts import TTFont
+
+# Line breaking for the document renderer. It gives exactly the same lines
+# as reportlab's simpleSplit, but looks character widths up in a table
+# built once per font, and remembers word widths per font and size.
+WORD_CACHE_SIZE = 50000  # words remembered per (font, size)
+
+
+class FontMetrics:
+    """Per-character width table for one reportlab font, filled lazily.
+
+    With an `encoding`, characters are measured as a canvas that encodes
+    text that way (errors replaced) draws them with the font's own
+    glyphs, instead of through reportlab's substitution fonts. Only for
+    Type 1 fonts, whose width table is indexed by WinAnsi code.
+    """
+
+    def __init__(self, font_name, encoding=None):
+        self.font = getFont(font_name)
+        # TrueType fonts sum float widths in a different order than Type 1
+        self.is_ttf = isinstance(self.font, TTFont)
+        self.encoding = encoding
+        self._widths = {}
+
+    def char_width(self, ch):
+        """Width of ch in 1/1000 em, as reportlab's stringWidth sees it."""
+        width = self._widths.get(ch)
+        if width is None:
+            font = self.font
+            if self.encoding is not None:
+                width = sum(map(font.widths.__getitem__, ch.encode(self.encoding, errors="replace")))
+            elif self.is_ttf:
+                width = font.face.charWidths.get(ord(ch), font.face.defaultWidth)
+            else:
+                width = sum(sum(map(f.widths.__getitem__, t))
+                            for f, t in unicode2T1(ch, [font] + font.substitutionFonts))
+            self._widths[ch] = width
+        return width
+
+
+@lru_cache(maxsize=None)
+def font_metrics(font_name, encoding=None):
+    return FontMetrics(font_name, encoding)
+
+
+class Measurer:
+    """String widths in points for one font and size.
+
+    The arithmetic is the same as reportlab's instanceStringWidthT1/TTF,
+    so widths are bit-for-bit equal and line breaks never differ.
+    """
+
+    def __init__(self, font_name, size, encoding=None):
+        self.metrics = font_metrics(font_name, encoding)
+        self.size = size
+        self._words = {}
+        self.space = self.width(" ")
+
+    def width(self, text):
+        width = self._words.get(text)
+        if width is None:
+            cw = self.metrics.char_width
+            if self.metrics.is_ttf:
+                width = 0.001 * self.size * sum([cw(ch) for ch in text])
+            else:
+                width = sum([cw(ch) for ch in text]) * 0.001 * self.size
+            if len(self._words) >= WORD_CACHE_SIZE:
+                self._words.clear()
+            self._words[text] = width
+        return width
+
+
+@lru_cache(maxsize=64)
+def get_measurer(font_name, size, encoding=None):
+    return Measurer(font_name, size, encoding)
+
+
+def wrap(text, font_name, size, max_width, encoding=None):
+    """Greedy line breaking; returns the same lines as simpleSplit().
+
+    `encoding` is how the canvas that draws the lines encodes text, if it
+    is not reportlab's (see FontMetrics); text_pdf uses TEXT_ENCODING.
+    """
+    lines = text.split("\n")
+    if not max_width:
+        return lines
+    measure = get_measurer(font_name, size, encoding)
+    width, space = measure.width, measure.space
+    out = []
+    for line in lines:
+        current = []
+        w = -space
+        for word in line.split():
+            lt = width(word)
+            if w + space + lt <= max_width or not current:
+                current.append(word)
+                w = w + space + lt
+            else:
+                out.append(" ".join(current))
+                current = [word]
+                w = lt
+        if current:
+            out.append(" ".join(current))
+    return out
+
+
+def layout_paragraphs(paragraphs, font_name, size, max_width, encoding=None):
+    """Wrap many paragraphs at once: one list of lines per non-empty paragraph."""
+    return [wrap(p, font_name, size, max_width, encoding) for p in (p.strip() for p in paragraphs) if p]
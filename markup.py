@@ -0,0 +1,463 @@
+import html
+import json
+import os
+import re
+import subprocess
+import time
+import urllib.request
+import uuid
+import zipfile
+from xml.etree import ElementTree
+
+# Markdown, RTF and ODT are turned into plain paragraphs before layout.
+# Simple markdown and every ODT file are handled here in Python. Only what
+# is left goes to pandoc, and then many files per pandoc run, because
+# process start-up dominates the cost of converting small notes.
+
+# URL of a running `pandoc server`. If set, it replaces the pandoc CLI.
+PANDOC_SERVER = os.environ.get("PDF_PANDOC_SERVER", "")
+PANDOC_BATCH_SIZE = 200  # files per pandoc invocation
+PANDOC_FORMATS = {".md": "markdown", ".rtf": "rtf"}
+
+# --------------------------------------------------
+# Markdown Fast Path
+# --------------------------------------------------
+
+# Constructs that only pandoc handles properly: tables, raw HTML, footnotes,
+# reference links, math and YAML metadata.
+_UNSUPPORTED = re.compile(
+    r"^\s*\|"                                    # table
+    r"|<(?!(?:https?|mailto):)[A-Za-z!/][^>]*>"  # HTML (autolinks are fine)
+    r"|\[\^|\]\[|^\s{0,3}\[[^\]]+\]:\s"          # footnotes, reference links
+    r"|\$[^\s$][^$]*(?<=\S)\$(?!\d)"             # inline math
+    r"|\A---\s*$",                               # YAML metadata block
+    re.MULTILINE)
+# Markdown whose output depends on the rest of the document: pandoc puts
+# footnotes at the end, resolves reference links against definitions
+# anywhere, and numbers example lists throughout. Such files cannot share
+# a pandoc run with others.
+_DOCUMENT_WIDE = re.compile(r"\[\^|^\s{0,3}\[[^\]]+\]:|^\s*\(@", re.MULTILINE)
+_FENCE = re.compile(r"^\s{0,3}(```|~~~)")
+_ATX = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+_SETEXT = re.compile(r"^\s{0,3}(=+|-+)\s*$")
+_RULE = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+_ITEM = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+(.*)$")
+_QUOTE = re.compile(r"^\s{0,3}>\s?")
+
+_INLINE = [
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),       # images -> alt text
+    (re.compile(r"\[([^\]]+)\]\([^)]*\)"), r"\1"),        # links -> text
+    (re.compile(r"<((?:https?|mailto):[^>\s]+)>"), r"\1"),  # autolinks
+    (re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1"), r"\2"),  # strong
+    (re.compile(r"(?<![\w*])\*(?=\S)(.+?)(?<=\S)\*(?![\w*])"), r"\1"),  # emphasis
+    (re.compile(r"(?<![\w_])_(?=\S)(.+?)(?<=\S)_(?![\w_])"), r"\1"),
+    (re.compile(r"~~(?=\S)(.+?)(?<=\S)~~"), r"\1"),      # strikeout
+]
+_CODE_SPAN = re.compile(r"(`+)(.+?)\1")
+_ESCAPE = re.compile(r"\\([\\`*_{}\[\]()#+\-.!>~|])")
+
+
+def _inline(text):
+    # Code spans are cut out first so their contents are left alone
+    parts = _CODE_SPAN.split(text)
+    out = []
+    for i in range(0, len(parts), 3):
+        # Escaped characters are parked in the private use area so the
+        # emphasis patterns cannot see them
+        chunk = _ESCAPE.sub(lambda m: chr(0xE000 + ord(m.group(1))), parts[i])
+        for pattern, repl in _INLINE:
+            chunk = pattern.sub(repl, chunk)
+        chunk = re.sub("[\uE000-\uE07F]", lambda m: chr(ord(m.group()) - 0xE000), chunk)
+        out.append(html.unescape(chunk))
+        if i + 2 < len(parts):
+            out.append(parts[i + 2].strip())
+    return "".join(out)
+
+
+def markdown_to_plain(text):
+    """Paragraphs of a simple markdown document, or None if pandoc is needed.
+
+    Covers headings, paragraphs, lists, block quotes, code and inline
+    markup. Each block becomes one paragraph, like pandoc's plain writer
+    with --wrap=none.
+    """
+    if _UNSUPPORTED.search(text):
+        return None
+    paragraphs = []
+    block = []
+    fence = None
+
+    def flush():
+        if block:
+            # Two trailing spaces or a backslash mark a hard line break
+            lines, current = [], []
+            for line in block:
+                hard = line.endswith("  ") or line.endswith("\\")
+                current.append(line.rstrip(" \\").strip())
+                if hard:
+                    lines.append(" ".join(current))
+                    current = []
+            if current:
+                lines.append(" ".join(current))
+            paragraphs.extend(_inline(line) for line in lines)
+            block.clear()
+
+    for line in text.splitlines():
+        if fence:
+            if line.strip().startswith(fence):
+                fence = None
+            else:
+                paragraphs.append(line)
+            continue
+        m = _FENCE.match(line)
+        if m:
+            flush()
+            fence = m.group(1)
+            continue
+        if not line.strip():
+            flush()
+            continue
+        if block and _SETEXT.match(line):
+            flush()  # the underlined text was the heading
+            continue
+        if _RULE.match(line):
+            flush()
+            continue
+        m = _ATX.match(line)
+        if m:
+            flush()
+            paragraphs.append(_inline(m.group(2)))
+            continue
+        if line.startswith("    ") and not block:
+            paragraphs.append(line[4:])  # indented code
+            continue
+        line = _QUOTE.sub("", line)
+        m = _ITEM.match(line)
+        if m:
+            flush()
+            indent, marker, rest = m.groups()
+            marker = "-" if marker in "-*+" else marker
+            block.append(f"{indent}{marker} {rest}")
+            continue
+        block.append(line)
+    flush()
+    if fence:
+        return None  # unclosed fence: let pandoc decide
+    return paragraphs
+
+# --------------------------------------------------
+# ODT
+# --------------------------------------------------
+
+_TEXT_NS = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+_OFFICE_NS = "{urn:oasis:names:tc:opendocument:xmlns:office:1.0}"
+
+
+def _odt_text(element, parts):
+    if element.text:
+        parts.append(element.text)
+    for child in element:
+        tag = child.tag
+        if tag == _TEXT_NS + "s":
+            parts.append(" " * int(child.get(_TEXT_NS + "c", "1")))
+        elif tag == _TEXT_NS + "tab":
+            parts.append("\t")
+        elif tag == _TEXT_NS + "line-break":
+            parts.append("\n")
+        elif tag != _TEXT_NS + "note":  # footnote bodies are not inline text
+            _odt_text(child, parts)
+        if child.tail:
+            parts.append(child.tail)
+
+
+def odt_paragraphs(path):
+    """Paragraphs and headings of an OpenDocument text file, in order."""
+    with zipfile.ZipFile(path) as z, z.open("content.xml") as f:
+        root = ElementTree.parse(f).getroot()
+    body = root.find(f"{_OFFICE_NS}body")
+    paragraphs = []
+    for element in (body if body is not None else root).iter():
+        if element.tag in (_TEXT_NS + "p", _TEXT_NS + "h"):
+            parts = []
+            _odt_text(element, parts)
+            paragraphs.extend("".join(parts).split("\n"))
+    return paragraphs
+
+# --------------------------------------------------
+# DOCX
+# --------------------------------------------------
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+# Subtrees without body text: images and other media, shape fallbacks,
+# deleted text and field instructions
+_DOCX_SKIP = {_W + "drawing", _W + "pict", _W + "object", _MC + "AlternateContent",
+              _W + "del", _W + "delText", _W + "instrText"}
+
+
+class Heading(str):
+    """A paragraph to be set in the heading font."""
+
+
+def _docx_text(element, parts):
+    for child in element:
+        tag = child.tag
+        if tag == _W + "t":
+            parts.append(child.text or "")
+        elif tag in (_W + "tab", _W + "ptab"):
+            parts.append("\t")
+        elif tag in (_W + "br", _W + "cr"):
+            if child.get(_W + "type") != "page":
+                parts.append("\n")
+        elif tag == _W + "noBreakHyphen":
+            parts.append("-")
+        elif tag == _W + "p":
+            # Paragraphs inside a table cell run on, separated by a space
+            if parts:
+                parts.append(" ")
+            _docx_text(child, parts)
+        elif tag == _W + "tc":
+            if parts:
+                parts.append(" | ")
+            _docx_text(child, parts)
+        elif tag not in _DOCX_SKIP:
+            _docx_text(child, parts)
+
+
+def _docx_bold(run):
+    rpr = run.find(_W + "rPr")
+    b = rpr.find(_W + "b") if rpr is not None else None
+    return b is not None and b.get(_W + "val", "true") not in ("0", "false", "off")
+
+
+def _docx_paragraph(p, heading_styles):
+    parts = []
+    _docx_text(p, parts)
+    text = "".join(parts)
+    ppr = p.find(_W + "pPr")
+    if ppr is not None:
+        style = ppr.find(_W + "pStyle")
+        level = ppr.find(_W + "outlineLvl")
+        if ((style is not None and style.get(_W + "val") in heading_styles)
+                or (level is not None and level.get(_W + "val") != "9")):
+            return Heading(text)
+    runs = [r for r in p.iter(_W + "r") if r.find(_W + "t") is not None]
+    if runs and all(map(_docx_bold, runs)):
+        return Heading(text)
+    return text
+
+
+def _docx_blocks(element, heading_styles):
+    """Paragraphs of a body-level paragraph, table row, table or content control."""
+    tag = element.tag
+    if tag == _W + "p":
+        yield _docx_paragraph(element, heading_styles)
+    elif tag == _W + "tr":
+        cells = []
+        for cell in element.findall(_W + "tc"):
+            parts = []
+            _docx_text(cell, parts)
+            cells.append("".join(parts))
+        yield " | ".join(cells)
+    elif tag in (_W + "tbl", _W + "sdt", _W + "sdtContent"):
+        for child in element:
+            yield from _docx_blocks(child, heading_styles)
+
+
+def _docx_heading_styles(z):
+    """IDs of the paragraph styles that are headings or the title."""
+    try:
+        f = z.open("word/styles.xml")
+    except KeyError:
+        return set()
+    with f:
+        root = ElementTree.parse(f).getroot()
+    ids = set()
+    for style in root.iter(_W + "style"):
+        name = style.find(_W + "name")
+        name = name.get(_W + "val", "").lower() if name is not None else ""
+        ppr = style.find(_W + "pPr")
+        level = ppr.find(_W + "outlineLvl") if ppr is not None else None
+        if (name.startswith("heading") or name == "title"
+                or (level is not None and level.get(_W + "val") != "9")):
+            ids.add(style.get(_W + "styleId"))
+    return ids
+
+
+def docx_paragraphs(path):
+    """Paragraphs of a Word document, parsed as a stream from word/document.xml.
+
+    Each table row comes out as one paragraph with its cells separated by
+    " | ". Headings, and paragraphs that are bold throughout, are Heading
+    instances. Images and other media in the archive are never read.
+    """
+    with zipfile.ZipFile(path) as z:
+        heading_styles = _docx_heading_styles(z)
+        with z.open("word/document.xml") as f:
+            stack = []
+            for event, element in ElementTree.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    stack.append(element)
+                    continue
+                stack.pop()
+                # Body-level blocks, and the rows of body-level tables, are
+                # handled as soon as they end and then dropped, so memory
+                # stays flat however long the document is
+                parent = stack[-1] if stack else None
+                if parent is None:
+                    continue
+                if parent.tag == _W + "body":
+                    if element.tag != _W + "tbl":  # rows went out already
+                        yield from _docx_blocks(element, heading_styles)
+                    parent.remove(element)
+                elif (element.tag == _W + "tr" and parent.tag == _W + "tbl"
+                      and len(stack) > 1 and stack[-2].tag == _W + "body"):
+                    yield from _docx_blocks(element, heading_styles)
+                    parent.remove(element)
+
+# --------------------------------------------------
+# Pandoc
+# --------------------------------------------------
+
+def _pandoc_path():
+    import pypandoc  # only needed when there is work for the pandoc CLI
+    return pypandoc.get_pandoc_path()
+
+
+def _pandoc_cli(text, fmt, timeout=None):
+    result = subprocess.run(
+        [_pandoc_path(), "-f", fmt, "-t", "plain", "--wrap=none"],
+        input=text.encode("utf-8"), capture_output=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip() or "pandoc failed")
+    return result.stdout.decode("utf-8")
+
+
+def _pandoc_server(path, payload, timeout=None):
+    request = urllib.request.Request(
+        PANDOC_SERVER.rstrip("/") + path, data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json", "Accept": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+def _server_output(result):
+    # pandoc server answers with {"output": ...} objects when asked for JSON
+    return result["output"] if isinstance(result, dict) else result
+
+
+def pandoc_plain(text, fmt, timeout=None):
+    """Convert one document to plain text with pandoc (server or CLI)."""
+    if PANDOC_SERVER:
+        return _server_output(_pandoc_server(
+            "/", {"text": text, "from": fmt, "to": "plain", "wrap": "none"}, timeout))
+    return _pandoc_cli(text, fmt, timeout)
+
+
+def can_join(text, fmt):
+    """Whether the CLI can convert text together with others (see pandoc_plain_batch)."""
+    return fmt == "markdown" and not _DOCUMENT_WIDE.search(text)
+
+
+def _time_left(deadline):
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise TimeoutError("pandoc batch ran out of time")
+    return left
+
+
+def pandoc_plain_batch(texts, fmt, timeout=None):
+    """Convert several documents of one format in one pandoc call.
+
+    With a pandoc server this is its /batch endpoint. With the CLI,
+    markdown documents are joined with a unique marker paragraph and the
+    output is split on it again. Documents that can_join() rejects, and
+    other formats, are converted one at a time. `timeout` is for the
+    whole batch. Raises if the batch fails; callers then fall back to
+    converting per file.
+    """
+    if PANDOC_SERVER:
+        results = _pandoc_server(
+            "/batch", [{"text": t, "from": fmt, "to": "plain", "wrap": "none"} for t in texts],
+            timeout)
+        return [_server_output(r) for r in results]
+
+    deadline = time.monotonic() + timeout if timeout else None
+    outputs = [None] * len(texts)
+    joined = [i for i, t in enumerate(texts) if can_join(t, fmt)]
+    if len(joined) < 2:
+        joined = []
+    for i, text in enumerate(texts):
+        if i not in joined:
+            outputs[i] = _pandoc_cli(text, fmt, _time_left(deadline))
+    if joined:
+        marker = f"PDFCONVERTERSPLIT{uuid.uuid4().hex}"
+        text = f"\n\n{marker}\n\n".join(texts[i] for i in joined)
+        parts = re.split(rf"^\s*{marker}\s*$", _pandoc_cli(text, fmt, _time_left(deadline)),
+                         flags=re.MULTILINE)
+        if len(parts) != len(joined):
+            raise RuntimeError("pandoc batch output could not be split")
+        for i, part in zip(joined, parts):
+            outputs[i] = part
+    return outputs
+
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def plain_paragraphs(path, timeout=None):
+    """Paragraphs of one .md/.rtf/.odt file, using pandoc only if needed."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".odt":
+        return odt_paragraphs(path)
+    text = _read_text(path)
+    if ext == ".md":
+        paragraphs = markdown_to_plain(text)
+        if paragraphs is not None:
+            return paragraphs
+    return pandoc_plain(text, PANDOC_FORMATS[ext], timeout).split("\n")
+
+
+def convert_batch(paths, timeout=None):
+    """Pre-convert the files in paths that need pandoc, many per invocation.
+
+    Returns {path: paragraphs} for the files that were converted here.
+    Files that take the Python fast path, that cannot share a pandoc run
+    (see can_join), or whose batch failed or did not finish within
+    `timeout` seconds in all are left out. plain_paragraphs() converts
+    them one by one later, in the render pool with its per-file timeout.
+    """
+    pending = {}
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in PANDOC_FORMATS:
+            continue
+        try:
+            text = _read_text(path)
+        except (OSError, UnicodeDecodeError):
+            continue  # reported properly when the file itself is rendered
+        if ext == ".md" and markdown_to_plain(text) is not None:
+            continue
+        fmt = PANDOC_FORMATS[ext]
+        if PANDOC_SERVER or can_join(text, fmt):
+            pending.setdefault(fmt, []).append((path, text))
+
+    # This runs before rendering starts, so all batches together get the
+    # time one file would
+    deadline = time.monotonic() + timeout if timeout else None
+    converted = {}
+    for fmt, items in pending.items():
+        for start in range(0, len(items), PANDOC_BATCH_SIZE):
+            chunk = items[start:start + PANDOC_BATCH_SIZE]
+            try:
+                outputs = pandoc_plain_batch([t for _, t in chunk], fmt, _time_left(deadline))
+            except Exception as e:
+                print(f"⚠️ pandoc batch of {len(chunk)} {fmt} file(s) failed, converting one by one: {e}")
+                continue
+            for (path, _), output in zip(chunk, outputs):
+                converted[path] = output.split("\n")
+    return converted
@@ -0,0 +1,176 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics in the Prometheus text format, served at /metrics.
+# Every app process keeps its own numbers. Work done in a process pool is
+# run through run_captured(), which sends the worker's updates back to the
+# parent to be counted there.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+REGISTRY = {}  # name -> metric, in registration order
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named family of values keyed by label values.
+
+    If `func` is given, the metric has no stored values; func() is called
+    at scrape time and its number reported instead.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=(), func=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        self._values = {}
+        REGISTRY[name] = self
+
+    def _record(self, value, labels):
+        captured = getattr(_local, "captured", None)
+        if captured is not None:
+            captured.append((self.name, value, labels))
+            return
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with _lock:
+            self._apply(key, value)
+
+    def _samples(self):
+        if self.func is not None:
+            yield "", (), self.func()
+            return
+        if not self._values and not self.labelnames:
+            yield "", (), 0
+        for key, value in self._values.items():
+            yield "", tuple(zip(self.labelnames, key)), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_label_text(labels)} {_number(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        self._record(amount, labels)
+
+    def _apply(self, key, value):
+        self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self._record(value, labels)
+
+    def _apply(self, key, value):
+        self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        self._record(value, labels)
+
+    def _apply(self, key, value):
+        state = self._values.get(key)
+        if state is None:
+            # per-bucket counts (not cumulative), sum, total count
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def _samples(self):
+        for key, (counts, total, count) in self._values.items():
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield "_bucket", labels + (("le", _number(bound)),), cumulative
+            yield "_bucket", labels + (("le", "+Inf"),), count
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for metric in REGISTRY.values():
+            lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+# --------------------------------------------------
+# Pool Workers
+# --------------------------------------------------
+
+def run_captured(func, *args):
+    """Call func(*args) and return (result, updates) instead of recording them.
+
+    Meant to be submitted to a process pool; the parent passes `updates`
+    to record() so work done in workers shows up in its /metrics.
+    """
+    _local.captured = []
+    try:
+        return func(*args), _local.captured
+    finally:
+        _local.captured = None
+
+
+def record(updates):
+    """Apply updates returned by run_captured() in this process."""
+    for name, value, labels in updates:
+        REGISTRY[name]._record(value, labels)
+
+# --------------------------------------------------
+# Conversion Metrics
+# --------------------------------------------------
+
+STAGE_SECONDS = Histogram("pdf_stage_seconds", "Time spent in each conversion stage.", ["stage"])
+BYTES_IN = Counter("pdf_bytes_in_total", "Bytes of uploaded input files.", ["type"])
+BYTES_OUT = Counter("pdf_bytes_out_total", "Bytes of PDF sent to clients.")
+PAGES = Counter("pdf_pages_total", "Pages written to output PDFs.", ["type"])
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one observation of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
@@ -0,0 +1,58 @@
+import os
+import re
+import sqlite3
+import threading
+
+# Output numbers ("name[N]_timestamp.pdf") come from a counter stored in a
+# small SQLite file inside the output folder. SQLite's write lock makes
+# allocation atomic across threads and processes, and it costs the same
+# no matter how many PDFs the folder holds.
+SEQUENCE_FILE = '.sequence.db'
+NUMBER_PATTERN = re.compile(r"\[(\d+)\]_.*\.pdf$")
+
+_local = threading.local()
+
+
+def _scan_max_number(pdf_folder):
+    """Highest number already used in pdf_folder (legacy, O(files))."""
+    numbers = [int(m.group(1)) for m in map(NUMBER_PATTERN.search, os.listdir(pdf_folder)) if m]
+    return max(numbers) if numbers else 0
+
+
+def _connect(pdf_folder):
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    path = os.path.abspath(os.path.join(pdf_folder, SEQUENCE_FILE))
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(pdf_folder, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS sequence (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conns[path] = conn
+    return conn
+
+
+def next_number(pdf_folder='PDF', count=1, last_used=None):
+    """Reserve `count` consecutive output numbers and return the first one.
+
+    `last_used()` gives the highest number already taken the first time a
+    folder is used; without it the folder is scanned.
+    """
+    conn = _connect(pdf_folder)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute("SELECT value FROM sequence WHERE name = 'pdf'").fetchone()
+        if row is None:
+            # First use of this folder: continue after any existing outputs.
+            last = last_used() if last_used else _scan_max_number(pdf_folder)
+            conn.execute("INSERT INTO sequence (name, value) VALUES ('pdf', ?)", (last + count,))
+        else:
+            last = row[0]
+            conn.execute("UPDATE sequence SET value = ? WHERE name = 'pdf'", (last + count,))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return last + 1
@@ -0,0 +1,634 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zlib
+
+from PyPDF2.generic import DictionaryObject, IndirectObject, NameObject, StreamObject
+
+import metrics
+from pdf_pages import INHERITED, SHARED_TYPES, open_pdf
+
+# Optional post-processing of finished PDFs. The file is rewritten from
+# scratch: objects no longer reachable are dropped, identical streams and
+# fonts are written once, dictionaries are packed into compressed object
+# streams, Flate and unfiltered streams are recompressed, and the result
+# is linearized ("fast web view"), so that a viewer fetching the file over
+# HTTP can show the first page once the first /E bytes have arrived.
+#
+# Linearized layout (PDF 1.7, Annex F), in file order:
+#   header, linearization dictionary, first-page xref stream
+#   part 4  catalog and the objects needed to open the document
+#   part 5  hint stream (page offset and shared object hint tables)
+#   part 6  the first page and everything it uses
+#   part 7  every other page with the objects only it uses
+#   part 8  objects shared by several pages
+#   part 9  everything else (page tree, outlines, document info, ...)
+#   main xref stream
+# Parts 4-6 are numbered after all the others, so the first-page xref
+# stream covers exactly them. Pages and the catalog stay outside object
+# streams; everything else that is not a stream is packed into one or
+# more object streams per part.
+
+OBJSTM_SIZE = 100  # objects per object stream
+COMPRESS_LEVEL = 9
+FLATE = '/FlateDecode'
+# Catalog entries a viewer needs before showing the first page
+OPEN_KEYS = ('/ViewerPreferences', '/PageMode', '/Threads', '/OpenAction', '/AcroForm')
+HEADER = b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n'
+EOF_MARKER = b'startxref\n%d\n%%%%EOF\n'
+PAGES = ('pages',)  # key of the rebuilt, flat page tree
+
+
+class _Ref:
+    """A reference to an object by key, for dictionaries built here."""
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+
+class _BitWriter:
+    """Big-endian bit packer for hint tables."""
+
+    def __init__(self):
+        self.out = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value, nbits):
+        if nbits:
+            self._acc = (self._acc << nbits) | value
+            self._bits += nbits
+            while self._bits >= 8:
+                self._bits -= 8
+                self.out.append((self._acc >> self._bits) & 0xFF)
+            self._acc &= (1 << self._bits) - 1
+
+    def flush(self):
+        """Pad to the next byte boundary."""
+        if self._bits:
+            self.write(0, 8 - self._bits)
+
+
+def _nbits(value):
+    return value.bit_length()
+
+
+class PdfOptimizer:
+    """Load the object graph of one PDF and write it out optimized.
+
+    Stream data is not kept in memory: streams are read once to be
+    compared, and again when they are written.
+    """
+
+    def __init__(self, input_path):
+        self.reader = open_pdf(input_path)
+        trailer = self.reader.trailer
+        self.root = self._key(trailer.raw_get('/Root'))
+        info = trailer.raw_get('/Info') if '/Info' in trailer else None
+        self.info = self._key(info) if isinstance(info, IndirectObject) else None
+        self.ids = trailer.get('/ID')
+        self.deduplicated = 0
+        self.recompressed = 0
+
+        self.alias = {}  # old page tree node -> PAGES
+        self.pages, self.overrides = self._page_tree()
+        self.streams = set()
+        self.children = {}
+        self.canon = {}
+        self._collect([k for k in (self.root, self.info) if k is not None])
+
+    @staticmethod
+    def _key(ref):
+        return ref.idnum, ref.generation
+
+    def _page_tree(self):
+        """Page keys in order, and the rewritten catalog, pages and page tree."""
+        catalog = self.reader.get_object(IndirectObject(*self.root, self.reader))
+        pages, overrides, seen = [], {}, set()
+        stack = [(catalog.raw_get('/Pages'), {})]
+        while stack:
+            ref, inherit = stack.pop()
+            if not isinstance(ref, IndirectObject):
+                raise ValueError("Malformed page tree")
+            key = self._key(ref)
+            if key in seen:
+                continue
+            seen.add(key)
+            node = ref.get_object()
+            if '/Kids' in node:
+                self.alias[key] = PAGES
+                inherit = {**inherit, **{k: node.raw_get(k) for k in INHERITED if k in node}}
+                stack.extend((kid, inherit) for kid in reversed(node['/Kids']))
+                continue
+            # Plain dicts: PyPDF2's own would not take _Ref values
+            page = {k: v for k, v in node.items() if k != '/Parent'}
+            for k, v in inherit.items():
+                page.setdefault(NameObject(k), v)
+            page[NameObject('/Parent')] = _Ref(PAGES)
+            overrides[key] = page
+            pages.append(key)
+        if not pages:
+            raise ValueError("PDF has no pages")
+
+        root = dict(catalog)
+        root[NameObject('/Pages')] = _Ref(PAGES)
+        overrides[self.root] = root
+        overrides[PAGES] = {NameObject('/Type'): NameObject('/Pages'),
+                            NameObject('/Count'): _Raw(b'%d' % len(pages)),
+                            NameObject('/Kids'): [_Ref(k) for k in pages]}
+        return pages, overrides
+
+    # ---------------- Object graph ----------------
+
+    def _resolve(self, key):
+        return self.alias.get(key, key)
+
+    def value(self, key):
+        """The object for key: a PyPDF2 object, a dict built here, or None if it does not exist."""
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.reader.get_object(IndirectObject(*key, self.reader))
+
+    def _release(self, key):
+        """Let PyPDF2 forget a stream, so its data is not held until the end."""
+        self.reader.resolved_objects.pop((key[1], key[0]), None)
+
+    def _refs(self, value, out):
+        if isinstance(value, IndirectObject):
+            out.append(self._resolve(self._key(value)))
+        elif isinstance(value, _Ref):
+            out.append(value.key)
+        elif isinstance(value, dict):
+            for k, v in value.items():
+                if not (k == '/Length' and isinstance(value, StreamObject)):
+                    self._refs(v, out)
+        elif isinstance(value, list):
+            for v in value:
+                self._refs(v, out)
+        return out
+
+    def _collect(self, roots):
+        """Walk everything reachable from roots, merging identical shared objects.
+
+        Objects are finished children first, so an object's digest can use
+        the merged identity of everything it refers to.
+        """
+        shared = {}
+        done = set()
+        self.order = []
+        for root in roots:
+            if root in done:
+                continue
+            active = {root}
+            stack = [(root, iter(self._load(root)))]
+            while stack:
+                key, children = stack[-1]
+                child = next(children, None)
+                if child is not None:
+                    if child not in done and child not in active:
+                        active.add(child)
+                        stack.append((child, iter(self._load(child))))
+                    continue
+                stack.pop()
+                active.discard(key)
+                done.add(key)
+                self.order.append(key)
+                digest = self._digest(key)
+                if digest is None:
+                    self.canon[key] = key
+                else:
+                    self.canon[key] = shared.setdefault(digest, key)
+                    if self.canon[key] != key:
+                        self.deduplicated += 1
+                if key in self.streams:
+                    self._release(key)
+
+    def _load(self, key):
+        obj = self.value(key)
+        if isinstance(obj, StreamObject):
+            self.streams.add(key)
+        children = self._refs(obj, []) if obj is not None else []
+        self.children[key] = children
+        return children
+
+    def _digest(self, key):
+        if key in self.overrides:
+            return None
+        obj = self.value(key)
+        is_stream = isinstance(obj, StreamObject)
+        if not is_stream and not (isinstance(obj, DictionaryObject) and obj.get('/Type') in SHARED_TYPES):
+            return None
+        ref = lambda k: repr(self.canon.get(k, k)).encode()
+        data = self._serialize(obj, ref)
+        if is_stream:
+            data += hashlib.sha256(obj._data).digest()
+        return hashlib.sha256(data).digest()
+
+    def _serialize(self, value, ref):
+        """PDF syntax for a value, with references written by ref(key)."""
+        if isinstance(value, IndirectObject):
+            return ref(self._resolve(self._key(value)))
+        if isinstance(value, _Ref):
+            return ref(value.key)
+        if isinstance(value, _Raw):
+            return value.data
+        if isinstance(value, dict):
+            skip = '/Length' if isinstance(value, StreamObject) else None
+            return b'<<' + b''.join(b'%s %s\n' % (self._serialize(k, ref), self._serialize(v, ref))
+                                    for k, v in value.items() if k != skip) + b'>>'
+        if isinstance(value, list):
+            return b'[' + b' '.join(self._serialize(v, ref) for v in value) + b']'
+        if value is None:
+            return b'null'
+        out = io.BytesIO()
+        value.write_to_stream(out, None)
+        return out.getvalue()
+
+    def reach(self, starts, stop):
+        """Canonical keys reachable from starts without entering `stop`, in visiting order."""
+        seen = set(starts)
+        found = []
+        stack = list(reversed(starts))
+        while stack:
+            key = stack.pop()
+            found.append(key)
+            for child in reversed(self.children.get(key, ())):
+                child = self.canon.get(child, child)
+                if child not in seen and child not in stop:
+                    seen.add(child)
+                    stack.append(child)
+        return found
+
+    # ---------------- Layout ----------------
+
+    def _parts(self):
+        """Object keys of each part of the linearized file (see the top of the module)."""
+        pages = self.pages
+        stop = set(pages) | {PAGES, self.root}
+        catalog = self.value(self.root)
+        opening = self._refs([catalog[k] for k in OPEN_KEYS if k in catalog], [])
+        part4 = [self.root] + [k for k in self.reach([self.canon.get(k, k) for k in opening], stop)
+                               if k != self.root]
+        assigned = set(part4)
+
+        self.page_objects = []
+        usage = {}
+        for i, page in enumerate(pages):
+            objects = self.reach([page], stop - {page})
+            self.page_objects.append(objects)
+            for key in objects:
+                usage.setdefault(key, []).append(i)
+
+        part6 = [k for k in self.page_objects[0] if k not in assigned]
+        assigned.update(part6)
+        part7 = []
+        for i, objects in enumerate(self.page_objects[1:], 1):
+            own = [k for k in objects if k not in assigned and usage[k] == [i]]
+            assigned.update(own)
+            part7.append(own)
+        part8 = []
+        for objects in self.page_objects[1:]:
+            for key in objects:
+                if key not in assigned:
+                    assigned.add(key)
+                    part8.append(key)
+        everything = self.reach([k for k in (self.root, self.info) if k is not None], set())
+        part9 = [k for k in everything if k not in assigned]
+        return part4, part6, part7, part8, part9
+
+    def _units(self, keys):
+        """Split a part into write units: ('obj', key), ('objstm', [keys]) or ('stream', key).
+
+        Pages and the catalog come first and are written as they are;
+        other dictionaries go into object streams, then the streams follow.
+        """
+        pinned, packed, streams = [], [], []
+        for key in keys:
+            if key in self.streams:
+                streams.append(key)
+            elif key == self.root or key in self.overrides and key != PAGES:
+                pinned.append(key)
+            else:
+                packed.append(key)
+        units = [('obj', k) for k in pinned]
+        for i in range(0, len(packed), OBJSTM_SIZE):
+            chunk = packed[i:i + OBJSTM_SIZE]
+            units.append(('objstm', chunk) if len(chunk) > 1 else ('obj', chunk[0]))
+        units.extend(('stream', k) for k in streams)
+        return units
+
+    def _number(self, units, start):
+        """Number the objects written as they are (object streams included). Returns the next free number."""
+        for kind, item in units:
+            self.numbers[('objstm', id(item)) if kind == 'objstm' else item] = start
+            start += 1
+        return start
+
+    def _unit_number(self, unit):
+        kind, item = unit
+        return self.numbers[('objstm', id(item)) if kind == 'objstm' else item]
+
+    def _number_packed(self, units, start):
+        """Number the objects inside object streams. Returns the next free number.
+
+        In each xref range these come after every uncompressed object, so
+        the objects of a page section keep consecutive numbers.
+        """
+        for kind, item in units:
+            if kind == 'objstm':
+                for key in item:
+                    self.numbers[key] = start
+                    start += 1
+        return start
+
+    # ---------------- Writing ----------------
+
+    def _ref(self, key):
+        key = self.canon.get(key, key)
+        number = self.numbers.get(key)
+        return b'null' if number is None else b'%d 0 R' % number
+
+    def _encode(self, obj):
+        """(filter, data) to write for a stream; filter None keeps the original one."""
+        data = obj._data
+        if '/DecodeParms' in obj or obj.get('/Type') == '/Metadata':
+            return None, data
+        filters = obj.get('/Filter')
+        if isinstance(filters, list) and len(filters) == 1:
+            filters = filters[0]
+        if filters is None:
+            raw = data
+        elif filters == FLATE:
+            try:
+                raw = zlib.decompress(data)
+            except zlib.error:
+                return None, data
+        else:
+            return None, data  # JPEG, fax and other encodings are kept as they are
+        packed = zlib.compress(raw, COMPRESS_LEVEL)
+        if len(packed) >= len(data):
+            return None, data
+        self.recompressed += 1
+        return FLATE, packed
+
+    def _unit_bytes(self, unit):
+        kind, item = unit
+        if kind == 'objstm':
+            number = self.numbers[('objstm', id(item))]
+            bodies, offsets, pos = [], [], 0
+            for key in item:
+                body = self._serialize(self.value(key), self._ref)
+                offsets.append(b'%d %d' % (self.numbers[key], pos))
+                bodies.append(body)
+                pos += len(body) + 1
+            head = b' '.join(offsets) + b'\n'
+            data = zlib.compress(head + b'\n'.join(bodies) + b'\n', COMPRESS_LEVEL)
+            return (b'%d 0 obj\n<</Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d>>\nstream\n'
+                    % (number, len(item), len(head), len(data)) + data + b'\nendstream\nendobj\n')
+
+        number = self.numbers[item]
+        obj = self.value(item)
+        if kind == 'obj':
+            return b'%d 0 obj\n%s\nendobj\n' % (number, self._serialize(obj, self._ref))
+        new_filter, data = self._encode(obj)
+        entries = b''.join(b'%s %s\n' % (self._serialize(k, self._ref), self._serialize(v, self._ref))
+                           for k, v in obj.items()
+                           if k != '/Length' and not (new_filter and k == '/Filter'))
+        if new_filter:
+            entries += b'/Filter %s\n' % new_filter.encode()
+        self._release(item)
+        return (b'%d 0 obj\n<<%s/Length %d>>\nstream\n' % (number, entries, len(data))
+                + data + b'\nendstream\nendobj\n')
+
+    def write(self, output_path):
+        """Write the optimized, linearized file. Returns the number of object streams."""
+        part4, part6, part7, part8, part9 = self._parts()
+        u4, u6, u8, u9 = (self._units(p) for p in (part4, part6, part8, part9))
+        u7 = [self._units(p) for p in part7]
+
+        # Parts 7-9 are numbered first (main xref), then the first-page range
+        self.numbers = {}
+        rest = [u for units in u7 for u in units] + u8 + u9
+        main_xref = self._number(rest, 1)
+        first = self._number_packed(rest, main_xref + 1)  # linearization dictionary
+        first_xref = first + 1
+        hint_number = self._number(u4, first + 2)
+        size = self._number_packed(u4 + u6, self._number(u6, hint_number + 1))
+        objstms = sum(kind == 'objstm' for units in [u4, u6, u8, u9] + u7 for kind, _ in units)
+
+        with tempfile.TemporaryFile() as body:
+            # Body offsets of each unit; the hint stream goes in at hint_pos later
+            placed = []  # (unit, body offset, length)
+            sections = []  # (start, end, units) of each part, and of each page in parts 6-7
+            for units in [u4, u6] + u7 + [u8, u9]:
+                start = body.tell()
+                for unit in units:
+                    offset = body.tell()
+                    body.write(self._unit_bytes(unit))
+                    placed.append((unit, offset, body.tell() - offset))
+                sections.append((start, body.tell(), units))
+            body_size = body.tell()
+            hint_pos = sections[0][1]
+
+            width = 4 if body_size < 2 ** 32 - 2 ** 24 else 8
+            entry = lambda kind, a, b: bytes([kind]) + a.to_bytes(width, 'big') + b.to_bytes(2, 'big')
+
+            lin_len = len(self._linearization_dict(first, [0] * 7))
+            xref_len = len(self._first_xref(first, first_xref, size, width, 0, b''))
+            xref_len += (size - first) * (width + 3)
+            prefix = len(HEADER) + lin_len + xref_len + len(EOF_MARKER % 0)
+
+            hint_data, shared_offset = self._hint_tables(placed, sections, prefix, u6, u8)
+            hint = (b'%d 0 obj\n<</S %d /Filter /FlateDecode /Length %d>>\nstream\n'
+                    % (hint_number, shared_offset, len(hint_data)) + hint_data + b'\nendstream\nendobj\n')
+
+            def offset(body_offset):
+                return prefix + body_offset + (len(hint) if body_offset >= hint_pos else 0)
+
+            xref = {first: (1, len(HEADER), 0), first_xref: (1, len(HEADER) + lin_len, 0),
+                    hint_number: (1, offset(hint_pos) - len(hint), 0)}
+            for unit, body_offset, _ in placed:
+                kind, item = unit
+                if kind == 'objstm':
+                    container = self.numbers[('objstm', id(item))]
+                    xref[container] = (1, offset(body_offset), 0)
+                    for index, key in enumerate(item):
+                        xref[self.numbers[key]] = (2, container, index)
+                else:
+                    xref[self.numbers[item]] = (1, offset(body_offset), 0)
+
+            main_offset = offset(body_size)
+            xref[main_xref] = (1, main_offset, 0)
+            rows = entry(0, 0, 65535) + b''.join(entry(*xref[n]) for n in range(1, first))
+            rows = zlib.compress(rows, COMPRESS_LEVEL)
+            main = (b'%d 0 obj\n<</Type /XRef /Size %d /W [1 %d 2] /Index [0 %d] /Filter /FlateDecode'
+                    b' /Length %d>>\nstream\n' % (main_xref, first, width, first, len(rows))
+                    + rows + b'\nendstream\nendobj\n')
+            total = main_offset + len(main) + len(EOF_MARKER % (len(HEADER) + lin_len))
+
+            page0 = self.numbers[self.pages[0]]
+            lin = self._linearization_dict(first, [total, offset(hint_pos) - len(hint), len(hint), page0,
+                                                   offset(sections[1][1]), len(self.pages), main_offset])
+            first_rows = b''.join(entry(*xref[n]) for n in range(first, size))
+            first_xref_obj = self._first_xref(first, first_xref, size, width, main_offset, first_rows)
+            assert len(lin) == lin_len and len(first_xref_obj) == xref_len
+
+            with open(output_path, 'wb') as out:
+                out.write(HEADER + lin + first_xref_obj + EOF_MARKER % 0)
+                body.seek(0)
+                _copy(body, out, hint_pos)
+                out.write(hint)
+                shutil.copyfileobj(body, out)
+                out.write(main + EOF_MARKER % (len(HEADER) + lin_len))
+        return objstms
+
+    @staticmethod
+    def _linearization_dict(number, values):
+        length, hint_offset, hint_length, page0, end, pages, main = values
+        # Fixed-width numbers: the dictionary is sized before the offsets are known
+        return (b'%d 0 obj\n<</Linearized 1 /L %-12d /H [%-12d %-12d] /O %-10d /E %-12d /N %-10d /T %-12d>>\n'
+                b'endobj\n' % (number, length, hint_offset, hint_length, page0, end, pages, main))
+
+    def _first_xref(self, first, number, size, width, prev, rows):
+        """The first-page xref stream: uncompressed, so its size is known up front."""
+        ids = b''
+        if self.ids is not None:
+            ids = b' /ID ' + self._serialize(self.ids, self._ref)
+        info = b' /Info %s' % self._ref(self.info) if self.info is not None else b''
+        return (b'%d 0 obj\n<</Type /XRef /Size %d /W [1 %d 2] /Index [%d %d] /Root %s%s%s /Prev %-12d'
+                b' /Length %d>>\nstream\n' % (number, size, width, first, size - first,
+                                              self._ref(self.root), info, ids, prev,
+                                              (size - first) * (width + 3))
+                + rows + b'\nendstream\nendobj\n')
+
+    def _hint_tables(self, placed, sections, prefix, u6, u8):
+        """Page offset and shared object hint tables (Annex F.4). Returns (data, shared table offset).
+
+        Offsets count from the start of the file as if the hint stream
+        were not there, as the format requires.
+        """
+        unit_at = {}
+        offsets, lengths = {}, {}
+        for unit, body_offset, length in placed:
+            kind, item = unit
+            offsets[id(unit)] = body_offset
+            lengths[id(unit)] = length
+            for key in (item if kind == 'objstm' else [item]):
+                unit_at[key] = unit
+
+        # Shared object groups: every unit of the first page, then part 8
+        groups = u6 + u8
+        group_index = {id(u): i for i, u in enumerate(groups)}
+
+        page_sections = sections[1:1 + len(self.pages)]
+        nobjects, page_lengths, shared_refs = [], [], []
+        for i, (start, end, units) in enumerate(page_sections):
+            nobjects.append(len(units))
+            page_lengths.append(end - start)
+            refs = []
+            if i:
+                for key in self.page_objects[i]:
+                    unit = unit_at.get(key)
+                    index = group_index.get(id(unit)) if unit is not None else None
+                    if index is not None and index not in refs:
+                        refs.append(index)
+            shared_refs.append(refs)
+
+        w = _BitWriter()
+        min_objects, min_length = min(nobjects), min(page_lengths)
+        bits_objects = _nbits(max(nobjects) - min_objects)
+        bits_length = _nbits(max(page_lengths) - min_length)
+        bits_nshared = _nbits(max(len(r) for r in shared_refs))
+        bits_shared_id = _nbits(max((max(r) for r in shared_refs if r), default=0))
+        for value, nbits in ((min_objects, 32), (prefix + page_sections[0][0], 32), (bits_objects, 16),
+                             (min_length, 32), (bits_length, 16), (0, 32), (0, 16),
+                             (min_length, 32), (bits_length, 16), (bits_nshared, 16),
+                             (bits_shared_id, 16), (0, 16), (0, 16)):
+            w.write(value, nbits)
+        for values, nbits in (([n - min_objects for n in nobjects], bits_objects),
+                              ([n - min_length for n in page_lengths], bits_length),
+                              ([len(r) for r in shared_refs], bits_nshared),
+                              ([i for r in shared_refs for i in r], bits_shared_id),
+                              ([0] * len(nobjects), 0),
+                              ([n - min_length for n in page_lengths], bits_length)):
+            for value in values:
+                w.write(value, nbits)
+            w.flush()
+
+        shared_offset = len(w.out)
+        # One object (an object stream counts as one) per group
+        group_lengths = [lengths[id(u)] for u in groups]
+        min_group = min(group_lengths)
+        bits_group = _nbits(max(group_lengths) - min_group)
+        first_shared, first_shared_offset = 0, 0
+        if u8:
+            first_shared = self._unit_number(u8[0])
+            first_shared_offset = prefix + offsets[id(u8[0])]
+        for value, nbits in ((first_shared, 32), (first_shared_offset, 32), (len(u6), 32),
+                             (len(groups), 32), (0, 16), (min_group, 32), (bits_group, 16)):
+            w.write(value, nbits)
+        for values, nbits in (([n - min_group for n in group_lengths], bits_group),
+                              ([0] * len(groups), 1)):
+            for value in values:
+                w.write(value, nbits)
+            w.flush()
+        return zlib.compress(bytes(w.out), COMPRESS_LEVEL), shared_offset
+
+
+class _Raw:
+    """Literal PDF syntax."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _copy(src, dest, length):
+    while length:
+        chunk = src.read(min(length, 1024 * 1024))
+        dest.write(chunk)
+        length -= len(chunk)
+
+
+def optimize_pdf(input_path, output_path):
+    """Write an optimized, linearized copy of input_path to output_path.
+
+    Returns a report: sizes before and after, pages, objects merged with an
+    identical one, streams recompressed and object streams written.
+    """
+    with metrics.span('optimize'):
+        optimizer = PdfOptimizer(input_path)
+        try:
+            objstms = optimizer.write(output_path)
+        except BaseException:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+    return {'before': os.path.getsize(input_path), 'after': os.path.getsize(output_path),
+            'pages': len(optimizer.pages), 'deduplicated': optimizer.deduplicated,
+            'recompressed': optimizer.recompressed, 'objectStreams': objstms}
+
+
+def optimize_file(path, linearize=False):
+    """Optimize the PDF at path in place. Returns optimize_pdf's report.
+
+    The original is kept when the optimized file is not smaller, unless
+    `linearize` asks for a linearized file whatever its size; the
+    report's 'replaced' says which one is at path now. The new file is
+    written next to the old one and renamed over it, never rewritten in
+    place: outputs can be hard links to conversion cache entries, which
+    must not change.
+    """
+    tmp = f'{path}.{os.getpid()}.optimized.tmp'
+    report = optimize_pdf(path, tmp)
+    report['replaced'] = linearize or report['after'] < report['before']
+    if report['replaced']:
+        os.replace(tmp, path)
+    else:
+        os.remove(tmp)
+    return report
@@ -0,0 +1,273 @@
+import hashlib
+import io
+import os
+import re
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+import metrics
+
+# Merging, splitting and page extraction. Pages are copied object by
+# object straight into the output file: content streams and images keep
+# their original encoded bytes, and nothing is kept in memory after it
+# has been written. Fonts, images and other streams that are byte-for-byte
+# identical across the inputs are written only once.
+
+# Attributes a page can inherit from its /Pages ancestors
+INHERITED = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+# Page keys not copied: the page tree is rebuilt, and article beads point
+# into the source document's catalog
+SKIPPED_PAGE_KEYS = {'/Parent', '/B'}
+# Dictionaries worth de-duplicating besides streams
+SHARED_TYPES = {'/Font', '/FontDescriptor', '/Encoding', '/ExtGState'}
+
+_RANGE = re.compile(r'^\s*(\d*)\s*(-?)\s*(\d*)\s*$')
+
+
+def parse_pages(spec, page_count):
+    """Turn '1-3,5,8-' (1-based, inclusive) into a list of 0-based page indices.
+
+    A list of numbers or range strings is accepted too. Raises ValueError
+    for empty, malformed or out-of-range specs.
+    """
+    parts = spec.split(',') if isinstance(spec, str) else [str(p) for p in spec]
+    indices = []
+    for part in parts:
+        m = _RANGE.match(part)
+        if not m or not (m.group(1) or m.group(3)):
+            raise ValueError(f"Invalid page range: {part.strip()!r}")
+        first = int(m.group(1)) if m.group(1) else 1
+        last = (int(m.group(3)) if m.group(3) else page_count) if m.group(2) else first
+        if not 1 <= first <= last <= page_count:
+            raise ValueError(f"Page range {part.strip()!r} is outside 1-{page_count}")
+        indices.extend(range(first - 1, last))
+    if not indices:
+        raise ValueError("No pages selected")
+    return indices
+
+
+def open_pdf(path):
+    """PdfReader for path, refusing encrypted files."""
+    reader = PdfReader(path)
+    if reader.is_encrypted:
+        raise ValueError(f"{os.path.basename(path)} is encrypted")
+    return reader
+
+# --------------------------------------------------
+# Streaming Page Copier
+# --------------------------------------------------
+
+class PdfPageCopier:
+    """Write pages taken from other PDFs into a new file as they are added.
+
+    Only the byte offset of each written object, the page list and one
+    digest per distinct shared stream or font are kept in memory. Call
+    close() to write the page tree and xref table, or abort() to remove
+    the partial file.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.page_count = 0
+        self.deduplicated = 0  # objects not written because an identical one was
+        self._fp = open(output_path, 'wb')
+        self._fp.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        self._offsets = [None]  # object id -> file offset; id 0 is unused
+        self._pages_id = self._reserve()
+        self._kids = []
+        self._shared = {}  # digest -> object id, across all inputs
+        self._ids = {}  # (idnum, generation) in the current input -> object id
+        self._page_ids = {}
+        self._active = set()
+
+    def _reserve(self):
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _write(self, obj_id, data):
+        self._offsets[obj_id] = self._fp.tell()
+        self._fp.write(b'%d 0 obj\n' % obj_id)
+        self._fp.write(data)
+        self._fp.write(b'\nendobj\n')
+
+    def add_pages(self, reader, indices):
+        """Append reader.pages[i] for each i in indices, in that order."""
+        pages = [reader.pages[i] for i in indices]
+        # Page ids are fixed first, so links between copied pages still work
+        self._ids = {}
+        self._page_ids = {}
+        new_ids = []
+        for page in pages:
+            ref = page.indirect_reference
+            key = (ref.idnum, ref.generation)
+            new_ids.append(self._reserve())
+            self._page_ids.setdefault(key, new_ids[-1])
+        for page, page_id in zip(pages, new_ids):
+            self._write(page_id, self._page_bytes(page))
+            self._kids.append(page_id)
+            self.page_count += 1
+        # Nothing from this input is referenced again
+        self._ids = {}
+        self._page_ids = {}
+
+    def _page_bytes(self, page):
+        entries = {k: v for k, v in page.items() if k not in SKIPPED_PAGE_KEYS}
+        node = page
+        while '/Parent' in node and not all(k in entries for k in INHERITED):
+            node = node['/Parent'].get_object()
+            for key in INHERITED:
+                if key not in entries and key in node:
+                    entries[key] = node.raw_get(key)
+        out = io.BytesIO()
+        out.write(b'<<')
+        for key, value in entries.items():
+            out.write(b'%s %s\n' % (self._value(NameObject(key)), self._value(value)))
+        out.write(b'/Parent %d 0 R>>' % self._pages_id)
+        return out.getvalue()
+
+    def _copy(self, ref):
+        """Copy the object ref points to (and everything it uses); return its new id."""
+        key = (ref.idnum, ref.generation)
+        if key in self._ids:
+            return self._ids[key]
+        if key in self._page_ids:
+            return self._page_ids[key]
+        if key in self._active:
+            # A cycle: hand out the id now, the object is written when its
+            # first visit finishes
+            self._ids[key] = self._reserve()
+            return self._ids[key]
+
+        obj = ref.get_object()
+        if isinstance(obj, DictionaryObject) and obj.get('/Type') in ('/Page', '/Pages'):
+            return None  # a page that is not being copied, or the old page tree
+
+        self._active.add(key)
+        data = self._object_bytes(obj)
+        self._active.discard(key)
+
+        if key in self._ids:
+            obj_id = self._ids[key]
+            self._write(obj_id, data)
+            return obj_id
+        digest = None
+        if isinstance(obj, StreamObject) or (isinstance(obj, DictionaryObject)
+                                             and obj.get('/Type') in SHARED_TYPES):
+            digest = hashlib.sha256(data).digest()
+            if digest in self._shared:
+                self.deduplicated += 1
+                self._ids[key] = self._shared[digest]
+                return self._ids[key]
+        obj_id = self._reserve()
+        self._write(obj_id, data)
+        if digest is not None:
+            self._shared[digest] = obj_id
+        self._ids[key] = obj_id
+        return obj_id
+
+    def _object_bytes(self, obj):
+        if isinstance(obj, StreamObject):
+            # The encoded bytes are copied as they are; only the dictionary
+            # is rewritten
+            entries = b''.join(b'%s %s\n' % (self._value(k), self._value(v))
+                               for k, v in obj.items() if k != '/Length')
+            return (b'<<%s/Length %d>>\nstream\n' % (entries, len(obj._data))
+                    + obj._data + b'\nendstream')
+        return self._value(obj)
+
+    def _value(self, value):
+        """Serialize a direct value, copying the objects it refers to."""
+        if isinstance(value, IndirectObject):
+            obj_id = self._copy(value)
+            return b'null' if obj_id is None else b'%d 0 R' % obj_id
+        if isinstance(value, StreamObject):
+            raise ValueError("Direct stream objects are not allowed")
+        if isinstance(value, DictionaryObject):
+            return b'<<' + b''.join(b'%s %s\n' % (self._value(k), self._value(v))
+                                    for k, v in value.items()) + b'>>'
+        if isinstance(value, ArrayObject):
+            return b'[' + b' '.join(self._value(v) for v in value) + b']'
+        out = io.BytesIO()
+        value.write_to_stream(out, None)
+        return out.getvalue()
+
+    def close(self):
+        """Write the page tree, catalog, xref table and trailer, then close."""
+        self._offsets[self._pages_id] = self._fp.tell()
+        kids = b' '.join(b'%d 0 R' % k for k in self._kids)
+        self._fp.write(b'%d 0 obj\n<</Type /Pages /Count %d /Kids [%s]>>\nendobj\n'
+                       % (self._pages_id, len(self._kids), kids))
+        root_id = self._reserve()
+        self._write(root_id, b'<</Type /Catalog /Pages %d 0 R>>' % self._pages_id)
+
+        xref = self._fp.tell()
+        self._fp.write(b'xref\n0 %d\n0000000000 65535 f \n' % len(self._offsets))
+        for offset in self._offsets[1:]:
+            self._fp.write(b'%010d 00000 n \n' % offset)
+        self._fp.write(b'trailer\n<</Size %d /Root %d 0 R>>\nstartxref\n%d\n%%%%EOF\n'
+                       % (len(self._offsets), root_id, xref))
+        self._fp.close()
+
+    def abort(self):
+        """Close and remove a partially written file."""
+        self._fp.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+# --------------------------------------------------
+# Operations
+# --------------------------------------------------
+
+def merge_pdfs(input_paths, output_path):
+    """Concatenate every page of input_paths into output_path.
+
+    Inputs are opened one at a time. Returns
+    {'pages': page count, 'deduplicated': objects shared instead of copied}.
+    """
+    with metrics.span('pdf_write'), PdfPageCopier(output_path) as copier:
+        for path in input_paths:
+            reader = open_pdf(path)
+            copier.add_pages(reader, range(len(reader.pages)))
+    metrics.PAGES.inc(copier.page_count, type='merge')
+    return {'pages': copier.page_count, 'deduplicated': copier.deduplicated}
+
+
+def extract_pages(input_path, output_path, spec):
+    """Write the pages selected by spec (see parse_pages) to output_path.
+
+    Returns the number of pages written.
+    """
+    reader = open_pdf(input_path)
+    indices = parse_pages(spec, len(reader.pages))
+    with metrics.span('pdf_write'), PdfPageCopier(output_path) as copier:
+        copier.add_pages(reader, indices)
+    metrics.PAGES.inc(copier.page_count, type='extract')
+    return copier.page_count
+
+
+def split_pdf(input_path, output_paths, specs):
+    """Write one PDF per page spec: output_paths[i] gets the pages of specs[i].
+
+    All specs are checked before anything is written. Returns the page
+    count of each output.
+    """
+    reader = open_pdf(input_path)
+    selections = [parse_pages(spec, len(reader.pages)) for spec in specs]
+    counts = []
+    with metrics.span('pdf_write'):
+        for output_path, indices in zip(output_paths, selections):
+            with PdfPageCopier(output_path) as copier:
+                copier.add_pages(reader, indices)
+            counts.append(copier.page_count)
+    metrics.PAGES.inc(sum(counts), type='split')
+    return counts
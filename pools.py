@@ -0,0 +1,20 @@
+# Process pools are replaced when they are resized, break, or have a
+# worker stuck past its timeout. shutdown(wait=False) alone does not stop
+# a worker that is busy (e.g. looping inside C code): the process would
+# live on with its pool, so the old pool's workers are killed here.
+
+STOP_WAIT = 5.0  # seconds a worker gets to exit after SIGTERM
+
+
+def terminate_pool(pool):
+    """Shut a ProcessPoolExecutor down without waiting, killing its workers."""
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(STOP_WAIT)
+        if process.is_alive():
+            process.kill()
+            process.join()
@@ -0,0 +1,866 @@
+import hashlib
+import io
+import json
+import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+import metrics
+
+REDACTED = "[REDACTED]"
+MATCHER_CACHE_SIZE = 64
+
+# --------------------------------------------------
+# Rule Compilation
+# --------------------------------------------------
+
+def normalize_rules(terms, ignore_case=False):
+    """Turn the /api/redact `terms` list into (pattern, is_regex, ignore_case) rules.
+
+    Each entry is either a plain string or an object like
+    {"term": "...", "regex": true, "ignoreCase": true}. Blank terms are dropped.
+    """
+    rules = []
+    for t in terms:
+        if isinstance(t, dict):
+            pattern = t.get('term') or t.get('pattern') or ''
+            is_regex = bool(t.get('regex', False))
+            icase = bool(t.get('ignoreCase', ignore_case))
+        else:
+            pattern, is_regex, icase = str(t), False, ignore_case
+        if pattern.strip():
+            rules.append((pattern, is_regex, icase))
+    return rules
+
+
+def _trie_pattern(words):
+    """Build a regex that matches any of `words`, longest match first.
+
+    The words are folded into a prefix trie so the regex engine only
+    follows one branch per character, instead of trying thousands of
+    alternatives at every position.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        end = '' in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            # Optional and greedy, so "abc" wins over "ab"
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class RedactionMatcher:
+    """All redaction rules compiled into one regex that scans text in a single pass."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        literals = sorted({p for p, is_regex, icase in rules if not is_regex and not icase})
+        literals_ci = sorted({p.lower() for p, is_regex, icase in rules if not is_regex and icase})
+
+        parts = []
+        if literals:
+            parts.append(_trie_pattern(literals))
+        if literals_ci:
+            parts.append('(?i:' + _trie_pattern(literals_ci) + ')')
+        for pattern, is_regex, icase in rules:
+            if is_regex:
+                parts.append(('(?i:' if icase else '(?:') + pattern + ')')
+        self.regex = re.compile('|'.join(parts)) if parts else None
+
+    def finditer(self, text):
+        """Yield (start, end) spans of every non-empty match in text."""
+        if self.regex is None:
+            return
+        for m in self.regex.finditer(text):
+            if m.end() > m.start():
+                yield m.start(), m.end()
+
+    def redact(self, text, replacement=REDACTED):
+        """Return (text with every match replaced, number of matches)."""
+        if self.regex is None:
+            return text, 0
+        count = 0
+
+        def sub(m):
+            nonlocal count
+            if m.end() == m.start():
+                return m.group(0)
+            count += 1
+            return replacement
+
+        return self.regex.sub(sub, text), count
+
+# --------------------------------------------------
+# Matcher Cache
+# --------------------------------------------------
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def rules_key(rules):
+    """Stable hash of a rule list, used as the matcher cache key."""
+    return hashlib.sha256(json.dumps(rules, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def get_matcher(terms, ignore_case=False):
+    """Return a compiled matcher for terms, reusing one built for the same list."""
+    rules = normalize_rules(terms, ignore_case)
+    key = rules_key(rules)
+    with _cache_lock:
+        matcher = _cache.get(key)
+        if matcher is not None:
+            _cache.move_to_end(key)
+            return matcher
+
+    matcher = RedactionMatcher(rules)  # compiled outside the lock
+    with _cache_lock:
+        _cache[key] = matcher
+        _cache.move_to_end(key)
+        while len(_cache) > MATCHER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return matcher
+
+# --------------------------------------------------
+# Page Geometry
+# --------------------------------------------------
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def mult(m, n):
+    """Multiply two PDF matrices (a b c d e f), m applied first."""
+    a, b, c, d, e, f = m
+    p, q, r, s, t, u = n
+    return (a * p + b * r, a * q + b * s,
+            c * p + d * r, c * q + d * s,
+            e * p + f * r + t, e * q + f * s + u)
+
+
+def transform_bbox(m, x0, y0, x1, y1):
+    """Axis-aligned bbox of the rectangle (x0, y0, x1, y1) after matrix m."""
+    a, b, c, d, e, f = m
+    xs, ys = [], []
+    for x, y in ((x0, y0), (x1, y0), (x0, y1), (x1, y1)):
+        xs.append(a * x + c * y + e)
+        ys.append(b * x + d * y + f)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def invert(m):
+    a, b, c, d, e, f = m
+    det = a * d - b * c
+    if det == 0:
+        return None
+    return (d / det, -b / det, -c / det, a / det,
+            (c * f - d * e) / det, (b * e - a * f) / det)
+
+
+def intersects(box, rect):
+    return box[0] < rect[2] and rect[0] < box[2] and box[1] < rect[3] and rect[1] < box[3]
+
+
+def viewer_box_to_pdf(page, box, scale=1.0):
+    """Convert a box drawn in the pdf.js viewer into PDF user space.
+
+    `box` has x/y (top-left corner) and width/height in viewer pixels at
+    `scale`, as posted by redact_editor.html. Page rotation is undone the
+    same way pdf.js applies it.
+    """
+    x0, y0, x1, y1 = (float(v) for v in page.cropbox)
+    rotation = int(page.get('/Rotate', 0) or 0) % 360
+    corners = []
+    for u, v in ((box['x'], box['y']),
+                 (box['x'] + box['width'], box['y'] + box['height'])):
+        u, v = float(u) / scale, float(v) / scale
+        if rotation == 90:
+            corners.append((x0 + v, y0 + u))
+        elif rotation == 180:
+            corners.append((x1 - u, y0 + v))
+        elif rotation == 270:
+            corners.append((x1 - v, y1 - u))
+        else:
+            corners.append((x0 + u, y1 - v))
+    (ax, ay), (bx, by) = corners
+    return min(ax, bx), min(ay, by), max(ax, bx), max(ay, by)
+
+# --------------------------------------------------
+# Fonts
+# --------------------------------------------------
+
+class FontInfo:
+    """Glyph widths and text decoding for one font resource."""
+
+    def __init__(self, name, font, resources):
+        from reportlab.pdfbase import pdfmetrics
+
+        self.name = name
+        self.resources = resources
+        subtype = font.get('/Subtype')
+        self.code_len = 2 if subtype == '/Type0' else 1
+        self.scale = 0.001
+        if subtype == '/Type3' and '/FontMatrix' in font:
+            self.scale = float(font['/FontMatrix'][0])
+
+        self.default_width = 500.0
+        self.widths = {}
+        descriptor = font.get('/FontDescriptor')
+        if subtype == '/Type0':
+            cid_font = font['/DescendantFonts'][0].get_object()
+            descriptor = cid_font.get('/FontDescriptor')
+            self.default_width = float(cid_font.get('/DW', 1000))
+            self._parse_cid_widths(cid_font.get('/W', []))
+        elif '/Widths' in font:
+            first = int(font.get('/FirstChar', 0))
+            for i, w in enumerate(font['/Widths']):
+                self.widths[first + i] = float(w)
+            if descriptor is not None:
+                self.default_width = float(descriptor.get_object().get('/MissingWidth', 0))
+        else:
+            base = str(font.get('/BaseFont', ''))[1:]
+            if base in pdfmetrics.standardFonts:
+                self.widths = dict(enumerate(pdfmetrics.getFont(base).widths))
+
+        self.ascent, self.descent = 0.8, -0.2
+        if descriptor is not None and subtype != '/Type3':
+            descriptor = descriptor.get_object()
+            if descriptor.get('/Ascent'):
+                self.ascent = float(descriptor['/Ascent']) / 1000
+            if descriptor.get('/Descent'):
+                self.descent = float(descriptor['/Descent']) / 1000
+        self._charmap = None
+
+    def _parse_cid_widths(self, w):
+        w = [x.get_object() for x in w]
+        i = 0
+        while i + 1 < len(w):
+            if isinstance(w[i + 1], list):
+                first = int(w[i])
+                for j, width in enumerate(w[i + 1]):
+                    self.widths[first + j] = float(width)
+                i += 2
+            else:
+                first, last, width = int(w[i]), int(w[i + 1]), float(w[i + 2])
+                for code in range(first, last + 1):
+                    self.widths[code] = width
+                i += 3
+
+    def codes(self, data):
+        """Split a shown string into glyph codes."""
+        n = self.code_len
+        return [data[i:i + n] for i in range(0, len(data), n)]
+
+    def width(self, code):
+        """Glyph advance in text space units (before font size)."""
+        return self.widths.get(int.from_bytes(code, 'big'), self.default_width) * self.scale
+
+    def decode(self, code):
+        """Best-effort Unicode text for one glyph code, as PyPDF2 extracts it."""
+        if self._charmap is None:
+            from PyPDF2._cmap import build_char_map
+            try:
+                _, _, encoding, map_dict, _ = build_char_map(
+                    self.name, 200.0, {'/Resources': self.resources})
+            except Exception:
+                encoding, map_dict = 'charmap', {}
+            self._charmap = (encoding, map_dict)
+        encoding, map_dict = self._charmap
+        try:
+            if isinstance(encoding, str):
+                text = code.decode(encoding, 'surrogatepass')
+            else:
+                text = ''.join(encoding.get(x, chr(x)) for x in code)
+        except Exception:
+            text = code.decode('latin-1')
+        return ''.join(map_dict.get(ch, ch) for ch in text)
+
+
+def _raw_bytes(s):
+    """Original byte codes of a string operand parsed by PyPDF2."""
+    if isinstance(s, bytes):
+        return bytes(s)
+    if hasattr(s, 'get_original_bytes'):
+        return s.get_original_bytes()
+    return s.encode('latin-1', 'replace')
+
+# --------------------------------------------------
+# Content Stream Redaction
+# --------------------------------------------------
+
+class _ContentWalker:
+    """Interpret a content stream, tracking where text, images and forms land.
+
+    In collect mode every shown glyph is recorded as (text, bbox). In redact
+    mode, glyphs whose centre falls inside a redaction rectangle are
+    replaced by an equivalent positioning offset, so the text after them
+    keeps its place. Images and forms under a rectangle are rewritten or
+    dropped. Rectangles and boxes are in page user space.
+    """
+
+    def __init__(self, pdf, rects=None, fonts=None):
+        self.pdf = pdf
+        self.rects = rects or []
+        self.fonts = fonts if fonts is not None else {}
+        self.glyphs = []
+        self.replacements = {}
+        self.used = set()  # XObject names still drawn by the rewritten stream
+        self.dropped = set()
+        self.removed = 0
+        self._next_name = 0
+
+    def _font(self, name, resources):
+        fonts = resources.get('/Font')
+        fonts = fonts.get_object() if fonts is not None else {}
+        if name not in fonts:
+            return None
+        font_ref = fonts.raw_get(name)
+        key = getattr(font_ref, 'idnum', None) or (id(resources), name)
+        info = self.fonts.get(key)
+        if info is None:
+            info = self.fonts[key] = FontInfo(name, font_ref.get_object(), resources)
+        return info
+
+    def _hit(self, box):
+        cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+        return any(r[0] <= cx <= r[2] and r[1] <= cy <= r[3] for r in self.rects)
+
+    def _new_name(self):
+        self._next_name += 1
+        return f'/Redacted{self._next_name}'
+
+    def walk(self, operations, resources, ctm=IDENTITY):
+        """Walk operations and return the (possibly rewritten) operation list."""
+        from PyPDF2.generic import ArrayObject, NameObject
+
+        out = []
+        stack = []
+        state = {'ctm': ctm, 'font': None, 'size': 0.0, 'tc': 0.0, 'tw': 0.0,
+                 'th': 1.0, 'tl': 0.0, 'rise': 0.0}
+        tm = tlm = IDENTITY
+
+        for operands, op in operations:
+            if op == b'q':
+                stack.append(dict(state))
+            elif op == b'Q':
+                if stack:
+                    state = stack.pop()
+            elif op == b'cm' and len(operands) == 6:
+                state['ctm'] = mult(tuple(float(v) for v in operands), state['ctm'])
+            elif op == b'BT':
+                tm = tlm = IDENTITY
+            elif op in (b'Td', b'TD'):
+                tx, ty = float(operands[0]), float(operands[1])
+                if op == b'TD':
+                    state['tl'] = -ty
+                tm = tlm = mult((1, 0, 0, 1, tx, ty), tlm)
+            elif op == b'Tm':
+                tm = tlm = tuple(float(v) for v in operands)
+            elif op == b'T*':
+                tm = tlm = mult((1, 0, 0, 1, 0, -state['tl']), tlm)
+            elif op == b'Tf':
+                state['font'] = self._font(operands[0], resources)
+                state['size'] = float(operands[1])
+            elif op == b'Tc':
+                state['tc'] = float(operands[0])
+            elif op == b'Tw':
+                state['tw'] = float(operands[0])
+            elif op == b'Tz':
+                state['th'] = float(operands[0]) / 100
+            elif op == b'TL':
+                state['tl'] = float(operands[0])
+            elif op == b'Ts':
+                state['rise'] = float(operands[0])
+            elif op in (b'Tj', b'TJ', b"'", b'"'):
+                prefix = []
+                if op in (b"'", b'"'):
+                    if op == b'"':
+                        state['tw'], state['tc'] = float(operands[0]), float(operands[1])
+                        prefix = [([operands[0]], b'Tw'), ([operands[1]], b'Tc')]
+                    tm = tlm = mult((1, 0, 0, 1, 0, -state['tl']), tlm)
+                    prefix.append(([], b'T*'))
+                items = operands[0] if op == b'TJ' else [operands[-1]]
+                tm, new_items = self._show(items, state, tm)
+                if new_items is None:
+                    out.append((operands, op))
+                else:
+                    out.extend(prefix)
+                    out.append(([ArrayObject(new_items)], b'TJ'))
+                continue
+            elif op == b'Do':
+                new_name = self._do(operands[0], resources, state['ctm'])
+                if new_name is False:
+                    continue
+                if new_name is not None:
+                    out.append(([NameObject(new_name)], op))
+                    continue
+                self.used.add(str(operands[0]))
+            elif op == b'INLINE IMAGE':
+                box = transform_bbox(state['ctm'], 0, 0, 1, 1)
+                if self.rects and any(intersects(box, r) for r in self.rects):
+                    self.removed += 1
+                    continue
+            out.append((operands, op))
+        return out
+
+    def _show(self, items, state, tm):
+        """Advance through a TJ array. Returns (tm, new items or None if unchanged)."""
+        from PyPDF2.generic import ByteStringObject, FloatObject
+
+        font, size, th = state['font'], state['size'], state['th']
+        if font is None:
+            return tm, None
+        if self.rects:
+            # Most runs are nowhere near a box, so test the whole run once
+            # before placing individual glyphs.
+            x = lo = hi = 0.0
+            for item in items:
+                if not isinstance(item, (str, bytes)):
+                    x -= float(item) / 1000 * size * th
+                    continue
+                for code in font.codes(_raw_bytes(item)):
+                    w0 = font.width(code)
+                    lo, hi = min(lo, x), max(hi, x + w0 * size * th)
+                    x += (w0 * size + state['tc'] + (state['tw'] if code == b' ' else 0)) * th
+            lo, hi = min(lo, x), max(hi, x)
+            run = transform_bbox(mult(tm, state['ctm']), lo, state['rise'] + font.descent * size,
+                                 hi, state['rise'] + font.ascent * size)
+            if not any(run[0] <= r[2] and r[0] <= run[2] and run[1] <= r[3] and r[1] <= run[3]
+                       for r in self.rects):
+                return mult((1, 0, 0, 1, x, 0), tm), None
+
+        trm_base = (size * th, 0, 0, size, 0, state['rise'])
+        new_items, pending, changed = [], b'', False
+
+        def flush_offset(offset):
+            if new_items and isinstance(new_items[-1], FloatObject):
+                new_items[-1] = FloatObject(float(new_items[-1]) + offset)
+            else:
+                new_items.append(FloatObject(offset))
+
+        for item in items:
+            if not isinstance(item, (str, bytes)):
+                adjust = float(item)
+                tm = mult((1, 0, 0, 1, -adjust / 1000 * size * th, 0), tm)
+                if pending:
+                    new_items.append(ByteStringObject(pending))
+                    pending = b''
+                flush_offset(adjust)
+                continue
+            for code in font.codes(_raw_bytes(item)):
+                w0 = font.width(code)
+                trm = mult(mult(trm_base, tm), state['ctm'])
+                box = transform_bbox(trm, 0, font.descent, w0, font.ascent)
+                advance = (w0 * size + state['tc']
+                           + (state['tw'] if code == b' ' else 0)) * th
+                if self.rects and self._hit(box):
+                    changed = True
+                    self.removed += 1
+                    if pending:
+                        new_items.append(ByteStringObject(pending))
+                        pending = b''
+                    if size * th:
+                        flush_offset(-advance / (size * th) * 1000)
+                else:
+                    pending += code
+                    if not self.rects:
+                        self.glyphs.append((font.decode(code), box))
+                tm = mult((1, 0, 0, 1, advance, 0), tm)
+        if pending:
+            new_items.append(ByteStringObject(pending))
+        return tm, (new_items if changed else None)
+
+    def unused(self):
+        """Original XObject names that the rewritten stream no longer draws."""
+        return sorted(({r[1] for r in self.replacements.values()} | self.dropped) - self.used)
+
+    def _do(self, name, resources, ctm):
+        """Handle a Do. Returns None to keep it, False to drop it, or a new name."""
+        xobjects = resources.get('/XObject')
+        if xobjects is None or name not in xobjects:
+            return None
+        xobj = xobjects[name].get_object()
+        subtype = xobj.get('/Subtype')
+        if subtype == '/Image':
+            box = transform_bbox(ctm, 0, 0, 1, 1)
+            hits = [r for r in self.rects if intersects(box, r)]
+            if not hits:
+                return None
+            self.removed += 1
+            redacted = _redact_image(xobj, ctm, hits)
+            if redacted is None:
+                print(f"⚠️ Dropping image {name} that could not be redacted in place")
+                self.dropped.add(str(name))
+                return False
+            new_name = self._new_name()
+            self.replacements[new_name] = ('image', str(name)) + redacted
+            return new_name
+        if subtype == '/Form':
+            form_ctm = mult(tuple(float(v) for v in xobj.get('/Matrix', IDENTITY)), ctm)
+            bbox = [float(v) for v in xobj.get('/BBox', [0, 0, 0, 0])]
+            box = transform_bbox(form_ctm, *bbox)
+            if self.rects and not any(intersects(box, r) for r in self.rects):
+                return None
+            from PyPDF2.generic import ContentStream
+            inner = _ContentWalker(self.pdf, self.rects, self.fonts)
+            inner._next_name = self._next_name + 1000
+            form_res = xobj.get('/Resources')
+            form_res = form_res.get_object() if form_res is not None else resources
+            ops = inner.walk(ContentStream(xobj, self.pdf).operations, form_res, form_ctm)
+            self.glyphs.extend(inner.glyphs)
+            if not self.rects or not (inner.removed or inner.replacements):
+                return None
+            self.removed += inner.removed
+            new_name = self._new_name()
+            self.replacements[new_name] = ('form', str(name), _serialize(ops),
+                                           inner.replacements, inner.unused())
+            return new_name
+        return None
+
+
+def _redact_image(xobj, ctm, rects):
+    """Black out the parts of an image XObject under rects.
+
+    Returns (jpeg_bytes, width, height, colorspace) or None when the image
+    is in a format that cannot be rewritten safely.
+    """
+    from PIL import Image, ImageDraw
+
+    inverse = invert(ctm)
+    if inverse is None:
+        return None
+    filters = xobj.get('/Filter')
+    filters = list(filters) if isinstance(filters, list) else [filters] if filters else []
+    # get_data() undoes every filter except DCT, so JPEG bytes come out as-is
+    flt = filters[-1] if filters else None
+    colorspace = xobj.get('/ColorSpace')
+    try:
+        width, height = int(xobj['/Width']), int(xobj['/Height'])
+        if flt == '/DCTDecode':
+            im = Image.open(io.BytesIO(xobj.get_data()))
+            im.load()
+        elif flt in (None, '/FlateDecode') and int(xobj.get('/BitsPerComponent', 8)) == 8 \
+                and colorspace in ('/DeviceRGB', '/DeviceGray') and '/DecodeParms' not in xobj:
+            mode = 'RGB' if colorspace == '/DeviceRGB' else 'L'
+            im = Image.frombytes(mode, (width, height), xobj.get_data())
+        else:
+            return None
+    except Exception:
+        return None
+
+    if im.mode not in ('RGB', 'L'):
+        im = im.convert('RGB')
+    draw = ImageDraw.Draw(im)
+    for rect in rects:
+        # Page space -> image unit square -> pixels (row 0 is the top edge)
+        ux0, uy0, ux1, uy1 = transform_bbox(inverse, *rect)
+        draw.rectangle([ux0 * width, (1 - uy1) * height, ux1 * width, (1 - uy0) * height],
+                       fill=0)
+    buf = io.BytesIO()
+    im.save(buf, 'JPEG', quality=90)
+    return buf.getvalue(), im.width, im.height, '/DeviceRGB' if im.mode == 'RGB' else '/DeviceGray'
+
+
+def _serialize(operations):
+    from PyPDF2.generic import ContentStream
+    stream = ContentStream(None, None)
+    stream.operations = operations
+    return stream._data
+
+# --------------------------------------------------
+# Page Pipeline
+# --------------------------------------------------
+
+PARALLEL_MIN_PAGES = 8  # below this, a process pool costs more than it saves
+
+
+def _page_operations(pdf, page):
+    from PyPDF2.generic import ContentStream
+    contents = page.get('/Contents')
+    if contents is None:
+        return []
+    return ContentStream(contents.get_object(), pdf).operations
+
+
+def _page_resources(page):
+    resources = page.get('/Resources')
+    return resources.get_object() if resources is not None else {}
+
+
+def page_text(glyphs):
+    """Rebuild a page's text from its glyph list. Returns (text, starts, ends).
+
+    A space is inserted for wide gaps and a newline when the baseline
+    moves, so terms match the way they read. Glyph i's characters are
+    text[starts[i]:ends[i]].
+    """
+    text, starts, ends = [], [], []
+    pos = 0
+    prev = None
+    for chars, box in glyphs:
+        if prev is not None:
+            height = max(box[3] - box[1], 1.0)
+            if abs(box[1] - prev[1]) > height / 2:
+                text.append('\n')
+                pos += 1
+            elif box[0] - prev[2] > height * 0.25:
+                text.append(' ')
+                pos += 1
+        text.append(chars)
+        starts.append(pos)
+        pos += len(chars)
+        ends.append(pos)
+        prev = box
+    return ''.join(text), starts, ends
+
+
+def span_rects(spans, starts, ends, boxes):
+    """Rectangles covering text spans, one per line each span runs over.
+
+    `starts`, `ends` and `boxes` describe the glyphs as returned by
+    page_text(); `ends` never decreases, so the glyphs under a span are
+    found by bisection.
+    """
+    rects = []
+    for start, end in spans:
+        line = None
+        i = bisect_right(ends, start)
+        while i < len(starts) and starts[i] < end:
+            if ends[i] > starts[i]:
+                box = boxes[i]
+                if line is not None and abs(box[1] - line[1]) <= (box[3] - box[1]) / 2:
+                    line = (min(line[0], box[0]), min(line[1], box[1]),
+                            max(line[2], box[2]), max(line[3], box[3]))
+                else:
+                    if line is not None:
+                        rects.append(line)
+                    line = tuple(box)
+            i += 1
+        if line is not None:
+            rects.append(line)
+    return rects
+
+
+def match_rects(glyphs, matcher):
+    """Locate matcher hits in a page's glyph list. Returns (rects, match_count).
+
+    Each hit becomes one rectangle per line it spans (see page_text).
+    """
+    text, starts, ends = page_text(glyphs)
+    spans = list(matcher.finditer(text))
+    return span_rects(spans, starts, ends, [box for _, box in glyphs]), len(spans)
+
+
+def page_glyphs(pdf, page, fonts=None, operations=None):
+    """Every glyph shown on a page, in drawing order, as (text, bbox)."""
+    if operations is None:
+        operations = _page_operations(pdf, page)
+    collector = _ContentWalker(pdf, fonts=fonts)
+    collector.walk(operations, _page_resources(page))
+    return collector.glyphs
+
+
+def redact_page(pdf, page, rects=None, matcher=None, fonts=None):
+    """Redact one page. Returns (content, replacements, unused, rects, matches) or None.
+
+    `rects` are boxes in page user space. With a `matcher`, boxes are found
+    by matching the page text instead. None means there was nothing to
+    redact on this page, so it can be copied as it is.
+    """
+    fonts = {} if fonts is None else fonts
+    operations = _page_operations(pdf, page)
+    resources = _page_resources(page)
+    matches = 0
+    if matcher is not None:
+        with metrics.span('redact_match'):
+            rects, matches = match_rects(page_glyphs(pdf, page, fonts, operations), matcher)
+    if not rects:
+        return None
+
+    walker = _ContentWalker(pdf, rects, fonts)
+    new_operations = walker.walk(operations, resources)
+    boxes = b''.join(b'%.3f %.3f %.3f %.3f re f\n' % (x0, y0, x1 - x0, y1 - y0)
+                     for x0, y0, x1, y1 in rects)
+    content = b'q\n' + _serialize(new_operations) + b'\nQ\nq 0 g\n' + boxes + b'Q\n'
+    return content, walker.replacements, walker.unused(), rects, matches
+
+
+def _redact_chunk(src_path, tasks, terms, ignore_case):
+    """Process-pool entry point: redact the given (page_index, rects) tasks."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(src_path)
+    matcher = get_matcher(terms, ignore_case) if terms else None
+    fonts = {}
+    results = []
+    for index, rects in tasks:
+        result = redact_page(reader, reader.pages[index], rects, matcher, fonts)
+        if result is not None:
+            results.append((index,) + result)
+    return results
+
+
+def _install_replacements(writer, resources, replacements, unused):
+    """Copy of resources with the rewritten XObjects added under their new names.
+
+    XObjects in `unused` are left out, so an unredacted original that is no
+    longer drawn is not kept in the output.
+    """
+    from PyPDF2.generic import (DecodedStreamObject, DictionaryObject, NameObject,
+                                NumberObject)
+
+    resources = DictionaryObject(resources)
+    xobjects = DictionaryObject(resources['/XObject']) if '/XObject' in resources else DictionaryObject()
+    for new_name, record in replacements.items():
+        kind, original_name = record[0], record[1]
+        original = xobjects[original_name]
+        obj = DecodedStreamObject()
+        if kind == 'image':
+            data, width, height, colorspace = record[2:]
+            obj.set_data(data)
+            obj.update({
+                NameObject('/Type'): NameObject('/XObject'),
+                NameObject('/Subtype'): NameObject('/Image'),
+                NameObject('/Width'): NumberObject(width),
+                NameObject('/Height'): NumberObject(height),
+                NameObject('/ColorSpace'): NameObject(colorspace),
+                NameObject('/BitsPerComponent'): NumberObject(8),
+                NameObject('/Filter'): NameObject('/DCTDecode'),
+            })
+            if '/SMask' in original:
+                obj[NameObject('/SMask')] = original.raw_get('/SMask')
+        else:
+            data, nested, nested_unused = record[2:]
+            for key, value in original.items():
+                if key not in ('/Length', '/Filter', '/DecodeParms'):
+                    obj[NameObject(key)] = value
+            obj.set_data(data)
+            if nested:
+                form_resources = original['/Resources'] if '/Resources' in original else resources
+                obj[NameObject('/Resources')] = _install_replacements(
+                    writer, form_resources, nested, nested_unused)
+            obj = obj.flate_encode()
+        xobjects[NameObject(new_name)] = writer._add_object(obj)
+    for name in unused:
+        del xobjects[name]
+    resources[NameObject('/XObject')] = xobjects
+    return resources
+
+
+def _apply_result(writer, page, content, replacements, unused, rects):
+    from PyPDF2.generic import ArrayObject, DecodedStreamObject, NameObject
+
+    stream = DecodedStreamObject()
+    stream.set_data(content)
+    page[NameObject('/Contents')] = writer._add_object(stream.flate_encode())
+    if replacements or unused:
+        page[NameObject('/Resources')] = _install_replacements(
+            writer, _page_resources(page), replacements, unused)
+    if '/Annots' in page:
+        # Annotations (form fields, comments) under a box would still show the text
+        kept = [a for a in page['/Annots']
+                if not any(intersects([float(v) for v in a.get_object().get('/Rect', [0, 0, 0, 0])], r)
+                           for r in rects)]
+        page[NameObject('/Annots')] = ArrayObject(kept)
+
+
+def redact_pdf_file(src_path, output_path, boxes=None, terms=None, ignore_case=False, workers=1,
+                    index=None):
+    """Write a redacted copy of src_path to output_path.
+
+    Either `boxes` ({page_index: [rect, ...]} in page user space) or `terms`
+    (as accepted by get_matcher) selects what to remove. Text, images and
+    annotations under each rectangle are removed from the file, and an
+    opaque box is drawn on top. Pages without redactions are copied
+    without being re-encoded. Pages that need work are processed in a
+    process pool when there are enough of them. With a text_index.TextIndex
+    for src_path, terms are looked up there, and pages without a match
+    are not parsed at all. Returns
+    {'pages': redacted page count, 'matches': term matches}.
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(src_path)
+    matches = 0
+    if terms and index is not None:
+        with metrics.span('redact_match'):
+            found = index.search(get_matcher(terms, ignore_case))
+        boxes = {i: rects for i, (rects, _) in found.items()}
+        matches = sum(count for _, count in found.values())
+        terms = None
+    if terms:
+        get_matcher(terms, ignore_case)  # fail fast on bad patterns
+        tasks = [(i, None) for i in range(len(reader.pages))]
+    else:
+        tasks = sorted((i, rects) for i, rects in (boxes or {}).items()
+                       if rects and 0 <= i < len(reader.pages))
+
+    results = []
+    if workers > 1 and len(tasks) >= PARALLEL_MIN_PAGES:
+        from concurrent.futures import ProcessPoolExecutor
+        chunk = max(1, len(tasks) // (workers * 4))
+        chunks = [tasks[i:i + chunk] for i in range(0, len(tasks), chunk)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            futures = [pool.submit(metrics.run_captured, _redact_chunk, src_path, c, terms, ignore_case)
+                       for c in chunks]
+            for future in futures:
+                chunk_results, updates = future.result()
+                metrics.record(updates)
+                results.extend(chunk_results)
+    elif tasks:
+        results = _redact_chunk(src_path, tasks, terms, ignore_case)
+
+    by_page = {r[0]: r[1:] for r in results}
+    writer = PdfWriter()
+    for index, page in enumerate(reader.pages):
+        new_page = writer.add_page(page)
+        if index in by_page:
+            content, replacements, unused, rects, _ = by_page[index]
+            _apply_result(writer, new_page, content, replacements, unused, rects)
+
+    with metrics.span('pdf_write'):
+        if by_page:
+            _drop_unreachable(writer)
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+    metrics.PAGES.inc(len(reader.pages), type='redact')
+    return {'pages': len(by_page), 'matches': matches + sum(r[5] for r in results)}
+
+
+def _drop_unreachable(writer):
+    """Blank out objects no longer reachable from the catalog.
+
+    PdfWriter writes every object it has cloned. Without this step, the
+    replaced content streams and images would still be in the file even
+    though no page draws them. They are replaced by null, not removed,
+    because PyPDF2 numbers xref entries by position.
+    """
+    from PyPDF2.generic import IndirectObject, NullObject
+
+    seen = set()
+    stack = [writer._root_object, writer._info]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is writer and obj.idnum not in seen:
+                seen.add(obj.idnum)
+                stack.append(writer._objects[obj.idnum - 1])
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+    for i, obj in enumerate(writer._objects):
+        if i + 1 not in seen and obj is not None and obj is not writer._root_object:
+            writer._objects[i] = NullObject()
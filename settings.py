@@ -0,0 +1,23 @@
+import os
+
+# Conversion settings the app needs before any converter backend has been
+# loaded (see backends.py). Importing this module costs nothing, and
+# image_pdf and doc_render take their defaults from here.
+
+A4 = (595.2755905511812, 841.8897637795277)  # points; same as reportlab's A4
+
+# fit:     page size the image is scaled to fit (orientation follows the
+#          image), or None for one pixel per point at `dpi`
+# dpi:     most pixels per inch kept on the page; larger images are
+#          downscaled while decoding
+# quality: JPEG quality for pages that are re-encoded
+IMAGE_PRESETS = {
+    "original": {"fit": None, "dpi": 72, "quality": 75},
+    "balanced": {"fit": "A4", "dpi": 150, "quality": 85},
+    "small": {"fit": "A4", "dpi": 96, "quality": 65},
+}
+IMAGE_PRESET = os.environ.get("PDF_IMAGE_PRESET", "original")
+
+# Everything that affects rendered documents; also part of the conversion cache key.
+DOC_LAYOUT = {"pagesize": A4, "margin": 60, "titleFont": "Helvetica-Bold", "titleSize": 16,
+              "font": "Helvetica", "size": 12, "leading": 16}
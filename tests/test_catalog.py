@@ -0,0 +1,45 @@
+import os
+
+from PIL import Image
+
+import image_pdf
+from catalog import OutputCatalog
+from conversion_cache import ConversionCache, cache_key, hash_file
+
+
+def convert(image, pdf_folder, name, cache, catalog):
+    """What App.convert_images_to_pdf_api does for one image."""
+    output = os.path.join(pdf_folder, name)
+    key = cache_key('image', [hash_file(image)], {})
+    if not cache.get(key, output):
+        image_pdf.write_images_pdf([image], output, workers=1, reproducible=True)
+        cache.put(key, output)
+    catalog.add(name, 'image')
+
+
+def test_cache_hit_is_dated_when_recorded(tmp_path):
+    image = str(tmp_path / 'in.png')
+    Image.new('RGB', (40, 30), 'red').save(image)
+    pdf_folder = str(tmp_path / 'PDF')
+    os.makedirs(pdf_folder)
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    catalog = OutputCatalog(pdf_folder)
+
+    convert(image, pdf_folder, 'first[1]_x.pdf', cache, catalog)
+    # The first conversion was a while ago; the cache entry shares its inode
+    os.utime(os.path.join(pdf_folder, 'first[1]_x.pdf'), (1000, 1000))
+    convert(image, pdf_folder, 'again[2]_x.pdf', cache, catalog)
+
+    assert cache.hits == 1
+    entries, _ = catalog.recent()
+    assert [e['name'] for e in entries] == ['again[2]_x.pdf', 'first[1]_x.pdf']
+    assert entries[0]['created'] > entries[1]['created']
+
+
+def test_reconcile_dates_untracked_files_by_mtime(tmp_path):
+    path = tmp_path / 'old[3]_x.pdf'
+    path.write_bytes(b'%PDF-1.4\n')
+    os.utime(path, (1000, 1000))
+    catalog = OutputCatalog(str(tmp_path))
+    assert catalog.reconcile() == (1, 0)
+    assert catalog.get('old[3]_x.pdf')['created'] == 1000
@@ -0,0 +1,41 @@
+import time
+
+from expiry import ExpiryScheduler
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_reschedule_in_another_worker_is_respected(tmp_path):
+    db = str(tmp_path / '.expiry.db')
+    output = tmp_path / 'out.pdf'
+    output.write_bytes(b'%PDF')
+    first = ExpiryScheduler(db)
+    second = ExpiryScheduler(db)
+
+    first.schedule(str(output), 0.3)
+    # Downloaded again through another worker, which pushes the expiry out
+    second.schedule(str(output), 60)
+    time.sleep(0.8)
+
+    assert output.exists()
+    assert first.stats()['expired'] == 0
+    assert first.stats()['pending'] == 1  # back on its heap with the new time
+
+
+def test_due_file_is_deleted_by_one_worker(tmp_path):
+    db = str(tmp_path / '.expiry.db')
+    output = tmp_path / 'out.pdf'
+    output.write_bytes(b'%PDF')
+    first = ExpiryScheduler(db)
+    first.schedule(str(output), 0.3)
+    second = ExpiryScheduler(db)
+    second.start()  # loads the same expiry from the database
+
+    assert wait_for(lambda: not output.exists())
+    assert wait_for(lambda: first.stats()['pending'] + second.stats()['pending'] == 0)
+    assert first.stats()['expired'] + second.stats()['expired'] == 1
@@ -0,0 +1,224 @@
+import array
+import json
+import os
+import sys
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from conversion_cache import cache_key, hash_file
+from redaction import page_glyphs, page_text, span_rects
+
+# Text index of a PDF uploaded for redaction, so term searches and the
+# redaction itself need not parse the page content streams again. It is
+# built once, when the upload completes, and written next to the PDF as
+# "<name>.index". Indexes are also kept in a cache keyed by the PDF's
+# sha256, so uploading the same file again reuses the one built before.
+#
+# File layout: one line of JSON, then the glyph data of every page.
+#   header: {"version", "sha256", "size", "byteorder",
+#            "pages": [[text, offset, length, glyph_count], ...]}
+#   data:   per page, `length` bytes of zlib at `offset` from the end of
+#           the header line: six int32 columns of glyph_count values
+#           each, the glyphs' text starts and ends and bbox x0, y0, x1,
+#           y1 in 1/SCALE points, with the bytes grouped by position
+#           (see _shuffle) so that they compress well
+# The header holds all the page text, so a search reads that line only,
+# plus the glyph data of the pages that match.
+
+INDEX_VERSION = 1
+SUFFIX = '.index'
+SCALE = 100
+LIMIT = 2 ** 31 // SCALE - 1  # coordinates are clamped to what fits in an int32
+
+_builds = {}
+_builds_lock = threading.Lock()
+_executor = None
+
+
+def index_path(pdf_path):
+    return pdf_path + SUFFIX
+
+
+class _Boxes:
+    """Glyph bboxes kept as four coordinate columns, indexed by glyph."""
+
+    def __init__(self, x0, y0, x1, y1):
+        self.columns = (x0, y0, x1, y1)
+
+    def __getitem__(self, i):
+        return tuple(c[i] / SCALE for c in self.columns)
+
+
+class TextIndex:
+    """Page text and glyph positions of one PDF, as stored in its index file."""
+
+    def __init__(self, path, header, data_start):
+        self.path = path
+        self.sha256 = header['sha256']
+        self.texts = [page[0] for page in header['pages']]
+        self._pages = header['pages']
+        self._data_start = data_start
+
+    @property
+    def page_count(self):
+        return len(self._pages)
+
+    def _glyphs(self, f, index):
+        """(starts, ends, boxes) of one page, read from the data section."""
+        _, offset, length, count = self._pages[index]
+        f.seek(self._data_start + offset)
+        data = array.array('i', _unshuffle(zlib.decompress(f.read(length))))
+        starts, ends, *box = [data[k * count:(k + 1) * count] for k in range(6)]
+        return starts, ends, _Boxes(*box)
+
+    def search(self, matcher):
+        """{page_index: (rects, match_count)} for the pages where matcher hits.
+
+        Rectangles are in page user space, one per line a match runs over,
+        the same as redaction.match_rects gives to within 1/SCALE points.
+        """
+        found = {}
+        with open(self.path, 'rb') as f:
+            for index, text in enumerate(self.texts):
+                spans = list(matcher.finditer(text))
+                if spans:
+                    found[index] = (span_rects(spans, *self._glyphs(f, index)), len(spans))
+        return found
+
+
+def load_index(pdf_path):
+    """The TextIndex stored next to pdf_path, or None if there is no usable one."""
+    path = index_path(pdf_path)
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            data_start = f.tell()
+        size = os.path.getsize(pdf_path)
+    except (OSError, ValueError):
+        return None
+    if (header.get('version') != INDEX_VERSION or header.get('byteorder') != sys.byteorder
+            or header.get('size') != size):
+        return None
+    return TextIndex(path, header, data_start)
+
+
+def _shuffle(data):
+    """Group the bytes of 32-bit values by position, so the high bytes (mostly alike) sit together."""
+    return b''.join(data[k::4] for k in range(4))
+
+
+def _unshuffle(data):
+    n = len(data) // 4
+    out = bytearray(len(data))
+    for k in range(4):
+        out[k::4] = data[k * n:(k + 1) * n]
+    return out
+
+
+def write_index(pdf_path, dest, digest=None):
+    """Parse every page of pdf_path and write its text index to dest."""
+    from PyPDF2 import PdfReader
+
+    digest = digest or hash_file(pdf_path)
+    reader = PdfReader(pdf_path)
+    fonts = {}
+    pages = []
+    data = []
+    offset = 0
+    for page in reader.pages:
+        glyphs = page_glyphs(reader, page, fonts)
+        text, starts, ends = page_text(glyphs)
+        columns = [starts, ends] + [[round(min(max(box[k], -LIMIT), LIMIT) * SCALE) for _, box in glyphs]
+                                    for k in range(4)]
+        chunk = zlib.compress(_shuffle(b''.join(array.array('i', c).tobytes() for c in columns)))
+        pages.append([text, offset, len(chunk), len(glyphs)])
+        data.append(chunk)
+        offset += len(chunk)
+
+    header = {'version': INDEX_VERSION, 'sha256': digest, 'size': os.path.getsize(pdf_path),
+              'byteorder': sys.byteorder, 'pages': pages}
+    tmp = f'{dest}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+            f.writelines(data)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def build_index(pdf_path, cache=None):
+    """Create the index next to pdf_path, from `cache` if it has one. Returns it.
+
+    `cache` is a ConversionCache holding index files by PDF digest.
+    """
+    dest = index_path(pdf_path)
+    digest = hash_file(pdf_path)
+    key = cache_key('text-index', [digest], INDEX_VERSION)
+    if cache is None or not cache.get(key, dest):
+        with metrics.span('text_index'):
+            write_index(pdf_path, dest, digest)
+        if cache is not None:
+            cache.put(key, dest)
+    return load_index(pdf_path)
+
+
+def _get_executor():
+    global _executor
+    with _builds_lock:
+        if _executor is None:
+            # One thread: parsing is pure Python, more would only fight over the GIL
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='text-index')
+        return _executor
+
+
+def prepare_index(pdf_path, cache=None):
+    """Start building the index of a freshly uploaded PDF in the background.
+
+    An index left over from an earlier file of the same name is removed
+    first. get_index() waits for the build if it is still running.
+    """
+    pdf_path = os.path.abspath(pdf_path)
+    try:
+        os.remove(index_path(pdf_path))
+    except FileNotFoundError:
+        pass
+    executor = _get_executor()
+    with _builds_lock:
+        # Registered before the build can finish and unregister itself
+        future = executor.submit(build_index, pdf_path, cache)
+        _builds[pdf_path] = future
+    future.add_done_callback(lambda _: _build_done(pdf_path, future))
+    return future
+
+
+def _build_done(pdf_path, future):
+    with _builds_lock:
+        if _builds.get(pdf_path) is future:
+            del _builds[pdf_path]
+    if not future.cancelled() and future.exception() is not None:
+        print(f"⚠️ Could not index {os.path.basename(pdf_path)}: {future.exception()}")
+
+
+def get_index(pdf_path, cache=None):
+    """The TextIndex of pdf_path, building it now if needed. None if the PDF can't be parsed."""
+    pdf_path = os.path.abspath(pdf_path)
+    with _builds_lock:
+        future = _builds.get(pdf_path)
+    if future is not None:
+        try:
+            return future.result()
+        except Exception:
+            return None
+    index = load_index(pdf_path)
+    if index is not None:
+        return index
+    try:
+        return build_index(pdf_path, cache)
+    except Exception as e:
+        print(f"⚠️ Could not index {os.path.basename(pdf_path)}: {e}")
+        return None
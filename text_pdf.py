@@ -0,0 +1,128 @@
+import os
+import re
+import zlib
+
+from PIL import PdfParser
+from reportlab.lib.pagesizes import A4
+
+# Standard 14 fonts need no embedding; text is encoded as WinAnsi, the
+# same as reportlab does for them. Characters outside it are drawn as "?"
+# (layout.wrap measures them that way when given TEXT_ENCODING).
+TEXT_ENCODING = "cp1252"
+STANDARD_FONTS = {"Helvetica", "Helvetica-Bold", "Helvetica-Oblique", "Helvetica-BoldOblique",
+                  "Times-Roman", "Times-Bold", "Times-Italic", "Times-BoldItalic",
+                  "Courier", "Courier-Bold", "Courier-Oblique", "Courier-BoldOblique"}
+
+_CONTROL = re.compile(rb"[\x00-\x1f]")
+
+
+def _pdf_string(text):
+    raw = text.encode(TEXT_ENCODING, errors="replace")
+    raw = raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    if _CONTROL.search(raw):
+        raw = _CONTROL.sub(lambda m: b"\\%03o" % m.group()[0], raw)
+    return b"(" + raw + b")"
+
+
+class StreamingTextCanvas:
+    """Minimal stand-in for reportlab's Canvas that writes pages as it goes.
+
+    reportlab keeps every page in memory until save(). Here each page is
+    compressed and written to disk by showPage(), so memory stays the size
+    of one page no matter how long the document is. Only the calls
+    the document renderer uses are supported: setFont, drawString,
+    showPage and save.
+    """
+
+    def __init__(self, output_path, pagesize=A4):
+        self.output_path = output_path
+        self.pagesize = pagesize
+        self.page_count = 0
+        self._fp = open(output_path, "w+b")
+        self._pdf = PdfParser.PdfParser(f=self._fp, mode="w+b")
+        self._pdf.start_writing()
+        self._pdf.write_header()
+        self._next_id = 1
+        self._root_ref = self._new_ref()
+        self._pages_ref = self._new_ref()
+        self._pdf.pages_ref = self._pages_ref
+        self._fonts = {}  # font name -> (resource name, object ref)
+        self._page_fonts = set()
+        self._ops = []
+        self._font = None
+        self._prefix = None
+
+    def _new_ref(self):
+        # PdfParser.next_object_id() scans every id written so far, which
+        # makes long documents quadratic; count here instead
+        ref = PdfParser.IndirectReference(self._next_id, 0)
+        self._next_id += 1
+        return ref
+
+    def setFont(self, name, size):
+        if name not in STANDARD_FONTS:
+            raise ValueError(f"Unsupported font: {name}")
+        if name not in self._fonts:
+            ref = self._pdf.write_obj(
+                self._new_ref(),
+                Type=PdfParser.PdfName("Font"),
+                Subtype=PdfParser.PdfName("Type1"),
+                BaseFont=PdfParser.PdfName(name),
+                Encoding=PdfParser.PdfName("WinAnsiEncoding"),
+            )
+            self._fonts[name] = (f"F{len(self._fonts) + 1}", ref)
+        self._font = name
+        self._prefix = b"BT /%s %s Tf 1 0 0 1 " % (self._fonts[name][0].encode(), _num(size))
+
+    def drawString(self, x, y, text):
+        self._page_fonts.add(self._font)
+        self._ops.append(b"%s%s %s Tm %s Tj ET\n" % (self._prefix, _num(x), _num(y), _pdf_string(text)))
+
+    def showPage(self):
+        """Write the current page to disk and start an empty one."""
+        pdf = self._pdf
+        content = zlib.compress(b"".join(self._ops))
+        contents_ref = pdf.write_obj(self._new_ref(), stream=content,
+                                     Filter=PdfParser.PdfName("FlateDecode"))
+        fonts = {self._fonts[n][0]: self._fonts[n][1] for n in sorted(self._page_fonts)}
+        page_ref = pdf.write_page(
+            self._new_ref(),
+            Resources=PdfParser.PdfDict(Font=PdfParser.PdfDict(fonts)),
+            MediaBox=[0, 0, _num_value(self.pagesize[0]), _num_value(self.pagesize[1])],
+            Contents=contents_ref,
+        )
+        pdf.pages.append(page_ref)
+        self.page_count += 1
+        self._ops = []
+        self._page_fonts = set()
+
+    def save(self):
+        """Write the last page, the page tree and the trailer, then close."""
+        if self._ops or not self.page_count:
+            self.showPage()
+        pdf = self._pdf
+        pdf.write_obj(self._pages_ref, Type=PdfParser.PdfName("Pages"),
+                      Count=len(pdf.pages), Kids=pdf.pages)
+        pdf.write_obj(self._root_ref, Type=PdfParser.PdfName("Catalog"), Pages=self._pages_ref)
+        pdf.root_ref = self._root_ref
+        pdf.write_xref_and_trailer()
+        self._fp.flush()
+        pdf.close()
+        self._fp.close()
+
+    def abort(self):
+        """Close and remove a partially written file."""
+        self._pdf.close()
+        self._fp.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+
+def _num_value(value):
+    return int(value) if float(value).is_integer() else round(float(value), 4)
+
+
+def _num(value):
+    if float(value).is_integer():
+        return b"%d" % value
+    return (b"%.4f" % value).rstrip(b"0")
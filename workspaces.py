@@ -0,0 +1,87 @@
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+# Every upload session gets its own directory under WORKSPACE_ROOT, so
+# concurrent users (and gunicorn workers) never see each other's inputs.
+WORKSPACE_ROOT = os.environ.get('PDF_WORKSPACE_ROOT', 'workspaces')
+WORKSPACE_TTL = int(os.environ.get('PDF_WORKSPACE_TTL', 3600))  # seconds
+REAP_INTERVAL = 60
+
+_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def create_workspace():
+    """Create a new empty workspace and return its ID."""
+    start_reaper()
+    ws_id = uuid.uuid4().hex
+    os.makedirs(os.path.join(WORKSPACE_ROOT, ws_id))
+    return ws_id
+
+
+def workspace_path(ws_id):
+    """Return the directory for ws_id, or None if the ID is invalid or gone.
+
+    Looking a workspace up also refreshes its expiry.
+    """
+    if not ws_id or not _ID_PATTERN.match(ws_id):
+        return None
+    path = os.path.join(WORKSPACE_ROOT, ws_id)
+    if not os.path.isdir(path):
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def remove_workspace(ws_id):
+    if not ws_id or not _ID_PATTERN.match(ws_id):
+        return
+    shutil.rmtree(os.path.join(WORKSPACE_ROOT, ws_id), ignore_errors=True)
+
+
+def reap_expired(ttl=None):
+    """Delete workspaces not used for ttl seconds. Returns how many were removed."""
+    ttl = WORKSPACE_TTL if ttl is None else ttl
+    if not os.path.isdir(WORKSPACE_ROOT):
+        return 0
+    cutoff = time.time() - ttl
+    removed = 0
+    for entry in os.scandir(WORKSPACE_ROOT):
+        if not entry.is_dir() or not _ID_PATTERN.match(entry.name):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            pass  # removed by another worker meanwhile
+    if removed:
+        print(f"🧹 Reaped {removed} expired workspace(s)")
+    return removed
+
+
+def _reap_forever():
+    while True:
+        time.sleep(REAP_INTERVAL)
+        try:
+            reap_expired()
+        except Exception as e:
+            print(f"⚠️ Workspace reaper error: {e}")
+
+
+def start_reaper():
+    """Start the background reaper thread once per process."""
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None:
+            os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+            _reaper = threading.Thread(target=_reap_forever, name='workspace-reaper', daemon=True)
+            _reaper.start()